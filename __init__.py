@@ -3,18 +3,20 @@ QGIS Plugin Package Initialization
 This module initializes ORCA (On-the-flyReadyCalculatorAdd-on)
 """
 
-from .qgis_calculator_plugin import QgisCalculatorPlugin
-
 
 def classFactory(iface):
     """
     Load the plugin and return the plugin class
     
+    The plugin module is imported here rather than at package import, and it
+    defers the calculator and help widgets until the dock is first opened.
+    
     Args:
         iface: QGIS interface object
         
     Returns:
         The plugin class instance
     """
+    from .qgis_calculator_plugin import QgisCalculatorPlugin
     return QgisCalculatorPlugin(iface)
 
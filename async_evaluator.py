@@ -0,0 +1,150 @@
+"""
+Asynchronous Evaluator for QGIS Calculator Plugin
+Runs expensive evaluations in a worker process with a time budget
+"""
+
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, QTimer, QElapsedTimer, pyqtSignal
+
+from .engine.evaluation import ERROR_TEXT, TIMEOUT_TEXT, evaluate_to_result
+from .engine.worker import serve, spawn_context
+
+
+class AsyncEvaluator(QObject):
+    """Evaluates one expression at a time without blocking the event loop
+
+    Work goes to a persistent spawned worker process, which can be killed
+    when the time budget runs out or the user cancels, so runaway bignum
+    arithmetic never freezes QGIS. If no Python interpreter can be found
+    for the worker, a background thread is used instead; it keeps the GUI
+    responsive but an abandoned job runs on until it finishes.
+    """
+
+    # Emitted with (job id, formatted result or TIMEOUT_TEXT, unrounded value or None)
+    finished = pyqtSignal(int, str, object)
+
+    def __init__(self, timeout_ms=5000, parent=None):
+        """
+        Constructor
+
+        Args:
+            timeout_ms: Time budget per evaluation in milliseconds
+            parent: Parent QObject
+        """
+        super().__init__(parent)
+        self.timeout_ms = timeout_ms
+        self._job_ids = itertools.count(1)
+        self._current_job = None
+        self._process = None
+        self._conn = None
+        self._executor = None
+        self._future = None
+        self._elapsed = QElapsedTimer()
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(10)
+        self._poll_timer.timeout.connect(self._poll)
+
+    def is_busy(self):
+        """True while an evaluation is in flight"""
+        return self._current_job is not None
+
+    def submit(self, expression, *options):
+        """
+        Start evaluating an expression, cancelling any job in flight
+
+        Args:
+            expression: Expression string as shown on the calculator display
+            options: Extra evaluate_to_result arguments (precision mode, digits)
+
+        Returns:
+            Job id passed back through the finished signal
+        """
+        self.cancel()
+        job_id = next(self._job_ids)
+        self._current_job = job_id
+        if self._ensure_process():
+            self._conn.send((job_id, expression, *options))
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            self._future = self._executor.submit(evaluate_to_result, expression, *options)
+        self._elapsed.start()
+        self._poll_timer.start()
+        return job_id
+
+    def cancel(self):
+        """Abandon the job in flight; a busy worker process is terminated"""
+        if self._current_job is None:
+            return
+        self._current_job = None
+        self._future = None
+        self._poll_timer.stop()
+        self._stop_process()
+
+    def shutdown(self):
+        """Stop the worker process and thread (called when the plugin unloads)"""
+        self.cancel()
+        self._stop_process()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _ensure_process(self):
+        """Start the worker process if needed; return False if it cannot run"""
+        if self._process is not None and self._process.is_alive():
+            return True
+        context = spawn_context()
+        if context is None:
+            return False
+        try:
+            self._conn, child_conn = context.Pipe()
+            self._process = context.Process(target=serve, args=(child_conn,), daemon=True)
+            self._process.start()
+            child_conn.close()
+        except (OSError, ValueError, RuntimeError):
+            self._process = None
+            self._conn = None
+            return False
+        return True
+
+    def _stop_process(self):
+        """Terminate the worker process; the next submit starts a fresh one"""
+        if self._process is None:
+            return
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join(1)
+        self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def _poll(self):
+        """Check for a finished job or an exhausted time budget"""
+        job_id = self._current_job
+        if job_id is None:
+            self._poll_timer.stop()
+            return
+        result = None
+        try:
+            if self._future is not None:
+                if self._future.done():
+                    result = self._future.result()
+            elif self._conn.poll():
+                finished_job, *answer = self._conn.recv()
+                if finished_job == job_id:
+                    result = tuple(answer)
+        except (EOFError, OSError):
+            # Worker died (e.g. out of memory); report it as a failed evaluation
+            self._stop_process()
+            result = (ERROR_TEXT, None)
+        if result is None and self._elapsed.elapsed() > self.timeout_ms:
+            self.cancel()
+            self.finished.emit(job_id, TIMEOUT_TEXT, None)
+            return
+        if result is not None:
+            self._current_job = None
+            self._future = None
+            self._poll_timer.stop()
+            self.finished.emit(job_id, *result)
@@ -0,0 +1,170 @@
+"""
+Benchmark baselines
+Saves benchmark suite results as JSON and compares a run against a baseline
+
+Used by the pytest suite (conftest.py) and on its own to compare two saved runs:
+    python benchmarks/baseline.py baselines/before.json baselines/after.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Default directory for saved baselines (a bare name is looked up here)
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+# A median this much slower than the baseline counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+
+def summarize(samples):
+    """
+    Statistics of one benchmark's timings
+
+    Args:
+        samples: Seconds per call, one per round
+
+    Returns:
+        Dict with median, min, mean and stdev (seconds) and the number of rounds
+    """
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": len(samples),
+    }
+
+
+def machine_info():
+    """Where the results were measured; timings only compare on the same machine"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+    try:
+        from PyQt5.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+        info["qt"] = QT_VERSION_STR
+        info["pyqt"] = PYQT_VERSION_STR
+    except ImportError:
+        pass
+    return info
+
+
+def resolve(name):
+    """Path of a baseline: a bare name such as "main" means baselines/main.json"""
+    path = Path(name)
+    if path.suffix != ".json" and len(path.parts) == 1:
+        return BASELINE_DIR / f"{name}.json"
+    return path
+
+
+def save(name, results):
+    """
+    Write results as a baseline
+
+    Args:
+        name: Baseline name or path
+        results: Dict of benchmark name -> summarize() output
+
+    Returns:
+        Path written
+    """
+    path = resolve(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine_info(),
+        "results": dict(sorted(results.items())),
+    }
+    path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+def load(name):
+    """Read a saved baseline; returns its dict of benchmark results"""
+    return json.loads(resolve(name).read_text(encoding="utf-8"))["results"]
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare median timings against a baseline
+
+    Args:
+        baseline: Dict of benchmark name -> statistics, from load()
+        results: Dict of benchmark name -> statistics of the current run
+        threshold: Relative slowdown of the median that counts as a regression
+
+    Returns:
+        List of (name, baseline median or None, current median or None, status)
+        rows, where status is "regressed", "improved", "ok", "new" or "missing"
+    """
+    rows = []
+    for name in sorted(set(baseline) | set(results)):
+        old = baseline[name]["median"] if name in baseline else None
+        new = results[name]["median"] if name in results else None
+        if old is None:
+            status = "new"
+        elif new is None:
+            status = "missing"
+        elif new > old * (1 + threshold):
+            status = "regressed"
+        elif new < old / (1 + threshold):
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, old, new, status))
+    return rows
+
+
+def format_time(seconds):
+    """Seconds as a short text in a suitable unit"""
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def format_results(results):
+    """Table of the current run's timings"""
+    width = max((len(name) for name in results), default=4)
+    lines = [f"{'benchmark':<{width}}  {'median':>10}  {'min':>10}  {'rounds':>6}"]
+    for name, stats in sorted(results.items()):
+        lines.append(f"{name:<{width}}  {format_time(stats['median']):>10}  "
+                     f"{format_time(stats['min']):>10}  {stats['rounds']:>6}")
+    return lines
+
+
+def format_comparison(rows):
+    """Table of compare() rows with the relative change of each median"""
+    width = max((len(row[0]) for row in rows), default=4)
+    lines = [f"{'benchmark':<{width}}  {'baseline':>10}  {'current':>10}  {'change':>8}  status"]
+    for name, old, new, status in rows:
+        change = f"{(new / old - 1) * 100:+.1f}%" if old and new is not None else "-"
+        lines.append(f"{name:<{width}}  {format_time(old):>10}  {format_time(new):>10}  "
+                     f"{change:>8}  {status}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two saved benchmark runs")
+    parser.add_argument("baseline", help="Baseline name or JSON path")
+    parser.add_argument("current", help="Run to compare, name or JSON path")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown counted as a regression (default %(default)s)")
+    args = parser.parse_args()
+    rows = compare(load(args.baseline), load(args.current), args.threshold)
+    print("\n".join(format_comparison(rows)))
+    return 1 if any(status == "regressed" for *_, status in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
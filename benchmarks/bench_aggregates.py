@@ -0,0 +1,53 @@
+"""
+Benchmark: streaming aggregates
+Throughput and peak memory of ValueSummary for growing numbers of values
+
+Values are generated lazily, so the peak memory is that of the summary
+itself and should stay flat as the count grows.
+Run from the plugin directory (needs NumPy, no QGIS required):
+    python benchmarks/bench_aggregates.py
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Make the Qt-free engine package importable without loading the plugin
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy  # noqa: E402,F401  (loaded up front so its import is not measured)
+
+from engine.aggregates import ValueSummary  # noqa: E402
+
+COUNTS = (1000, 100000, 1000000)
+
+
+def values(count, seed=0):
+    """Lazily generated lognormal values, like areas or populations"""
+    generator = random.Random(seed)
+    return (generator.lognormvariate(3.0, 1.0) for _ in range(count))
+
+
+def main():
+    for count in COUNTS:
+        tracemalloc.start()
+        start = time.perf_counter()
+        summary = ValueSummary(values(count))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{count:>9} values: {elapsed * 1e3:8.1f} ms, peak {peak / 1024:8.1f} KiB, "
+              f"mean {summary.mean:8.3f}, std {summary.std:8.3f}, "
+              f"median {summary.percentile(50):7.3f}, p99 {summary.percentile(99):8.3f}")
+
+    text = "\n".join(repr(value) for value in values(100000))
+    start = time.perf_counter()
+    summary = ValueSummary(text)
+    elapsed = time.perf_counter() - start
+    print(f"pasted text of {summary.count} values: {elapsed * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
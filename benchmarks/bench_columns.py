@@ -0,0 +1,69 @@
+"""
+Benchmark: column evaluation
+Time to parse, evaluate and format pasted rows, against evaluating row by row
+
+Run from the plugin directory (needs NumPy, no QGIS required):
+    python benchmarks/bench_columns.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+# Make the Qt-free engine package importable without loading the plugin
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy  # noqa: E402,F401  (loaded up front so its import is not measured)
+
+from engine.columns import evaluate_column, parse_columns  # noqa: E402
+from engine.compiler import compile_expression  # noqa: E402
+from engine.formatting import DEFAULT_FORMATTER  # noqa: E402
+
+ROWS = (1000, 100000)
+
+CASES = (
+    ("single column", "value * 0.3048 + 1", lambda values: "\n".join(repr(a) for a, _, _ in values)),
+    ("CSV with header", "√(width^2 + height^2) / n",
+     lambda values: "width,height,n\n" + "\n".join(f"{a!r},{b!r},{c!r}" for a, b, c in values)),
+)
+
+
+def rows(count, seed=0):
+    generator = random.Random(seed)
+    return [(generator.uniform(0, 1000), generator.uniform(0, 1000), generator.uniform(1, 10))
+            for _ in range(count)]
+
+
+def per_row(expression, text):
+    """Reference: one compiled-expression call per row"""
+    header, columns = parse_columns(text)
+    compiled = compile_expression(expression)
+    names = sorted(compiled.variables)
+    cells = []
+    for row in zip(*(columns[name].tolist() for name in names)):
+        cells.append(DEFAULT_FORMATTER.format(compiled(dict(zip(names, row)))))
+    return cells
+
+
+def main():
+    for count in ROWS:
+        values = rows(count)
+        for label, expression, make_text in CASES:
+            text = make_text(values)
+            start = time.perf_counter()
+            parse_columns(text)
+            parsed = time.perf_counter() - start
+            start = time.perf_counter()
+            result = evaluate_column(expression, text, DEFAULT_FORMATTER)
+            total = time.perf_counter() - start
+            start = time.perf_counter()
+            per_row(expression, text)
+            reference = time.perf_counter() - start
+            print(f"{count:>7} rows, {label:<16}: parse {parsed * 1e3:7.1f} ms, "
+                  f"parse+evaluate+format {total * 1e3:7.1f} ms "
+                  f"({result.errors} failed), per-row loop {reference * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
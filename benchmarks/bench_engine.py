@@ -0,0 +1,79 @@
+"""
+Benchmark: headless calculator engine
+Import time and per-operation cost of CalculatorEngine without Qt
+
+Each import measurement runs in a fresh interpreter so module imports are cold.
+Run from the plugin directory (needs only the Python standard library):
+    python benchmarks/bench_engine.py
+"""
+
+import json
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+RUNS = 5
+
+# Make the Qt-free engine package importable without loading the plugin
+sys.path.insert(0, str(PLUGIN_DIR))
+
+from engine import CalculatorEngine  # noqa: E402
+
+# Runs in a child interpreter; prints import time in ms and whether Qt was loaded
+_CHILD = r"""
+import json, sys, time
+sys.path.insert(0, {plugin_dir!r})
+start = time.perf_counter()
+import engine
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"import_ms": elapsed, "qt_loaded": "PyQt5" in sys.modules}}))
+"""
+
+
+def import_time():
+    """Median cold import time of the engine package in milliseconds"""
+    samples = []
+    qt_loaded = False
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", _CHILD.format(plugin_dir=str(PLUGIN_DIR))],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output)
+        samples.append(result["import_ms"])
+        qt_loaded = qt_loaded or result["qt_loaded"]
+    return sorted(samples)[len(samples) // 2], qt_loaded
+
+
+def type_and_calculate(engine, keys):
+    """Press every key of one calculation, then "=" """
+    engine.press("C")
+    for key in keys:
+        engine.press(key)
+    engine.press("=")
+
+
+def main():
+    elapsed, qt_loaded = import_time()
+    print(f"cold import of engine   : {elapsed:7.2f} ms (Qt loaded: {qt_loaded})")
+
+    engine = CalculatorEngine()
+    calculations = [list("12*34+5"), ["sin", "0", ".", "5", ")", "x²"], list("2^10/7")]
+    number = 2000
+    total = timeit.timeit(lambda: [type_and_calculate(engine, c) for c in calculations],
+                          number=number)
+    per_calculation = total / (number * len(calculations)) * 1e6
+    print(f"type + '=' (cached)     : {per_calculation:7.2f} us/calculation")
+
+    engine.result_cache.clear()
+    fresh = [f"{i}*3.5+{i}" for i in range(number)]
+    total = timeit.timeit(lambda: [engine.calculate(e) for e in fresh], number=1)
+    print(f"calculate (uncached)    : {total / number * 1e6:7.2f} us/calculation")
+    print(f"history entries         : {len(engine.history)}")
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: evaluating an expression over layer features
+Streams a stand-in feature source through FeatureEvaluator, in-process and pooled
+
+Run from the plugin directory (needs NumPy, no QGIS required):
+    python benchmarks/bench_features.py [feature count]
+"""
+
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+# Make the Qt-free engine package importable without loading the plugin
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine import compile_expression  # noqa: E402
+from engine.features import FeatureEvaluator  # noqa: E402
+from tests.conftest import StandInFeatureSource  # noqa: E402
+
+EXPRESSION = "√(width^2+height^2)*scale+ln(area+1)"
+
+
+FIELDS = ["fid", "width", "height", "scale", "area"]
+
+
+def attributes(fid):
+    """Attributes of stand-in feature fid"""
+    return {
+        "fid": fid,
+        "width": fid % 1000 * 0.5,
+        "height": fid % 777 * 0.25,
+        "scale": None if fid % 5000 == 0 else 1.5,  # Some NULLs
+        "area": float(fid),
+    }
+
+
+def run(source, workers, chunk_size):
+    """Evaluate every feature; return (seconds, result count, NULL count)"""
+    start = time.perf_counter()
+    results = nulls = 0
+    with FeatureEvaluator(EXPRESSION, chunk_size, workers) as evaluator:
+        evaluator.check_fields(source.fields())
+        for _, value in evaluator.iter_results(source.getFeatures()):
+            results += 1
+            nulls += value is None
+    return time.perf_counter() - start, results, nulls
+
+
+def check(source):
+    """Compare a sample of pooled results with the scalar engine"""
+    compiled = compile_expression(EXPRESSION)
+    with FeatureEvaluator(EXPRESSION, 1000, 2) as evaluator:
+        for count, (feature, value) in enumerate(evaluator.iter_results(source.getFeatures())):
+            if count % 997:
+                continue
+            names = ("width", "height", "scale", "area")
+            if feature["scale"] is None:
+                assert value is None
+            else:
+                expected = compiled({name: feature[name] for name in names})
+                assert math.isclose(value, expected), (value, expected)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    check(StandInFeatureSource(FIELDS, attributes, 20000))
+    source = StandInFeatureSource(FIELDS, attributes, count)
+    for workers in sorted({0, 2, min(os.cpu_count() or 1, 8)}):
+        seconds, results, nulls = run(source, workers, 65536)
+        print(f"{workers} workers: {results} features in {seconds:6.2f} s "
+              f"({results / seconds / 1000:7.1f} k features/s, {nulls} NULL)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: result formatting
+Compares the old float -> f-string -> rstrip chain with ResultFormatter
+
+Run from the plugin directory:
+    python benchmarks/bench_formatting.py
+"""
+
+import sys
+import timeit
+from decimal import Decimal
+from pathlib import Path
+
+# Make the Qt-free engine package importable without loading the plugin
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine import compile_expression  # noqa: E402
+from engine.formatting import ENGINEERING, ResultFormatter  # noqa: E402
+
+
+VALUES = [
+    0.0,
+    1.0,
+    0.1 + 0.2,
+    1 / 3,
+    123456.789,
+    -2.5e-12,
+    6378137.0 * 3.141592653589793,
+    1.2345678901234567e25,
+]
+
+
+def legacy_format(result):
+    """The pre-formatter chain, kept here as the benchmark baseline"""
+    result = float(result)
+    if result == 0:
+        return "0.0"
+    if abs(result) < 1e-6:
+        formatted = f"{result:.15f}".rstrip('0').rstrip('.')
+    else:
+        formatted = f"{result:.10f}".rstrip('0').rstrip('.')
+    if '.' not in formatted:
+        formatted += '.0'
+    return formatted
+
+
+def bench(func, values, number):
+    """Return the mean time per value in microseconds"""
+    total = timeit.timeit(lambda: [func(v) for v in values], number=number)
+    return total / (number * len(values)) * 1e6
+
+
+def round_trip_errors(formatter):
+    """Count floats whose shown text does not parse back to the shown value"""
+    errors = 0
+    for value in VALUES:
+        text = formatter.to_expression(formatter.format(value))
+        if compile_expression(text)() != float(text):
+            errors += 1
+    return errors
+
+
+def main():
+    number = 20000
+    plain = ResultFormatter()
+    formatters = [
+        ("formatter (plain)", plain),
+        ("formatter (12 sig.)", ResultFormatter(12)),
+        ("formatter (grouped)", ResultFormatter(group_separator=",")),
+        ("formatter (engineering)", ResultFormatter(notation=ENGINEERING)),
+    ]
+    legacy = bench(legacy_format, VALUES, number)
+    print(f"{'legacy f-string+rstrip':<26}: {legacy:6.2f} us/value")
+    for label, formatter in formatters:
+        cost = bench(formatter.format, VALUES, number)
+        print(f"{label:<26}: {cost:6.2f} us/value  ({cost / legacy:4.1f}x legacy)"
+              f"  round-trip errors: {round_trip_errors(formatter)}")
+    decimals = [Decimal(repr(v)) for v in VALUES]
+    cost = bench(plain.format, decimals, number // 4)
+    print(f"{'formatter (Decimal)':<26}: {cost:6.2f} us/value")
+    ints = [2 ** 64, 3628800, 10 ** 30]
+    cost = bench(plain.format, ints, number)
+    print(f"{'formatter (int, exact)':<26}: {cost:6.2f} us/value")
+
+
+if __name__ == "__main__":
+    main()
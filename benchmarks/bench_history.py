@@ -0,0 +1,104 @@
+"""
+Benchmark: history storage
+Memory per entry and duplicate lookup time of the history store as it grows
+
+Duplicate lookups go through the SQLite index on the entry digest, so
+their time should stay flat from a thousand entries to half a million.
+Run from the plugin directory (no QGIS required):
+    python benchmarks/bench_history.py
+"""
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Make the Qt-free engine package importable without loading the plugin
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine.calculator import CalculatorEngine  # noqa: E402
+from engine.history_store import HistoryEntry, HistoryStore, entry_digest  # noqa: E402
+
+SIZES = (1000, 10000, 100000, 500000)
+LOOKUPS = 2000
+
+
+def calculation(i):
+    return f"{i}*3.5+{i}", f"{i * 4.5}"
+
+
+def fill(store, count):
+    """Insert distinct calculations up to count entries in one transaction
+
+    Writes the rows directly (append() commits every entry and keeps the
+    full-text index up to date, which is not what is measured here).
+    """
+    for i in range(len(store) + 1, count + 1):
+        expression, result = calculation(i)
+        store._conn.execute(
+            "INSERT INTO history (expression, result, created, last_used, digest) "
+            "VALUES (?, ?, 0, 0, ?)",
+            (expression, result, entry_digest(expression, result)),
+        )
+    store._conn.commit()
+    store.reload()
+
+
+def database_bytes(store):
+    page_count = store._conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = store._conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def heap_bytes(make, count=10000):
+    """Python heap per cached entry, for entries built by make(i)"""
+    tracemalloc.start()
+    entries = [make(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del entries
+    return size / count
+
+
+def cached_entry(i):
+    # The same expression (e.g. ans*1.2) read back with a different result
+    # each time; join() builds a new string, as reading a row does
+    return HistoryEntry("".join(["ans*", "1.2"]), str(i * 1.2))
+
+
+def cached_tuple(i):
+    return ("".join(["ans*", "1.2"]), str(i * 1.2))
+
+
+def main():
+    store = HistoryStore(":memory:", capacity=max(SIZES))
+    for size in SIZES:
+        fill(store, size)
+        present = [calculation(i) for i in range(1, size + 1, max(1, size // LOOKUPS))]
+        absent = [(expression, "0") for expression, _ in present]
+        start = time.perf_counter()
+        found = sum(store.find(item) is not None for item in present)
+        hit = (time.perf_counter() - start) / len(present)
+        start = time.perf_counter()
+        missed = sum(store.find(item) is None for item in absent)
+        miss = (time.perf_counter() - start) / len(absent)
+        print(f"{size:>7} entries: {database_bytes(store) / size:6.1f} bytes/entry on disk, "
+              f"find hit {hit * 1e6:6.2f} us ({found}/{len(present)}), "
+              f"miss {miss * 1e6:6.2f} us ({missed}/{len(absent)})")
+    store.close()
+    print(f"cached entry: {heap_bytes(cached_entry):6.1f} bytes in memory, "
+          f"tuple of strings {heap_bytes(cached_tuple):6.1f} bytes")
+
+    engine = CalculatorEngine()
+    start = time.perf_counter()
+    for _ in range(1000):
+        engine.calculate("2+2")
+    elapsed = time.perf_counter() - start
+    entry = engine.history.entry(-1)
+    print(f"1000 repeats of 2+2: {elapsed / 1000 * 1e6:6.2f} us/calculation, "
+          f"{len(engine.history)} history entry, count {entry.count}")
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: precision modes
+Cost of one evaluation in each number system, with and without compiling
+
+Run from the plugin directory:
+    python benchmarks/bench_precision.py
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+# Make the Qt-free engine package importable without loading the plugin
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine import compile_expression, format_result, parse  # noqa: E402
+from engine.precision import DECIMAL, FRACTION, get_precision  # noqa: E402
+
+
+EXPRESSIONS = [
+    "7+8*9",
+    "(2+3)*4-1/8",
+    "√(16)+5x²-3x³",
+    "sin(0.5)^2+cos(0.5)^2",
+    "log(1000)+ln(20)*π",
+    "12!/10!+50%",
+    "((1.5+2.25)*(3.75-0.5))/(4^2-1)",
+]
+
+
+def float_warm(expression):
+    """Default path: cached compiled float expression, formatted"""
+    return format_result(compile_expression(expression)())
+
+
+def precision_runner(precision, cached):
+    """Evaluate-and-format function for a Precision, optionally recompiling each time"""
+    if cached:
+        def run(expression):
+            return precision.format(precision.evaluate(expression))
+    else:
+        def run(expression):
+            evaluate = precision.compile(parse(expression))
+            return precision.format(precision.evaluate_compiled(evaluate))
+    return run
+
+
+def bench(func, number):
+    """Return the mean time per expression in microseconds"""
+    total = timeit.timeit(lambda: [func(e) for e in EXPRESSIONS], number=number)
+    return total / (number * len(EXPRESSIONS)) * 1e6
+
+
+def main():
+    number = 200
+    baseline = bench(float_warm, number * 10)
+    print(f"float (default)        : {baseline:9.2f} us/expr")
+    for mode in (DECIMAL, FRACTION):
+        for digits in (34, 100):
+            precision = get_precision(mode, digits)
+            warm = bench(precision_runner(precision, True), number)
+            cold = bench(precision_runner(precision, False), number)
+            label = f"{mode} {digits} digits"
+            print(f"{label:<23}: {warm:9.2f} us/expr  ({warm / baseline:6.1f}x float)"
+                  f"  uncached {cold:9.2f} us/expr")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: expression evaluation
+Compares the old string-replace + eval() pipeline with the compiled engine
+
+Run from the plugin directory:
+    python benchmarks/bench_safe_eval.py
+"""
+
+import math
+import re
+import sys
+import timeit
+from pathlib import Path
+
+# Make the Qt-free engine package importable without loading the plugin
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine import (  # noqa: E402
+    CompiledExpression, LRUCache, compile_expression, normalize_expression, parse
+)
+
+
+EXPRESSIONS = [
+    "7+8*9",
+    "(2+3)*4-1/8",
+    "√(16)+5x²-3x³",
+    "sin(0.5)^2+cos(0.5)^2",
+    "log(1000)+ln(20)*π",
+    "12!/10!+50%",
+    "((1.5+2.25)*(3.75-0.5))/(4^2-1)",
+]
+
+
+def legacy_eval(expression):
+    """The pre-engine evaluation path, kept here as the benchmark baseline"""
+    expression = expression.replace("π", str(math.pi))
+    expression = expression.replace("e", str(math.e))
+    expression = expression.replace("√", "math.sqrt")
+    expression = expression.replace("x²", "**2")
+    expression = expression.replace("x³", "**3")
+    expression = expression.replace("sin", "math.sin")
+    expression = expression.replace("cos", "math.cos")
+    expression = expression.replace("tan", "math.tan")
+    expression = expression.replace("log", "math.log10")
+    expression = expression.replace("ln", "math.log")
+    expression = expression.replace("^", "**")
+    expression = expression.replace("%", "/100")
+    expression = re.sub(r'(\d+)!', lambda m: f"math.factorial({m.group(1)})", expression)
+    return float(eval(expression, {"__builtins__": {}, "math": math}))  # noqa: S307
+
+
+def engine_cold(expression):
+    """Engine path without the compile cache: tokenize, parse, compile, evaluate"""
+    return float(CompiledExpression(expression, parse(expression))())
+
+
+def engine_warm(expression):
+    """Engine path with the compiled expression already cached"""
+    return float(compile_expression(expression)())
+
+
+result_cache = LRUCache(maxsize=64)
+
+
+def result_cache_hit(expression):
+    """Formatted-result cache lookup, as done by CalculatorWidget.safe_eval"""
+    key = normalize_expression(expression)
+    formatted = result_cache.get(key)
+    if formatted is None:
+        formatted = repr(engine_warm(key))
+        result_cache.put(key, formatted)
+    return formatted
+
+
+def bench(func, number):
+    """Return the mean time per expression in microseconds"""
+    total = timeit.timeit(lambda: [func(e) for e in EXPRESSIONS], number=number)
+    return total / (number * len(EXPRESSIONS)) * 1e6
+
+
+def main():
+    # Sanity check: the engine agrees with the legacy path where both are valid
+    for expression in EXPRESSIONS:
+        try:
+            expected = legacy_eval(expression)
+        except Exception:
+            continue
+        assert math.isclose(engine_warm(expression), expected), expression
+
+    number = 2000
+    legacy = bench(legacy_eval, number)
+    cold = bench(engine_cold, number)
+    warm = bench(engine_warm, number)
+    hit = bench(result_cache_hit, number)
+    print(f"legacy replace+eval : {legacy:8.2f} us/expr")
+    print(f"engine (uncached)   : {cold:8.2f} us/expr  ({legacy / cold:5.1f}x)")
+    print(f"engine (cached)     : {warm:8.2f} us/expr  ({legacy / warm:5.1f}x)")
+    print(f"result cache hit    : {hit:8.2f} us/expr  ({legacy / hit:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
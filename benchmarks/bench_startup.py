@@ -0,0 +1,97 @@
+"""
+Benchmark: plugin startup cost
+Measures what loading ORCA adds to QGIS startup, and the first dock opening
+
+Each measurement runs in a fresh interpreter so module imports are cold.
+Run from the plugin directory (needs PyQt5, no QGIS required):
+    python benchmarks/bench_startup.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+RUNS = 5
+
+# Runs in a child interpreter; prints a JSON dict of timings in milliseconds
+_CHILD = r"""
+import importlib, json, sys, time
+sys.path.insert(0, {parent!r})
+from PyQt5.QtWidgets import QApplication, QMainWindow
+app = QApplication([])
+
+
+class FakeIface:
+    # Minimal stand-in for QgisInterface
+    def __init__(self):
+        self.window = QMainWindow()
+    def mainWindow(self):
+        return self.window
+    def addPluginToMenu(self, menu, action):
+        pass
+    def addToolBarIcon(self, action):
+        pass
+    def addDockWidget(self, area, dock):
+        self.window.addDockWidget(area, dock)
+    def removeDockWidget(self, dock):
+        self.window.removeDockWidget(dock)
+    def removePluginMenu(self, menu, action):
+        pass
+    def removeToolBarIcon(self, action):
+        pass
+
+
+timings = {{}}
+start = time.perf_counter()
+package = importlib.import_module({name!r})
+plugin = package.classFactory(FakeIface())
+plugin.initGui()
+timings["startup"] = (time.perf_counter() - start) * 1000
+timings["widget_modules_loaded"] = {name!r} + ".calculator_widget" in sys.modules
+if {eager!r}:
+    # What startup used to cost: the widget and help modules imported eagerly
+    start = time.perf_counter()
+    importlib.import_module({name!r} + ".calculator_widget")
+    importlib.import_module({name!r} + ".help_window")
+    timings["eager_widget_imports"] = (time.perf_counter() - start) * 1000
+else:
+    start = time.perf_counter()
+    plugin.toggle_calculator()
+    timings["first_toggle"] = (time.perf_counter() - start) * 1000
+plugin.calculator_dock and plugin.calculator_dock.widget().shutdown()
+print(json.dumps(timings))
+"""
+
+
+def run_child(eager):
+    """Run one cold-start measurement and return its timings"""
+    code = _CHILD.format(parent=str(PLUGIN_DIR.parent), name=PLUGIN_DIR.name, eager=eager)
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    lazy = [run_child(eager=False) for _ in range(RUNS)]
+    eager = [run_child(eager=True) for _ in range(RUNS)]
+    startup = median([t["startup"] for t in lazy])
+    eager_extra = median([t["eager_widget_imports"] for t in eager])
+    first_toggle = median([t["first_toggle"] for t in lazy])
+    print(f"widget modules loaded at startup: {lazy[0]['widget_modules_loaded']}")
+    print(f"startup (classFactory + initGui) : {startup:8.2f} ms")
+    print(f"startup with eager widget imports: {startup + eager_extra:8.2f} ms")
+    print(f"first toggle_calculator          : {first_toggle:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
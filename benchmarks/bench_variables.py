@@ -0,0 +1,49 @@
+"""
+Benchmark: variable recalculation
+Cost of changing one input of a chain of formula variables
+
+A chain v1 = v0 + 1, v2 = v1 * 1.0001, ... is defined once; changing a
+variable near the end of the chain must only recompute the few formulas
+after it, while changing v0 recomputes all of them.
+Run from the plugin directory (needs only the Python standard library):
+    python benchmarks/bench_variables.py
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+
+# Make the Qt-free engine package importable without loading the plugin
+sys.path.insert(0, str(PLUGIN_DIR))
+
+from engine import CalculatorEngine  # noqa: E402
+
+CHAIN = 1000
+NUMBER = 50
+
+
+def main():
+    engine = CalculatorEngine()
+    graph = engine.variable_graph
+    engine.calculate("v0 = 1")
+    for index in range(1, CHAIN):
+        engine.assign(f"v{index}", f"v{index - 1}*1.0001+1")
+
+    for name in ("v0", f"v{CHAIN // 2}", f"v{CHAIN - 5}"):
+        value = [0.0]
+
+        def change():
+            value[0] += 1
+            graph.set_value(name, value[0])
+
+        total = timeit.timeit(change, number=NUMBER)
+        recomputed = len(graph.last_recomputed)
+        print(f"change {name:>5} : {total / NUMBER * 1e3:8.3f} ms, "
+              f"{recomputed:4d} of {CHAIN - 1} formulas recomputed")
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark suite configuration
+Headless Qt setup, the benchmark fixture and JSON baselines for the pytest suite
+
+Run from the plugin directory (needs PyQt5 and pytest, no QGIS required):
+    python -m pytest benchmarks                          # measure and report
+    python -m pytest benchmarks --bench-save main        # store baselines/main.json
+    python -m pytest benchmarks --bench-compare main     # report changes, fail on regressions
+"""
+
+import importlib
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Must be set before Qt is loaded: no display is needed
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import baseline  # noqa: E402
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+
+# The plugin is imported as a package, as QGIS does
+sys.path.insert(0, str(PLUGIN_DIR.parent))
+
+# Rounds per benchmark, and the shortest time a round is calibrated to take
+ROUNDS = 7
+MIN_ROUND_TIME = 0.01
+
+_results = {}  # Benchmark name -> statistics of this run
+_report = {}  # "saved": baseline path, "comparison": baseline.compare() rows
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--bench-save", metavar="NAME",
+                    help="Save results as a JSON baseline (a name or a .json path)")
+    group.addoption("--bench-compare", metavar="NAME",
+                    help="Compare results with a saved baseline and fail on regressions")
+    group.addoption("--bench-threshold", type=float, default=baseline.DEFAULT_THRESHOLD,
+                    help="Relative slowdown of the median counted as a regression "
+                         "(default %(default)s)")
+
+
+def pytest_configure(config):
+    name = config.getoption("--bench-compare")
+    if name and not baseline.resolve(name).exists():
+        raise pytest.UsageError(f"No baseline at {baseline.resolve(name)}; "
+                                f"create one with --bench-save {name}")
+
+
+class Benchmark:
+    """Times a callable and records the result under the test's name
+
+    Each round runs the callable enough times to take at least
+    MIN_ROUND_TIME, after one untimed warm-up call, and the time per call
+    of every round is kept. With a setup function, every call is timed on
+    its own after running setup (for measurements that need fresh state).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stats = None
+
+    def __call__(self, func, *args, setup=None, rounds=ROUNDS):
+        """
+        Time func(*args)
+
+        Args:
+            func: Callable to measure
+            args: Positional arguments for func
+            setup: Optional callable run (untimed) before every call
+            rounds: Number of timed rounds
+
+        Returns:
+            The result of the last call
+        """
+        if setup is not None:
+            samples = []
+            for _ in range(rounds):
+                setup()
+                start = time.perf_counter()
+                result = func(*args)
+                samples.append(time.perf_counter() - start)
+            self.record(samples)
+            return result
+
+        result = func(*args)
+        number = 1
+        while True:
+            elapsed = self._time(func, args, number)
+            if elapsed >= MIN_ROUND_TIME or number >= 1000000:
+                break
+            number *= 10 if elapsed < MIN_ROUND_TIME / 10 else 2
+        samples = [elapsed / number]
+        for _ in range(rounds - 1):
+            samples.append(self._time(func, args, number) / number)
+        self.record(samples)
+        return result
+
+    def record(self, samples):
+        """
+        Record timings measured elsewhere (e.g. in a child process)
+
+        Args:
+            samples: Seconds per call, one per round
+        """
+        self.stats = baseline.summarize(samples)
+        _results[self.name] = self.stats
+
+    @staticmethod
+    def _time(func, args, number):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        return time.perf_counter() - start
+
+
+@pytest.fixture
+def benchmark(request):
+    """Benchmark recorded as <module>::<test name>"""
+    return Benchmark(f"{Path(request.node.fspath).stem}::{request.node.name}")
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """The QApplication shared by all widget benchmarks"""
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope="session")
+def plugin():
+    """Import a plugin module by name, e.g. plugin("calculator_widget")"""
+    return lambda module: importlib.import_module(f"{PLUGIN_DIR.name}.{module}")
+
+
+@pytest.fixture
+def widget(qapp, plugin):
+    """A shown calculator widget with a throwaway history"""
+    widget = plugin("calculator_widget").CalculatorWidget(history_path=":memory:")
+    widget.show()
+    qapp.processEvents()
+    yield widget
+    widget.shutdown()
+    widget.close()
+    widget.deleteLater()
+    qapp.processEvents()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    name = config.getoption("--bench-save")
+    if name and _results:
+        _report["saved"] = baseline.save(name, _results)
+    name = config.getoption("--bench-compare")
+    if name and _results:
+        rows = baseline.compare(baseline.load(name), _results, config.getoption("--bench-threshold"))
+        _report["comparison"] = rows
+        if any(status == "regressed" for *_, status in rows):
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not _results:
+        return
+    terminalreporter.section("benchmarks")
+    rows = _report.get("comparison")
+    lines = baseline.format_comparison(rows) if rows else baseline.format_results(_results)
+    for line in lines:
+        terminalreporter.write_line(line)
+    regressed = sum(status == "regressed" for *_, status in rows or ())
+    if regressed:
+        threshold = config.getoption("--bench-threshold")
+        terminalreporter.write_line(
+            f"{regressed} benchmark{'s' if regressed > 1 else ''} slower than the baseline "
+            f"by more than {threshold:.0%}", red=True)
+    saved = _report.get("saved")
+    if saved:
+        terminalreporter.write_line(f"baseline saved to {saved}")
@@ -0,0 +1,57 @@
+"""
+Benchmarks: history panel
+Adding calculations and refreshing the history view at different history sizes
+"""
+
+import itertools
+
+import pytest
+
+SIZES = (10, 100, 966)
+
+
+def fill(widget, size):
+    """Give the widget a full history of size distinct calculations"""
+    widget.max_history = size
+    for i in range(size):
+        widget.add_to_history(f"{i}*3.5+{i}", f"{i * 4.5}")
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_add_to_history(benchmark, widget, qapp, size):
+    """A new calculation on a full history: one row inserted, the oldest evicted"""
+    fill(widget, size)
+    numbers = itertools.count(size)
+
+    def add():
+        i = next(numbers)
+        widget.add_to_history(f"{i}*3.5+{i}", f"{i * 4.5}")
+        qapp.processEvents()
+
+    benchmark(add)
+    assert len(widget.engine.history) == size
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_add_repeat_to_history(benchmark, widget, qapp, size):
+    """A repeated calculation: its existing row counted and moved to the top"""
+    fill(widget, size)
+
+    def add():
+        widget.add_to_history("0*3.5+0", "0.0")
+        qapp.processEvents()
+
+    benchmark(add)
+    assert len(widget.engine.history) == size
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_update_history_display(benchmark, widget, qapp, size):
+    """Full refresh of the history view, including the repaint"""
+    fill(widget, size)
+
+    def refresh():
+        widget.update_history_display()
+        qapp.processEvents()
+
+    benchmark(refresh)
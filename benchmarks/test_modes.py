@@ -0,0 +1,44 @@
+"""
+Benchmarks: mode switching
+toggle_mode round trips through simple, advanced and worksheet mode
+"""
+
+
+def round_trip(widget):
+    """Toggle through every mode back to the starting one"""
+    start = widget.mode
+    widget.toggle_mode()
+    while widget.mode != start:
+        widget.toggle_mode()
+
+
+def test_toggle_mode_round_trip(benchmark, widget, qapp):
+    """Switching between pages that are already built"""
+    def toggle():
+        round_trip(widget)
+        qapp.processEvents()
+
+    benchmark(toggle)
+    assert widget.mode == "simple"
+
+
+def test_first_toggle_mode_round_trip(benchmark, qapp, plugin):
+    """The first round trip of a new widget, which builds the advanced and worksheet pages"""
+    widget_class = plugin("calculator_widget").CalculatorWidget
+    widgets = []
+
+    def new_widget():
+        widget = widget_class(history_path=":memory:")
+        widget.show()
+        qapp.processEvents()
+        widgets.append(widget)
+
+    def toggle():
+        round_trip(widgets[-1])
+        qapp.processEvents()
+
+    benchmark(toggle, setup=new_widget, rounds=5)
+    for widget in widgets:
+        widget.shutdown()
+        widget.deleteLater()
+    qapp.processEvents()
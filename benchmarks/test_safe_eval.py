@@ -0,0 +1,55 @@
+"""
+Benchmarks: expression evaluation
+CalculatorWidget.safe_eval on realistic and pathological expressions
+"""
+
+import pytest
+
+# Expressions as typed on the keypad or keyboard
+REALISTIC = {
+    "arithmetic": "7+8*9",
+    "parentheses": "(2+3)*4-1/8",
+    "powers": "√(16)+5x²-3x³",
+    "trigonometry": "sin(0.5)^2+cos(0.5)^2",
+    "logarithms": "log(1000)+ln(20)*π",
+    "factorial_percent": "12!/10!+50%",
+    "decimals": "((1.5+2.25)*(3.75-0.5))/(4^2-1)",
+    "geodesic": "distance(52.52, 13.405, 48.8566, 2.3522)",
+    "aggregate": "mean(1, 2, 3, 4, 5)",
+}
+
+# Inputs that are slow, deep or fail
+PATHOLOGICAL = {
+    "nested_200": "(" * 200 + "1" + ")" * 200,
+    "sum_1000_terms": "+".join(["1.5"] * 1000),
+    "signs_50": "-" * 50 + "1",
+    "factorial_170": "170!",
+    "huge_power": "10^400",
+    "tower_overflow": "9^9^9",
+    "division_by_zero": "1/0",
+    "domain_error": "√(-1)",
+    "syntax_error": "2^^3",
+}
+
+CORPUS = {**REALISTIC, **PATHOLOGICAL}
+
+
+@pytest.mark.parametrize("expression", CORPUS.values(), ids=CORPUS.keys())
+def test_safe_eval_cached(benchmark, widget, expression):
+    """Repeated evaluation, answered from the result cache"""
+    result = benchmark(widget.safe_eval, expression)
+    assert result
+
+
+@pytest.mark.parametrize("expression", CORPUS.values(), ids=CORPUS.keys())
+def test_safe_eval_uncached(benchmark, widget, plugin, expression):
+    """First evaluation: parse, compile and evaluate"""
+    compile_cache = plugin("engine.compiler").compile_cache
+
+    def clear_caches():
+        widget.engine.result_cache.clear()
+        compile_cache.clear()
+
+    widget.safe_eval(expression)  # Load lazily imported modules (NumPy for geodesic)
+    result = benchmark(widget.safe_eval, expression, setup=clear_caches, rounds=21)
+    assert result
@@ -0,0 +1,57 @@
+"""
+Benchmarks: cold start
+Plugin initGui, the first toggle_calculator and the first HelpWindow, timed in fresh interpreters
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bench_startup import PLUGIN_DIR, run_child
+
+RUNS = 5
+
+# Runs in a child interpreter; prints the seconds the first HelpWindow took
+_HELP_CHILD = r"""
+import importlib, sys, time
+sys.path.insert(0, {parent!r})
+from PyQt5.QtWidgets import QApplication
+app = QApplication([])
+start = time.perf_counter()
+help_window = importlib.import_module({name!r} + ".help_window")
+window = help_window.HelpWindow()
+print(time.perf_counter() - start)
+"""
+
+
+@pytest.fixture(scope="module")
+def cold_starts():
+    """Timings (ms) of RUNS fresh plugin loads, each followed by the first toggle_calculator"""
+    return [run_child(eager=False) for _ in range(RUNS)]
+
+
+def test_plugin_startup(benchmark, cold_starts):
+    """classFactory and initGui, as at QGIS startup"""
+    benchmark.record([timings["startup"] / 1000 for timings in cold_starts])
+    # initGui must not import the widget
+    assert not cold_starts[0]["widget_modules_loaded"]
+
+
+def test_first_toggle_calculator(benchmark, cold_starts):
+    """First toggle_calculator: imports and builds the calculator dock"""
+    benchmark.record([timings["first_toggle"] / 1000 for timings in cold_starts])
+
+
+def test_first_help_window(benchmark):
+    """Import and construction of the first HelpWindow"""
+    code = _HELP_CHILD.format(parent=str(PLUGIN_DIR.parent), name=PLUGIN_DIR.name)
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    samples = []
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    benchmark.record(samples)
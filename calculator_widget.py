@@ -5,25 +5,116 @@ Provides the UI and functionality for the calculator panel
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QPushButton,
-    QLineEdit, QLabel, QListWidget, QListWidgetItem
+    QLineEdit, QLabel, QListView, QStackedWidget, QComboBox, QSpinBox, QPlainTextEdit
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QStandardPaths, QTimer
+from PyQt5.QtGui import QFont, QFontDatabase, QKeySequence, QTextCursor
 from PyQt5.QtWidgets import QApplication
-import math
-from .help_window import HelpWindow
+from pathlib import Path
+from .history_model import HistoryModel
+from .async_evaluator import AsyncEvaluator
+from .engine import ExpressionError, normalize_expression
+from .engine.calculator import (
+    CLIPBOARD_LIST, FAILURE_TEXTS, HISTORY_LIST, MEMORY_BUTTONS, CalculatorEngine
+)
+from .engine.evaluation import OVERFLOW_TEXT
+from .engine.incremental import IncrementalEvaluator
+from .engine.precision import DECIMAL, FLOAT, FRACTION, MAX_DIGITS, MIN_DIGITS, get_precision
+from .engine.worksheet import Worksheet
+
+
+# Button grids for each mode: (text, row, col[, rowspan, colspan])
+BUTTON_GRIDS = {
+    "simple": {
+        "font_size": 12,
+        "buttons": [
+            ("7", 0, 0), ("8", 0, 1), ("9", 0, 2), ("/", 0, 3),
+            ("4", 1, 0), ("5", 1, 1), ("6", 1, 2), ("*", 1, 3),
+            ("1", 2, 0), ("2", 2, 1), ("3", 2, 2), ("-", 2, 3),
+            ("0", 3, 0), (".", 3, 1), ("=", 3, 2), ("+", 3, 3),
+            ("C", 4, 0, 1, 2), ("DEL", 4, 2, 1, 2),
+        ],
+    },
+    "advanced": {
+        "font_size": 11,
+        "buttons": [
+            ("7", 0, 0), ("8", 0, 1), ("9", 0, 2), ("/", 0, 3), ("√", 0, 4),
+            ("4", 1, 0), ("5", 1, 1), ("6", 1, 2), ("*", 1, 3), ("x²", 1, 4),
+            ("1", 2, 0), ("2", 2, 1), ("3", 2, 2), ("-", 2, 3), ("x³", 2, 4),
+            ("0", 3, 0), (".", 3, 1), ("=", 3, 2), ("+", 3, 3), ("%", 3, 4),
+            ("sin", 4, 0), ("cos", 4, 1), ("tan", 4, 2), ("log", 4, 3), ("ln", 4, 4),
+            ("(", 5, 0), (")", 5, 1), ("x!", 5, 2), ("^", 5, 3), ("e", 5, 4),
+            ("MC", 6, 0), ("MR", 6, 1), ("M+", 6, 2), ("M-", 6, 3), ("ans", 6, 4),
+            ("distance", 7, 0), ("bearing", 7, 1), ("geoarea", 7, 2), ("dms", 7, 3), ("deg", 7, 4),
+            ("C", 8, 0, 1, 2), (",", 8, 2), ("DEL", 8, 3, 1, 2),
+        ],
+    },
+}
+
+# Modes toggle_mode cycles through, and the mode button's label in each
+MODE_CYCLE = ("simple", "advanced", "worksheet")
+MODE_BUTTON_TEXTS = {
+    "simple": "Advanced Calculator",
+    "advanced": "Worksheet",
+    "worksheet": "Simple Calculator",
+}
+
+# Seconds of worksheet evaluation per event-loop pass
+WORKSHEET_SLICE = 0.02
+
+# Button roles and their colours, applied through one stylesheet on the button stack
+BUTTON_ROLES = {
+    "operator": ("+", "-", "*", "/", "^"),
+    "equals": ("=",),
+    "clear": ("C", "DEL"),
+    "function": ("√", "x²", "x³", "sin", "cos", "tan", "log", "ln", "x!", "π", "e", "%"),
+    "geodesic": ("distance", "bearing", "geoarea", "dms", "deg"),
+    "paren": ("(", ")", ","),
+    "memory": ("MC", "MR", "M+", "M-", "ans"),
+}
+BUTTON_STYLESHEET = (
+    'QPushButton[role="operator"] { background-color: #ff9800; color: white; font-weight: bold; }'
+    'QPushButton[role="equals"] { background-color: #4caf50; color: white; font-weight: bold; }'
+    'QPushButton[role="clear"] { background-color: #f44336; color: white; font-weight: bold; }'
+    'QPushButton[role="function"] { background-color: #2196f3; color: white; font-weight: bold; }'
+    'QPushButton[role="geodesic"] { background-color: #009688; color: white; font-weight: bold; }'
+    'QPushButton[role="paren"] { background-color: #9c27b0; color: white; font-weight: bold; }'
+    'QPushButton[role="memory"] { background-color: #607d8b; color: white; font-weight: bold; }'
+)
+
+
+def button_role(text):
+    """Return the style role of a button label, or None for plain buttons"""
+    for role, labels in BUTTON_ROLES.items():
+        if text in labels:
+            return role
+    return None
+
+
+def default_history_path():
+    """Location of the persistent history database in the user's data directory"""
+    data_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    return str(Path(data_dir) / "orca" / "history.sqlite")
 
 
 class CalculatorWidget(QWidget):
     """Main calculator widget that displays as a dockable panel"""
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, history_path=None):
         super().__init__(parent)
-        self.expression = ""
+        # Expression, evaluation settings, result cache and history live in the
+        # Qt-free engine; this widget only displays them and forwards input
+        self.engine = CalculatorEngine(history_path or default_history_path())
+        self.mode = "simple"
         self.advanced_mode = False
+        self.worksheet = None  # Built with the worksheet page on first use
+        self.worksheet_evaluator = None  # Background evaluation of expensive worksheet lines
+        self.worksheet_job = None  # (job id, worksheet token) in flight
         self.help_window = None
-        self.history = []  # Store calculation history
-        self.max_history = 966  # Maximum history items to keep
+        self.evaluator = AsyncEvaluator(timeout_ms=5000, parent=self)  # Background evaluation
+        self.evaluator.finished.connect(self.on_evaluation_finished)
+        self.pending_job = None
+        self.pending_expression = None
         self.init_ui()
         # Set focus to receive keyboard events
         self.setFocusPolicy(Qt.StrongFocus)
@@ -51,18 +142,38 @@ class CalculatorWidget(QWidget):
         history_title.setFont(history_title_font)
         history_layout.addWidget(history_title)
         
-        # History list widget
-        self.history_list = QListWidget()
+        # History search box (filters through the history store's search index)
+        self.history_search = QLineEdit()
+        self.history_search.setPlaceholderText("Search history...")
+        self.history_search.setClearButtonEnabled(True)
+        self.history_search.textChanged.connect(self.filter_history)
+        history_layout.addWidget(self.history_search)
+        
+        # History list view (most recent first), updated incrementally by the model
+        self.history_model = HistoryModel(self.engine.history, self)
+        self.engine.history_writer = self.history_model.append
+        self.history_list = QListView()
+        self.history_list.setModel(self.history_model)
+        self.history_list.setUniformItemSizes(True)
         self.history_list.setMaximumHeight(100)
-        self.history_list.itemClicked.connect(self.on_history_item_clicked)
+        self.history_list.clicked.connect(self.on_history_item_clicked)
         history_layout.addWidget(self.history_list)
         
-        # Clear history button
+        # Clear history button, and loading the results as a value list ("hist")
+        history_buttons = QHBoxLayout()
         clear_history_btn = QPushButton("Clear History")
         clear_history_btn.setMinimumHeight(20)
         clear_history_btn.setMaximumHeight(22)
         clear_history_btn.clicked.connect(self.clear_history)
-        history_layout.addWidget(clear_history_btn)
+        history_buttons.addWidget(clear_history_btn)
+        history_list_btn = QPushButton("History as List")
+        history_list_btn.setMinimumHeight(20)
+        history_list_btn.setMaximumHeight(22)
+        history_list_btn.setToolTip(f"Use the history results as the value list '{HISTORY_LIST}', "
+                                    f"e.g. mean({HISTORY_LIST})")
+        history_list_btn.clicked.connect(self.use_history_as_list)
+        history_buttons.addWidget(history_list_btn)
+        history_layout.addLayout(history_buttons)
         
         self.main_layout.addLayout(history_layout)
         
@@ -72,6 +183,21 @@ class CalculatorWidget(QWidget):
         self.mode_button.clicked.connect(self.toggle_mode)
         help_button = QPushButton("Help")
         help_button.clicked.connect(self.show_help)
+        
+        # Precision selector: float by default, Decimal/Fraction with N digits
+        self.precision_combo = QComboBox()
+        for label, mode in (("Float", FLOAT), ("Decimal", DECIMAL), ("Fraction", FRACTION)):
+            self.precision_combo.addItem(label, mode)
+        self.precision_combo.setToolTip("Number system used for results")
+        self.precision_combo.currentIndexChanged.connect(self.on_precision_changed)
+        self.digits_spin = QSpinBox()
+        self.digits_spin.setRange(MIN_DIGITS, MAX_DIGITS)
+        self.digits_spin.setValue(self.engine.precision_digits)
+        self.digits_spin.setSuffix(" digits")
+        self.digits_spin.setEnabled(False)
+        self.digits_spin.valueChanged.connect(self.on_precision_changed)
+        mode_layout.addWidget(self.precision_combo)
+        mode_layout.addWidget(self.digits_spin)
         mode_layout.addStretch()
         mode_layout.addWidget(self.mode_button)
         mode_layout.addWidget(help_button)
@@ -88,48 +214,87 @@ class CalculatorWidget(QWidget):
         self.display.setText("0")
         self.main_layout.addWidget(self.display)
         
-        # Copy button
+        # Edits update the buffer; the display is refreshed at most once per
+        # event-loop pass, so long pastes and fast typing cost one setText
+        self.display_timer = QTimer(self)
+        self.display_timer.setSingleShot(True)
+        self.display_timer.setInterval(0)
+        self.display_timer.timeout.connect(self.refresh_display)
+        
+        # Live result preview, re-evaluated once per event-loop pass while typing
+        self.preview = QLabel("")
+        self.preview.setAlignment(Qt.AlignRight)
+        self.preview.setStyleSheet("color: #757575;")
+        self.main_layout.addWidget(self.preview)
+        self.preview_evaluator = IncrementalEvaluator()
+        self.preview_evaluator.variables = self.engine.variables
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(0)
+        self.preview_timer.timeout.connect(self.update_preview)
+        self.display.textChanged.connect(self.preview_timer.start)
+        
+        # Variables (e.g. sent from a layer selection), hidden until there are any
+        self.variables_label = QLabel("")
+        self.variables_label.setWordWrap(True)
+        self.variables_label.setStyleSheet("color: #757575;")
+        self.variables_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.variables_label.hide()
+        self.main_layout.addWidget(self.variables_label)
+        
+        # Copy button, and pasting a column of numbers as a value list ("clip")
+        clipboard_layout = QHBoxLayout()
         copy_btn = QPushButton("Copy")
         copy_btn.setMaximumHeight(22)
         copy_btn.setMinimumHeight(20)
         copy_btn.clicked.connect(self.copy_to_clipboard)
-        self.main_layout.addWidget(copy_btn)
+        clipboard_layout.addWidget(copy_btn)
+        paste_list_btn = QPushButton("Paste List")
+        paste_list_btn.setMaximumHeight(22)
+        paste_list_btn.setMinimumHeight(20)
+        paste_list_btn.setToolTip(f"Use the numbers on the clipboard as the value list "
+                                  f"'{CLIPBOARD_LIST}', e.g. mean({CLIPBOARD_LIST})")
+        paste_list_btn.clicked.connect(self.paste_list)
+        clipboard_layout.addWidget(paste_list_btn)
+        column_btn = QPushButton("Apply to Column")
+        column_btn.setMaximumHeight(22)
+        column_btn.setMinimumHeight(20)
+        column_btn.setToolTip("Evaluate the expression for each row on the clipboard (value is "
+                              "the first column, or use the header names) and copy the results")
+        column_btn.clicked.connect(self.apply_to_column)
+        clipboard_layout.addWidget(column_btn)
+        self.main_layout.addLayout(clipboard_layout)
         
-        # Calculator buttons
-        self.button_container = QWidget()
-        self.button_layout = QVBoxLayout()
-        self.button_container.setLayout(self.button_layout)
-        self.main_layout.addWidget(self.button_container)
+        # Calculator buttons: one page per mode, each built on first use
+        self.button_stack = QStackedWidget()
+        self.button_stack.setStyleSheet(BUTTON_STYLESHEET)
+        self.button_pages = {}
+        self._button_fonts = {}
+        self.main_layout.addWidget(self.button_stack)
         
-        # Create simple calculator buttons
-        self.create_simple_buttons()
+        # Show simple calculator buttons
+        self.show_button_page("simple")
         
         self.setLayout(self.main_layout)
     
-    def create_simple_buttons(self):
-        """Create simple calculator buttons"""
-        # Clear previous layout
-        while self.button_layout.count():
-            item = self.button_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-            elif item.layout():
-                self._clear_layout(item.layout())
-        
-        # Button grid layout
+    def create_button_page(self, mode):
+        """
+        Build the button grid for a mode from the BUTTON_GRIDS table
+        
+        Args:
+            mode: Key into BUTTON_GRIDS ("simple" or "advanced")
+            
+        Returns:
+            QWidget holding the button grid
+        """
+        spec = BUTTON_GRIDS[mode]
+        page = QWidget()
         grid = QGridLayout()
         grid.setSpacing(5)
+        grid.setContentsMargins(0, 0, 0, 0)
+        btn_font = self._button_font(spec["font_size"])
         
-        # Define buttons: (text, row, col, rowspan, colspan)
-        buttons = [
-            ("7", 0, 0), ("8", 0, 1), ("9", 0, 2), ("/", 0, 3),
-            ("4", 1, 0), ("5", 1, 1), ("6", 1, 2), ("*", 1, 3),
-            ("1", 2, 0), ("2", 2, 1), ("3", 2, 2), ("-", 2, 3),
-            ("0", 3, 0), (".", 3, 1), ("=", 3, 2), ("+", 3, 3),
-            ("C", 4, 0, 1, 2), ("DEL", 4, 2, 1, 2),
-        ]
-        
-        for button_data in buttons:
+        for button_data in spec["buttons"]:
             text = button_data[0]
             row = button_data[1]
             col = button_data[2]
@@ -138,317 +303,480 @@ class CalculatorWidget(QWidget):
             
             btn = QPushButton(text)
             btn.setMinimumHeight(45)
-            btn_font = QFont()
-            btn_font.setPointSize(12)
             btn.setFont(btn_font)
             btn.clicked.connect(lambda checked, t=text: self.on_button_click(t))
             
-            # Style operator buttons differently
-            if text in "+-*/" and text != "C" and text != "DEL":
-                btn.setStyleSheet("background-color: #ff9800; color: white; font-weight: bold;")
-            elif text == "=":
-                btn.setStyleSheet("background-color: #4caf50; color: white; font-weight: bold;")
-            elif text in ["C", "DEL"]:
-                btn.setStyleSheet("background-color: #f44336; color: white; font-weight: bold;")
+            # Styled through the shared stylesheet, selected by role
+            role = button_role(text)
+            if role:
+                btn.setProperty("role", role)
             
             grid.addWidget(btn, row, col, rowspan, colspan)
         
-        self.button_layout.addLayout(grid)
+        page.setLayout(grid)
+        return page
+    
+    def _button_font(self, point_size):
+        """Return a shared button font of the given size"""
+        font = self._button_fonts.get(point_size)
+        if font is None:
+            font = QFont()
+            font.setPointSize(point_size)
+            self._button_fonts[point_size] = font
+        return font
     
-    def create_advanced_buttons(self):
-        """Create advanced calculator buttons"""
-        # Clear previous layout
-        while self.button_layout.count():
-            item = self.button_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-            elif item.layout():
-                self._clear_layout(item.layout())
+    def show_button_page(self, mode):
+        """Switch the button stack to a mode, building its page if needed"""
+        page = self.button_pages.get(mode)
+        if page is None:
+            page = self.create_worksheet_page() if mode == "worksheet" else self.create_button_page(mode)
+            self.button_pages[mode] = page
+            self.button_stack.addWidget(page)
+        self.button_stack.setCurrentWidget(page)
+    
+    def create_worksheet_page(self):
+        """
+        Build the worksheet page: a multi-line editor with each line's result beside it
         
-        # Main grid layout
-        grid = QGridLayout()
-        grid.setSpacing(5)
+        Returns:
+            QWidget holding the editor and the results
+        """
+        self.worksheet = Worksheet(self.engine, background=True)
+        self.worksheet_evaluator = AsyncEvaluator(timeout_ms=5000, parent=self)
+        self.worksheet_evaluator.finished.connect(self.on_worksheet_job_finished)
+        page = QWidget()
+        layout = QHBoxLayout()
+        layout.setSpacing(5)
+        layout.setContentsMargins(0, 0, 0, 0)
+        font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
         
-        # Define advanced buttons
-        buttons = [
-            ("7", 0, 0), ("8", 0, 1), ("9", 0, 2), ("/", 0, 3), ("√", 0, 4),
-            ("4", 1, 0), ("5", 1, 1), ("6", 1, 2), ("*", 1, 3), ("x²", 1, 4),
-            ("1", 2, 0), ("2", 2, 1), ("3", 2, 2), ("-", 2, 3), ("x³", 2, 4),
-            ("0", 3, 0), (".", 3, 1), ("=", 3, 2), ("+", 3, 3), ("%", 3, 4),
-            ("sin", 4, 0), ("cos", 4, 1), ("tan", 4, 2), ("log", 4, 3), ("ln", 4, 4),
-            ("(", 5, 0), (")", 5, 1), ("x!", 5, 2), ("^", 5, 3), ("e", 5, 4),
-            ("C", 6, 0, 1, 2), ("DEL", 6, 2, 1, 3),
-        ]
+        self.worksheet_editor = QPlainTextEdit()
+        self.worksheet_editor.setPlaceholderText("area = 1234.5\nrate = area * 0.3\nline2 * 12")
+        self.worksheet_results = QPlainTextEdit()
+        self.worksheet_results.setReadOnly(True)
+        self.worksheet_results.setUndoRedoEnabled(False)
+        self.worksheet_results.setStyleSheet("color: #757575;")
+        self.worksheet_results.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        for edit in (self.worksheet_editor, self.worksheet_results):
+            edit.setFont(font)
+            edit.setLineWrapMode(QPlainTextEdit.NoWrap)
+        # Both scroll by lines, so one scroll position keeps results beside their lines
+        self.worksheet_editor.verticalScrollBar().valueChanged.connect(
+            self.worksheet_results.verticalScrollBar().setValue)
+        self.worksheet_editor.textChanged.connect(self.on_worksheet_edited)
+        layout.addWidget(self.worksheet_editor, 3)
+        layout.addWidget(self.worksheet_results, 2)
         
-        for button_data in buttons:
-            text = button_data[0]
-            row = button_data[1]
-            col = button_data[2]
-            rowspan = button_data[3] if len(button_data) > 3 else 1
-            colspan = button_data[4] if len(button_data) > 4 else 1
-            
-            btn = QPushButton(text)
-            btn.setMinimumHeight(45)
-            btn_font = QFont()
-            btn_font.setPointSize(11)
-            btn.setFont(btn_font)
-            btn.clicked.connect(lambda checked, t=text: self.on_button_click(t))
-            
-            # Style buttons differently based on type
-            if text in "+-*/^":
-                btn.setStyleSheet("background-color: #ff9800; color: white; font-weight: bold;")
-            elif text == "=":
-                btn.setStyleSheet("background-color: #4caf50; color: white; font-weight: bold;")
-            elif text in ["C", "DEL"]:
-                btn.setStyleSheet("background-color: #f44336; color: white; font-weight: bold;")
-            elif text in ["√", "x²", "x³", "sin", "cos", "tan", "log", "ln", "x!", "π", "e", "%"]:
-                btn.setStyleSheet("background-color: #2196f3; color: white; font-weight: bold;")
-            elif text in ["(", ")"]:
-                btn.setStyleSheet("background-color: #9c27b0; color: white; font-weight: bold;")
-            
-            grid.addWidget(btn, row, col, rowspan, colspan)
+        # Dirty lines are evaluated a slice at a time between event-loop passes
+        self.worksheet_timer = QTimer(self)
+        self.worksheet_timer.setSingleShot(True)
+        self.worksheet_timer.setInterval(0)
+        self.worksheet_timer.timeout.connect(self.run_worksheet)
         
-        self.button_layout.addLayout(grid)
+        page.setLayout(layout)
+        return page
     
     def toggle_mode(self):
-        """Toggle between simple and advanced mode"""
-        self.advanced_mode = not self.advanced_mode
+        """Cycle through simple, advanced and worksheet mode"""
+        self.mode = MODE_CYCLE[(MODE_CYCLE.index(self.mode) + 1) % len(MODE_CYCLE)]
+        self.advanced_mode = self.mode == "advanced"
+        self.mode_button.setText(MODE_BUTTON_TEXTS[self.mode])
+        self.show_button_page(self.mode)
+        if self.mode == "worksheet":
+            self.worksheet_editor.setFocus()
+    
+    def on_worksheet_edited(self):
+        """Mark edited worksheet lines dirty and schedule their evaluation"""
+        changed = self.worksheet.set_text(self.worksheet_editor.toPlainText())
+        self.render_worksheet_lines(changed)
+        self.worksheet_timer.start()
+    
+    def run_worksheet(self):
+        """Evaluate dirty worksheet lines for one slice, showing results as they finish"""
+        self.render_worksheet_lines(self.worksheet.run(WORKSHEET_SLICE))
+        if self.worksheet.pending():
+            self.worksheet_timer.start()
+        self.submit_worksheet_job()
+    
+    def submit_worksheet_job(self):
+        """Send the next expensive worksheet line to the worker, one at a time"""
+        if self.worksheet_job is not None:
+            if self.worksheet.is_waiting(self.worksheet_job[1]):
+                return
+            # Its line was edited or re-evaluated since; the result is not wanted
+            self.worksheet_evaluator.cancel()
+            self.worksheet_job = None
+        job = self.worksheet.next_job()
+        if job is None:
+            return
+        token, formula, values = job
+        mode, digits, formatter, _ = self.engine.evaluation_options()
+        job_id = self.worksheet_evaluator.submit(formula, mode, digits, formatter, values)
+        self.worksheet_job = (job_id, token)
+    
+    def on_worksheet_job_finished(self, job_id, result, value):
+        """Show a worksheet line evaluated by the worker and go on with the lines using it"""
+        if self.worksheet_job is None or job_id != self.worksheet_job[0]:
+            return
+        token = self.worksheet_job[1]
+        self.worksheet_job = None
+        index = self.worksheet.finish(token, result, value)
+        if index is not None:
+            self.render_worksheet_lines([index])
+        self.worksheet_timer.start()
+    
+    def render_worksheet_lines(self, indices):
+        """
+        Show the current results of some worksheet lines
         
-        if self.advanced_mode:
-            self.mode_button.setText("Simple Calculator")
-            self.create_advanced_buttons()
-        else:
-            self.mode_button.setText("Advanced Calculator")
-            self.create_simple_buttons()
-    
-    def _clear_layout(self, layout):
-        """Recursively clear a layout"""
-        while layout.count():
-            item = layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-            elif item.layout():
-                self._clear_layout(item.layout())
+        Args:
+            indices: Line indices whose results changed
+        """
+        results = self.worksheet.results
+        document = self.worksheet_results.document()
+        if document.blockCount() != len(results):
+            # Lines were added or removed: lay out every result again
+            self.worksheet_results.setPlainText("\n".join(results))
+            self.worksheet_results.verticalScrollBar().setValue(
+                self.worksheet_editor.verticalScrollBar().value())
+            return
+        if not indices:
+            return
+        # Replace only the changed lines, as one edit
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        for index in indices:
+            block = document.findBlockByNumber(index)
+            cursor.setPosition(block.position())
+            cursor.setPosition(block.position() + block.length() - 1, QTextCursor.KeepAnchor)
+            cursor.insertText(results[index])
+        cursor.endEditBlock()
+    
+    def refresh_worksheet(self):
+        """Re-evaluate every worksheet line (after the number system or format changed)"""
+        if self.worksheet is not None:
+            self.worksheet.recompute_all()
+            self.worksheet_timer.start()
     
     def show_help(self):
         """Open the help window"""
         if self.help_window is None:
+            # Imported on first use; most sessions never open the help window
+            from .help_window import HelpWindow
             self.help_window = HelpWindow(self)
         self.help_window.exec_()
     
+    def shutdown(self):
+        """Stop background evaluation and close the history store (plugin unload)"""
+        self.evaluator.shutdown()
+        if self.worksheet_evaluator is not None:
+            self.worksheet_evaluator.shutdown()
+        self.engine.close()
+    
     def safe_eval(self, expression):
-        """Safely evaluate mathematical expression"""
-        try:
-            # Replace mathematical constants and functions
-            expression = expression.replace("π", str(math.pi))
-            expression = expression.replace("e", str(math.e))
-            expression = expression.replace("√", "math.sqrt")
-            expression = expression.replace("x²", "**2")
-            expression = expression.replace("x³", "**3")
-            expression = expression.replace("sin", "math.sin")
-            expression = expression.replace("cos", "math.cos")
-            expression = expression.replace("tan", "math.tan")
-            expression = expression.replace("log", "math.log10")
-            expression = expression.replace("ln", "math.log")
-            expression = expression.replace("^", "**")
-            expression = expression.replace("%", "/100")  # Convert % to division by 100
-            
-            # For factorial, we need special handling
-            import re
-            # Find factorial patterns like "5!"
-            def factorial_replace(match):
-                num = match.group(1)
-                return f"math.factorial({num})"
-            expression = re.sub(r'(\d+)!', factorial_replace, expression)
-            
-            # Safely evaluate with restricted builtins
-            safe_dict = {"__builtins__": {}, "math": math}
-            result = eval(expression, safe_dict)  # noqa: S307
-            # Convert to float to ensure consistent formatting
-            result = float(result)
-            
-            # Format the result to avoid scientific notation completely
-            # This prevents issues with 'e' in numbers conflicting with Euler's number 'e'
-            if result == 0:
-                return "0.0"
-            
-            # Use Decimal for better precision with very small numbers
-            from decimal import Decimal
-            decimal_result = Decimal(str(result))
-            
-            # Format without scientific notation
-            # Use enough decimal places to represent the number accurately
-            if abs(result) < 1e-6:
-                # For very small numbers, use more decimal places
-                formatted = f"{result:.15f}".rstrip('0').rstrip('.')
-            else:
-                # For normal numbers, use up to 10 decimal places
-                formatted = f"{result:.10f}".rstrip('0').rstrip('.')
-            
-            # Ensure we have at least one decimal place for consistency
-            if '.' not in formatted:
-                formatted += '.0'
-            
-            return formatted
-        except Exception as e:
-            return "Error"
+        """Safely evaluate mathematical expression, reusing cached results"""
+        return self.engine.evaluate(expression)
+    
+    def set_formatter(self, formatter):
+        """
+        Change how results are formatted
+        
+        Args:
+            formatter: engine.formatting.ResultFormatter
+        """
+        self.cancel_calculation()
+        if self.engine.set_formatter(formatter):
+            self.preview_evaluator.formatter = formatter
+            self.preview_timer.start()
+            self.schedule_display_refresh()
+            self.update_variables_display()
+            self.refresh_worksheet()
+    
+    def set_precision(self, mode, digits=None):
+        """
+        Select the number system for evaluation
+        
+        Args:
+            mode: FLOAT, DECIMAL or FRACTION
+            digits: Significant digits for DECIMAL/FRACTION (None keeps the current value)
+        """
+        self.cancel_calculation()
+        if self.engine.set_precision(mode, digits):
+            engine = self.engine
+            self.preview_evaluator.set_precision(get_precision(engine.precision_mode,
+                                                               engine.precision_digits))
+            self.preview_timer.start()
+            self.update_variables_display()
+            self.refresh_worksheet()
+    
+    def set_variables(self, values):
+        """
+        Define or update named values usable in expressions
+        
+        Args:
+            values: Mapping of variable names to numbers
+        """
+        self.engine.set_variables(values)
+        self.update_variables_display()
+        self.preview_timer.start()
+    
+    def update_variables_display(self):
+        """Show the defined variables, with their formulas, under the preview"""
+        engine = self.engine
+        graph = engine.variable_graph
+        entries = []
+        for name in sorted(set(graph.values).union(graph.formulas)):
+            value = engine.format_value(graph.values[name]) if name in graph.values else "Error"
+            formula = graph.formulas.get(name)
+            entries.append(f"{name} = {formula} = {value}" if formula else f"{name} = {value}")
+        self.variables_label.setText("   ".join(entries))
+        self.variables_label.setVisible(bool(entries))
+        if self.worksheet is not None:
+            # Worksheet lines can use the calculator's variables too
+            self.worksheet_timer.start()
+    
+    def on_precision_changed(self):
+        """Apply the precision selector and digits box"""
+        mode = self.precision_combo.currentData()
+        self.digits_spin.setEnabled(mode != FLOAT)
+        self.set_precision(mode, self.digits_spin.value())
+    
+    def calculate(self, expression):
+        """
+        Evaluate the display expression for "=" and show the result
+        
+        Cheap expressions, cached results and certain overflows are handled
+        immediately; arbitrary-precision work goes to the worker so the GUI
+        thread never blocks.
+        
+        Args:
+            expression: Expression string from the display
+        """
+        if not self.engine.needs_background(expression):
+            self.engine.calculate(expression)
+            self.schedule_display_refresh()
+            self.update_variables_display()
+            return
+        self.pending_expression = expression
+        self.pending_job = self.evaluator.submit(normalize_expression(expression),
+                                                 *self.engine.evaluation_options())
+        self.expression = "Computing..."
+    
+    def on_evaluation_finished(self, job_id, result, value):
+        """Show a result delivered by the background evaluator"""
+        if job_id != self.pending_job:
+            return
+        expression = self.pending_expression
+        self.pending_job = None
+        self.pending_expression = None
+        self.engine.finish(expression, result, value)
+        self.schedule_display_refresh()
+        self.update_variables_display()
+    
+    def cancel_calculation(self):
+        """Cancel an in-flight background calculation and restore the expression"""
+        if self.pending_job is None:
+            return
+        self.evaluator.cancel()
+        self.pending_job = None
+        self.expression = self.pending_expression if self.pending_expression != "0" else ""
+        self.pending_expression = None
+    
+    def update_preview(self):
+        """Evaluate the expression into the preview line (debounced by preview_timer)"""
+        text = self.engine.expression
+        if self.pending_job is not None or text in FAILURE_TEXTS:
+            self.preview.setText("")
+            return
+        preview = self.preview_evaluator.preview(text)
+        self.preview.setText(f"= {preview}" if preview else "")
+    
+    @property
+    def expression(self):
+        """The expression being edited (empty while the display shows 0)"""
+        return self.engine.expression
+    
+    @expression.setter
+    def expression(self, text):
+        self.engine.expression = text
+        self.schedule_display_refresh()
+    
+    def display_text(self):
+        """Text the display shows once pending refreshes have run"""
+        return self.engine.display_text()
+    
+    def schedule_display_refresh(self):
+        """Refresh the display on the next event-loop pass (coalesces edits)"""
+        if not self.display_timer.isActive():
+            self.display_timer.start()
+    
+    def refresh_display(self):
+        """Copy the expression buffer to the display in a single setText"""
+        self.display_timer.stop()
+        text = self.display_text()
+        self.display.setText(text)
+        buffer = self.engine.buffer
+        self.display.setCursorPosition(buffer.cursor if buffer.cursor < len(buffer) else len(text))
+    
+    def paste_from_clipboard(self):
+        """Insert the clipboard text at the cursor in one bulk edit"""
+        self.engine.paste(QApplication.clipboard().text())
+        self.schedule_display_refresh()
     
     def on_button_click(self, text):
         """Handle button clicks"""
-        current = self.display.text()
-        
-        if text == "C":
-            # Clear
-            self.expression = ""
-            self.display.setText("0")
-        elif text == "DEL":
-            # Delete last character
-            if current != "0":
-                current = current[:-1]
-                self.display.setText(current if current else "0")
-                self.expression = current if current != "0" else ""
-        elif text == "=":
-            # Calculate result
-            result = self.safe_eval(current)
-            self.display.setText(result)
-            self.expression = result
-            # Add to history if calculation was successful
-            if result != "Error" and current != "":
-                self.add_to_history(current, result)
-        elif text in ["sin", "cos", "tan", "log", "ln"]:
-            # Trigonometric and logarithmic functions
-            if current == "0":
-                self.display.setText(text + "(")
-            else:
-                self.display.setText(current + text + "(")
-            self.expression = self.display.text()
-        elif text == "√":
-            # Square root
-            if current == "0":
-                self.display.setText("√(")
-            else:
-                self.display.setText(current + "√(")
-            self.expression = self.display.text()
-        elif text == "x²":
-            # Square
-            self.display.setText(current + "x²")
-            self.expression = self.display.text()
-        elif text == "x³":
-            # Cube
-            self.display.setText(current + "x³")
-            self.expression = self.display.text()
-        elif text == "x!":
-            # Factorial
-            self.display.setText(current + "!")
-            self.expression = self.display.text()
-        elif text == "^":
-            # Power
-            self.display.setText(current + "^")
-            self.expression = self.display.text()
-        elif text == "π":
-            # Pi
-            if current == "0":
-                self.display.setText("π")
-            else:
-                self.display.setText(current + "π")
-            self.expression = self.display.text()
-        elif text == "e":
-            # Euler's number
-            if current == "0":
-                self.display.setText("e")
-            else:
-                self.display.setText(current + "e")
-            self.expression = self.display.text()
-        elif text == "%":
-            # Percentage - divide by 100
-            self.display.setText(current + "%")
-            self.expression = self.display.text()
-        elif text in "+-*/.^()":
-            # Operators and parentheses
-            if current == "0" and text not in "().":
-                self.display.setText(text)
-            else:
-                self.display.setText(current + text)
-            self.expression = self.display.text()
+        if self.pending_job is not None:
+            # While computing, C cancels and other input is ignored
+            if text == "C":
+                self.cancel_calculation()
+            return
+        
+        if text == "=":
+            # Calculate result, in the background if it is expensive
+            self.calculate(self.display_text())
         else:
-            # Number
-            if current == "0":
-                self.display.setText(text)
-            else:
-                self.display.setText(current + text)
-            self.expression = self.display.text()
+            self.engine.press(text)
+            self.schedule_display_refresh()
+            if text in MEMORY_BUTTONS:
+                self.update_variables_display()
     
     def keyPressEvent(self, event):
         """Handle keyboard input for the calculator"""
         key = event.key()
         text = event.text()
+        buffer = self.engine.buffer
         
+        # Handle paste (Ctrl+V) as one bulk insertion
+        if event.matches(QKeySequence.Paste):
+            if self.pending_job is None:
+                self.paste_from_clipboard()
         # Handle numbers 0-9
-        if text.isdigit():
+        elif text.isdigit():
             self.on_button_click(text)
-        # Handle operators
-        elif text in "+-*/()":
+        # Handle operators (and the comma between function arguments)
+        elif text and text in "+-*/(),":
             self.on_button_click(text)
         # Handle decimal point
         elif text == ".":
             self.on_button_click(".")
+        # Handle "=" after a variable name as the start of an assignment
+        elif text == "=" and self.pending_job is None and self.engine.starts_assignment():
+            buffer.insert("=")
+            self.schedule_display_refresh()
         # Handle equals with Enter or =
-        elif key == Qt.Key_Return or key == Qt.Key_Equal or text == "=":
+        elif key in (Qt.Key_Return, Qt.Key_Enter) or key == Qt.Key_Equal or text == "=":
             self.on_button_click("=")
         # Handle backspace for delete
         elif key == Qt.Key_Backspace:
             self.on_button_click("DEL")
+        # Handle Delete for the character after the cursor
+        elif key == Qt.Key_Delete:
+            if self.pending_job is None:
+                buffer.delete()
+                self.schedule_display_refresh()
+        # Handle cursor movement
+        elif key in (Qt.Key_Left, Qt.Key_Right, Qt.Key_Home, Qt.Key_End):
+            if self.pending_job is None:
+                if key == Qt.Key_Left:
+                    buffer.move(-1)
+                elif key == Qt.Key_Right:
+                    buffer.move(1)
+                elif key == Qt.Key_Home:
+                    buffer.move_to(0)
+                else:
+                    buffer.move_to(len(buffer))
+                self.schedule_display_refresh()
         # Handle Escape for clear
         elif key == Qt.Key_Escape:
             self.on_button_click("C")
         # Handle ^ for power
         elif text == "^":
             self.on_button_click("^")
-        # For shift+8 (asterisk on some keyboards)
-        elif text == "*":
-            self.on_button_click("*")
-        # For forward slash
-        elif text == "/":
-            self.on_button_click("/")
+        # Handle letters for variable names
+        elif text.isascii() and (text.isalpha() or text == "_"):
+            self.on_button_click(text)
         else:
             super().keyPressEvent(event)
     
+    @property
+    def max_history(self):
+        """Maximum history items to keep"""
+        return self.engine.max_history
+    
+    @max_history.setter
+    def max_history(self, capacity):
+        # Resize now so the view is reset once, not on the next append
+        self.engine.max_history = capacity
+        self.engine.history.resize(capacity)
+        self.update_history_display()
+    
     def add_to_history(self, expression, result):
         """Add a calculation to the history"""
-        history_item = f"{expression} = {result}"
-        self.history.append((expression, result))
-        
-        # Keep only the last max_history items
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
-        
-        # Update the history list widget
-        self.update_history_display()
+        # O(1): the engine appends through the model, which emits a single
+        # row insert (plus a row removal when full)
+        self.engine.add_to_history(expression, result)
     
     def update_history_display(self):
-        """Update the history list widget display"""
-        self.history_list.clear()
-        # Add items in reverse order (most recent first)
-        for expr, result in reversed(self.history):
-            item_text = f"{expr}\n= {result}"
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, (expr, result))  # Store the data
-            self.history_list.addItem(item)
-    
-    def on_history_item_clicked(self, item):
+        """Refresh the whole history view (only needed after bulk changes)"""
+        self.history_model.refresh()
+    
+    def filter_history(self, text):
+        """Filter the history panel to entries matching the search text"""
+        self.history_model.set_filter(text)
+    
+    def on_history_item_clicked(self, index):
         """Handle clicking on a history item to reload it"""
-        expr, result = item.data(Qt.UserRole)
+        expr, result = self.history_model.entry(index.row())
         # Set the display to show the result
-        self.display.setText(result)
-        self.expression = result
+        self.engine.show_formatted(result)
+        self.schedule_display_refresh()
     
     def clear_history(self):
         """Clear the calculation history"""
-        self.history.clear()
-        self.history_list.clear()
+        self.history_model.clear()
+    
+    def set_list(self, name, values):
+        """
+        Define a value list for the aggregate functions
+        
+        Args:
+            name: Variable name
+            values: Iterable of numbers, or text to read numbers from
+        """
+        self.engine.set_list(name, values)
+        self.update_variables_display()
+        self.preview_timer.start()
+    
+    def paste_list(self):
+        """Summarize the numbers on the clipboard as the value list "clip" """
+        summary = self.engine.set_list(CLIPBOARD_LIST, QApplication.clipboard().text())
+        self.update_variables_display()
+        # Report what was read instead of a preview, like Apply to Column
+        self.preview_timer.stop()
+        skipped = f", {summary.skipped} skipped" if summary.skipped else ""
+        self.preview.setText(f"{summary.count} value{'' if summary.count == 1 else 's'} "
+                             f"in {CLIPBOARD_LIST}{skipped}")
+    
+    def apply_to_column(self):
+        """Evaluate the expression over the rows on the clipboard and copy the result column"""
+        clipboard = QApplication.clipboard()
+        try:
+            result = self.engine.evaluate_column(clipboard.text())
+        except ExpressionError as error:
+            self.preview.setText(str(error))
+            return
+        except OverflowError:
+            self.preview.setText(OVERFLOW_TEXT)
+            return
+        clipboard.setText(result.text)
+        failed = f", {result.errors} failed" if result.errors else ""
+        self.preview.setText(f"{result.rows} row{'' if result.rows == 1 else 's'} copied{failed}")
+    
+    def use_history_as_list(self):
+        """Summarize the numeric history results as the value list "hist" """
+        self.set_list(HISTORY_LIST, self.engine.history_values())
     
     def copy_to_clipboard(self):
         """Copy the current display value to clipboard"""
         clipboard = QApplication.clipboard()
-        clipboard.setText(self.display.text())
-
+        clipboard.setText(self.display_text())
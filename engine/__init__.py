@@ -0,0 +1,42 @@
+"""
+ORCA Expression Engine
+Pure-Python parsing and evaluation of calculator expressions (no Qt imports)
+
+NumPy batch evaluation lives in engine.batch and is imported on demand,
+so loading the engine does not pull in NumPy.
+"""
+
+from .cache import LRUCache, normalize_expression
+from .parser import ExpressionError, tokenize, parse
+from .compiler import (
+    CompiledExpression, compile_cache, compile_expression, compile_node
+)
+from .cost import CostEstimate, estimate_cost
+from .evaluation import evaluate_to_result, evaluate_to_text, format_result
+from .formatting import ResultFormatter
+from .precision import Precision, get_precision
+from .variables import CycleError, VariableGraph
+from .calculator import CalculatorEngine
+
+__all__ = [
+    "LRUCache",
+    "normalize_expression",
+    "ExpressionError",
+    "tokenize",
+    "parse",
+    "CompiledExpression",
+    "compile_cache",
+    "compile_expression",
+    "compile_node",
+    "CostEstimate",
+    "estimate_cost",
+    "evaluate_to_result",
+    "evaluate_to_text",
+    "format_result",
+    "Precision",
+    "get_precision",
+    "ResultFormatter",
+    "CycleError",
+    "VariableGraph",
+    "CalculatorEngine",
+]
@@ -0,0 +1,361 @@
+"""
+Aggregates for ORCA
+Summary statistics of value lists, computed in one streaming pass in constant memory
+"""
+
+import math
+from itertools import islice
+
+# Values kept exactly (for exact percentiles) before switching to the sketch
+EXACT_LIMIT = 1024
+
+# Quantile sketch: relative error of percentiles, and a bound on its buckets
+RELATIVE_ACCURACY = 0.01
+MAX_BUCKETS = 2048
+
+# Values converted and folded into the summary per vectorized step
+CHUNK_SIZE = 65536
+
+
+def read_numbers(text):
+    """
+    Read pasted text as a column of numbers, one value per cell
+
+    Cells are read as Apply to Column reads them (engine.columns): a
+    header line is skipped and of several columns only the first is used,
+    so ids and coordinates in other columns are not mixed in.
+
+    Args:
+        text: Clipboard text such as a copied attribute table column
+
+    Returns:
+        Float array with NaN for cells that are not numbers (NULLs, "1 000")
+    """
+    import numpy as np
+
+    from .columns import ROW_VARIABLE, parse_columns
+
+    _, columns = parse_columns(text)
+    return columns.get(ROW_VARIABLE, np.empty(0))
+
+
+class QuantileSketch:
+    """Relative-error quantile sketch (DDSketch)
+
+    Values are counted in logarithmic buckets: bucket i holds magnitudes
+    in (γ^(i-1), γ^i], so every estimate is within RELATIVE_ACCURACY of a
+    true value at that rank. When a sign has more than max_buckets buckets,
+    its smallest magnitudes are merged, which only affects the lowest
+    percentiles of that sign. Memory is bounded however many values are added.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, max_buckets=MAX_BUCKETS):
+        """
+        Constructor
+
+        Args:
+            relative_accuracy: Relative error of quantile estimates
+            max_buckets: Maximum buckets per sign
+        """
+        self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.positive = {}  # Bucket index -> count
+        self.negative = {}  # Bucket index of the magnitude -> count
+        self.zeros = 0
+        self.count = 0
+
+    def add_array(self, values):
+        """
+        Count a NumPy array of finite values
+
+        Args:
+            values: 1-d float array
+        """
+        import numpy as np
+
+        self.count += len(values)
+        self.zeros += int(np.count_nonzero(values == 0))
+        for store, part in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            if not len(part):
+                continue
+            indices, counts = np.unique(np.ceil(np.log(part) / self._log_gamma).astype(np.int64),
+                                        return_counts=True)
+            for index, count in zip(indices.tolist(), counts.tolist()):
+                store[index] = store.get(index, 0) + count
+            self._collapse(store)
+
+    def merge(self, other):
+        """Add the counts of another sketch with the same accuracy"""
+        self.count += other.count
+        self.zeros += other.zeros
+        for store, source in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in source.items():
+                store[index] = store.get(index, 0) + count
+            self._collapse(store)
+
+    def quantile(self, q):
+        """
+        Estimate the value at a quantile
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            Estimated value
+        """
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def _value(self, index):
+        """Representative magnitude of a bucket (within the relative accuracy of its range)"""
+        return 2.0 * self.gamma ** index / (self.gamma + 1.0)
+
+    def _collapse(self, store):
+        """Merge the smallest-magnitude buckets until at most max_buckets remain"""
+        excess = len(store) - self.max_buckets
+        if excess <= 0:
+            return
+        lowest = sorted(store)[:excess + 1]
+        total = sum(store.pop(index) for index in lowest)
+        store[lowest[-1]] = total
+
+
+class ValueSummary:
+    """Count, sum, mean, variance, extremes and percentiles of a stream of values
+
+    Values are folded in chunk by chunk: sums are compensated (Neumaier),
+    mean and variance combine per-chunk results as in Welford's and Chan's
+    updates, and percentiles are exact for the first EXACT_LIMIT values and
+    come from a QuantileSketch beyond that. The summary keeps no values
+    after that, so its memory is the same for a thousand values or a billion.
+    NaN values (NULLs, cells that are not numbers) are skipped and counted
+    in skipped.
+
+    The calculator uses a finished summary as the value of a list variable,
+    e.g. mean(clip); treat it as read-only once it is shared.
+    """
+
+    def __init__(self, values=()):
+        """
+        Constructor
+
+        Args:
+            values: Iterable of numbers, or text to read numbers from
+        """
+        self.count = 0
+        self.skipped = 0  # NaN values left out
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self._mean = 0.0
+        self._m2 = 0.0  # Sum of squared differences from the mean
+        self._sum = 0.0
+        self._compensation = 0.0  # Low-order part lost by the running sum
+        self._exact = []  # Values while count <= EXACT_LIMIT
+        self._sketch = None
+        self.update(values)
+
+    def update(self, values):
+        """
+        Fold more values into the summary
+
+        Args:
+            values: Iterable of numbers (or a NumPy array), or text to read numbers from
+        """
+        import numpy as np
+
+        if isinstance(values, str):
+            values = read_numbers(values)
+        if isinstance(values, np.ndarray):
+            values = values.ravel()
+            for start in range(0, len(values), CHUNK_SIZE):
+                self._add_chunk(np.asarray(values[start:start + CHUNK_SIZE], dtype=float))
+            return
+        iterator = iter(values)
+        while True:
+            chunk = np.fromiter(islice(iterator, CHUNK_SIZE), dtype=float)
+            if not len(chunk):
+                break
+            self._add_chunk(chunk)
+
+    def merge(self, other):
+        """Fold another summary into this one"""
+        self.skipped += other.skipped
+        if not other.count:
+            return
+        self._combine(other.count, other._mean, other._m2)
+        self._add_to_sum(other._sum)
+        self._add_to_sum(other._compensation)
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        if other._sketch is None:
+            self._add_exact(other._exact)
+        else:
+            self._ensure_sketch()
+            self._sketch.merge(other._sketch)
+
+    @property
+    def sum(self):
+        return self._sum + self._compensation
+
+    @property
+    def mean(self):
+        self._require(1)
+        return self._mean
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1 in the denominator, like spreadsheet VAR)"""
+        self._require(2)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        """Sample standard deviation"""
+        return math.sqrt(self.variance)
+
+    def percentile(self, p):
+        """
+        Value below which p percent of the values lie
+
+        Exact (linearly interpolated, like spreadsheet PERCENTILE) while the
+        summary holds at most EXACT_LIMIT values, within RELATIVE_ACCURACY beyond.
+
+        Args:
+            p: Percentage between 0 and 100
+        """
+        self._require(1)
+        if not 0 <= p <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        if p == 0:
+            return self.minimum
+        if p == 100:
+            return self.maximum
+        q = p / 100.0
+        if self._sketch is not None:
+            return min(max(self._sketch.quantile(q), self.minimum), self.maximum)
+        values = sorted(self._exact)
+        position = q * (len(values) - 1)
+        low = math.floor(position)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"ValueSummary(count={self.count})"
+
+    def __str__(self):
+        return f"[{self.count} value{'' if self.count == 1 else 's'}]"
+
+    def _require(self, count):
+        if self.count < count:
+            raise ValueError(f"needs at least {count} value{'s' if count > 1 else ''}")
+
+    def _add_chunk(self, chunk):
+        """Fold one float array into the summary"""
+        import numpy as np
+
+        numbers = ~np.isnan(chunk)
+        self.skipped += len(chunk) - int(np.count_nonzero(numbers))
+        chunk = chunk[numbers]
+        if not len(chunk):
+            return
+        mean = float(chunk.mean())
+        self._combine(len(chunk), mean, float(np.square(chunk - mean).sum()))
+        self._add_to_sum(math.fsum(chunk.tolist()) if len(chunk) <= EXACT_LIMIT else float(chunk.sum()))
+        self.minimum = min(self.minimum, float(chunk.min()))
+        self.maximum = max(self.maximum, float(chunk.max()))
+        if self._sketch is None and len(self._exact) + len(chunk) <= EXACT_LIMIT:
+            self._exact.extend(chunk.tolist())
+        else:
+            self._ensure_sketch()
+            self._sketch.add_array(chunk)
+
+    def _combine(self, count, mean, m2):
+        """Merge (count, mean, M2) of another batch of values (Chan et al.)"""
+        total = self.count + count
+        delta = mean - self._mean
+        self._mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def _add_to_sum(self, value):
+        """Neumaier-compensated addition to the running sum"""
+        total = self._sum + value
+        if abs(self._sum) >= abs(value):
+            self._compensation += (self._sum - total) + value
+        else:
+            self._compensation += (value - total) + self._sum
+        self._sum = total
+
+    def _add_exact(self, values):
+        if self._sketch is None and len(self._exact) + len(values) <= EXACT_LIMIT:
+            self._exact.extend(values)
+            return
+        import numpy as np
+
+        self._ensure_sketch()
+        self._sketch.add_array(np.asarray(values, dtype=float))
+
+    def _ensure_sketch(self):
+        """Switch from exact values to the sketch"""
+        if self._sketch is None:
+            import numpy as np
+
+            self._sketch = QuantileSketch()
+            self._sketch.add_array(np.asarray(self._exact, dtype=float))
+            self._exact = []
+
+
+def summarize(args):
+    """
+    Summary of a function's arguments: value lists and plain numbers
+
+    Args:
+        args: ValueSummary objects and numbers
+
+    Returns:
+        ValueSummary (the argument itself for a single list)
+    """
+    if len(args) == 1 and isinstance(args[0], ValueSummary):
+        return args[0]
+    summary = ValueSummary()
+    numbers = []
+    for arg in args:
+        if isinstance(arg, ValueSummary):
+            summary.merge(arg)
+        else:
+            numbers.append(float(arg))
+    summary.update(numbers)
+    return summary
+
+
+def _percentile(p, *args):
+    """percentile(p, values...): p is the percentage, the rest are the values"""
+    return summarize(args).percentile(float(p))
+
+
+# Implementations of the aggregate functions of the expression language
+AGGREGATE_FUNCTIONS = {
+    "sum": lambda *args: summarize(args).sum,
+    "mean": lambda *args: summarize(args).mean,
+    "std": lambda *args: summarize(args).std,
+    "min": lambda *args: summarize(args).percentile(0),
+    "max": lambda *args: summarize(args).percentile(100),
+    "median": lambda *args: summarize(args).percentile(50),
+    "percentile": _percentile,
+}
@@ -0,0 +1,186 @@
+"""
+Batch Evaluation for ORCA
+Evaluates one expression over whole NumPy arrays of variable values
+"""
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from .cache import normalize_expression
+from .compiler import CONSTANTS, free_variables, compile_node
+from .geodesy import GEODESIC_FUNCTIONS
+from .parser import ExpressionError, parse
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# Largest n for which n! fits in a float64
+_MAX_FACTORIAL = 170
+_FACTORIALS = np.array([float(math.factorial(n)) for n in range(_MAX_FACTORIAL + 1)])
+
+BatchResult = namedtuple("BatchResult", "values errors")
+BatchResult.__doc__ = """Evaluated values (NaN where failed) and a boolean per-element error mask"""
+
+
+def _factorial(values):
+    """Vectorized factorial via a precomputed table; NaN/inf outside its domain"""
+    values = np.asarray(values, dtype=float)
+    whole = (values >= 0) & (values == np.floor(values))
+    index = np.clip(np.nan_to_num(values), 0, _MAX_FACTORIAL).astype(np.intp)
+    result = _FACTORIALS[index]
+    result = np.where(values > _MAX_FACTORIAL, np.inf, result)
+    return np.where(whole, result, np.nan)
+
+
+def _power(base, exponent):
+    """Vectorized power; squares and cubes avoid the slower float_power path"""
+    if np.ndim(exponent) == 0:
+        if exponent == 2:
+            return np.square(np.asarray(base, dtype=float))
+        if exponent == 3:
+            base = np.asarray(base, dtype=float)
+            return base * base * base
+    return np.float_power(base, exponent)
+
+
+def _percent(values):
+    """Vectorized percentage postfix"""
+    return np.divide(values, 100.0)
+
+
+# NumPy ufunc implementation of every operator and function in the grammar
+NUMPY_FUNCTIONS = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": np.divide,
+    "^": _power,
+    "neg": np.negative,
+    "pos": np.positive,
+    "!": _factorial,
+    "%": _percent,
+    "√": np.sqrt,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "log": np.log10,
+    "ln": np.log,
+    **GEODESIC_FUNCTIONS,
+}
+
+
+class BatchExpression:
+    """An expression compiled once for evaluation over NumPy arrays"""
+
+    def __init__(self, expression):
+        """
+        Constructor
+
+        Args:
+            expression: Expression with named variables, e.g. "√(x^2+y^2)*k"
+        """
+        self.source = normalize_expression(expression)
+        self.tree = parse(self.source)
+        self.variables = free_variables(self.tree)
+        with np.errstate(all="ignore"):
+            self._evaluate = compile_node(self.tree, NUMPY_FUNCTIONS, CONSTANTS)
+
+    def evaluate_chunk(self, variables):
+        """
+        Evaluate one chunk of rows in a single vectorized pass
+
+        Args:
+            variables: Mapping of variable names to equal-length arrays or scalars
+
+        Returns:
+            BatchResult for the chunk
+        """
+        missing = self.variables.difference(variables)
+        if missing:
+            raise ExpressionError(f"Unknown name '{sorted(missing)[0]}'")
+        env = {name: np.asarray(variables[name], dtype=float) for name in self.variables}
+        with np.errstate(all="ignore"):
+            values = np.asarray(self._evaluate(env), dtype=float)
+        if env and values.ndim == 0:
+            # Expression ignored its array inputs; broadcast to the chunk length
+            values = np.broadcast_to(values, np.broadcast(*env.values()).shape).copy()
+        errors = ~np.isfinite(values)
+        if errors.any():
+            values = np.where(errors, np.nan, values)
+        return BatchResult(values, errors)
+
+    def iter_chunks(self, chunks):
+        """
+        Stream chunks of rows through the expression
+
+        Args:
+            chunks: Iterable of variable mappings, one per chunk
+
+        Yields:
+            BatchResult for each chunk
+        """
+        for chunk in chunks:
+            yield self.evaluate_chunk(chunk)
+
+    def evaluate(self, variables, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Evaluate over full-length arrays, chunk by chunk
+
+        Temporaries are limited to chunk_size rows, so memory stays bounded
+        by the output arrays no matter how many rows are passed in.
+
+        Args:
+            variables: Mapping of variable names to equal-length arrays or scalars
+            chunk_size: Number of rows evaluated per vectorized pass
+
+        Returns:
+            BatchResult covering every row
+        """
+        arrays = {}
+        scalars = {}
+        for name in self.variables:
+            if name not in variables:
+                raise ExpressionError(f"Unknown name '{name}'")
+            value = np.asarray(variables[name], dtype=float)
+            if value.ndim == 0:
+                scalars[name] = value
+            else:
+                arrays[name] = value
+        if not arrays:
+            return self.evaluate_chunk(scalars)
+
+        lengths = {len(value) for value in arrays.values()}
+        if len(lengths) != 1:
+            raise ValueError("All variable arrays must have the same length")
+        length = lengths.pop()
+        values = np.empty(length, dtype=float)
+        errors = np.empty(length, dtype=bool)
+        for start in range(0, length, chunk_size):
+            stop = min(start + chunk_size, length)
+            chunk = dict(scalars)
+            for name, value in arrays.items():
+                chunk[name] = value[start:stop]
+            result = self.evaluate_chunk(chunk)
+            values[start:stop] = result.values
+            errors[start:stop] = result.errors
+        return BatchResult(values, errors)
+
+
+def evaluate_batch(expression, variables, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Evaluate one expression over whole arrays of variable values
+
+    sin/cos/tan/log/ln/√ map to NumPy ufuncs. Instead of failing the whole
+    batch, rows hitting a domain error, division by zero or overflow are
+    reported in the errors mask and set to NaN in values.
+
+    Args:
+        expression: Expression with named variables, e.g. "√(x^2+y^2)*k"
+        variables: Mapping of variable names to equal-length arrays or scalars
+        chunk_size: Number of rows evaluated per vectorized pass
+
+    Returns:
+        BatchResult(values, errors)
+    """
+    return BatchExpression(expression).evaluate(variables, chunk_size)
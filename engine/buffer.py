@@ -0,0 +1,79 @@
+"""
+Expression Buffer for ORCA
+Gap buffer holding the expression being edited and its cursor
+"""
+
+
+class ExpressionBuffer:
+    """Editable expression text with a cursor
+
+    Characters before the cursor are kept in one list and characters after
+    it in another (reversed), so inserting or deleting at the cursor costs
+    O(length of the edit) rather than O(length of the expression). The
+    full string is only built when text() is called, and cached until the
+    next edit.
+    """
+
+    __slots__ = ("_before", "_after", "_text")
+
+    def __init__(self, text=""):
+        self._before = list(text)
+        self._after = []
+        self._text = text
+
+    def __len__(self):
+        return len(self._before) + len(self._after)
+
+    @property
+    def cursor(self):
+        """Cursor position as a character offset"""
+        return len(self._before)
+
+    def text(self):
+        """Return the whole expression"""
+        if self._text is None:
+            self._text = "".join(self._before) + "".join(reversed(self._after))
+        return self._text
+
+    def set_text(self, text):
+        """Replace the whole expression and put the cursor at the end"""
+        self._before = list(text)
+        self._after = []
+        self._text = text
+
+    def insert(self, text):
+        """Insert text at the cursor and move the cursor past it"""
+        if text:
+            self._before.extend(text)
+            self._text = None
+
+    def backspace(self, count=1):
+        """Delete up to count characters before the cursor"""
+        count = min(count, len(self._before))
+        if count:
+            del self._before[-count:]
+            self._text = None
+
+    def delete(self, count=1):
+        """Delete up to count characters after the cursor"""
+        count = min(count, len(self._after))
+        if count:
+            del self._after[-count:]
+            self._text = None
+
+    def move(self, offset):
+        """Move the cursor by offset characters (negative moves left)"""
+        while offset < 0 and self._before:
+            self._after.append(self._before.pop())
+            offset += 1
+        while offset > 0 and self._after:
+            self._before.append(self._after.pop())
+            offset -= 1
+
+    def move_to(self, position):
+        """Move the cursor to an absolute position, clamped to the text"""
+        self.move(max(0, min(position, len(self))) - self.cursor)
+
+    def char_before_cursor(self):
+        """Return the character left of the cursor, or "" at the start"""
+        return self._before[-1] if self._before else ""
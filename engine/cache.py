@@ -0,0 +1,121 @@
+"""
+Expression Caches for ORCA
+Bounded least-recently-used caches keyed by normalized expression text
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+# Whitespace runs; a run separating two word characters ("sin x", "2 3") is significant
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _collapse_space(match):
+    """Keep one space between word characters, drop all other whitespace"""
+    text = match.string
+    start, end = match.span()
+    if 0 < start and end < len(text) and _is_word(text[start - 1]) and _is_word(text[end]):
+        return " "
+    return ""
+
+
+def _is_word(char):
+    return char.isascii() and (char.isalnum() or char in "_.")
+
+
+def normalize_expression(expression):
+    """
+    Normalize an expression so equivalent spellings share one cache entry
+
+    Whitespace around operators carries no meaning in the grammar, so
+    "2 + 3" and "2+3" map to the same key. Gaps between two words or
+    numbers are kept as a single space so tokenization is unchanged.
+
+    Args:
+        expression: Expression string as typed or shown on the display
+
+    Returns:
+        Normalized expression string
+    """
+    return _SPACE_RE.sub(_collapse_space, expression.strip())
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, maxsize=256):
+        """
+        Constructor
+
+        Args:
+            maxsize: Maximum number of entries to keep (0 disables caching)
+        """
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the cached value for key, marking it as recently used"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the oldest entries beyond maxsize"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize):
+        """Change the capacity, evicting entries if it shrinks"""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Report cache effectiveness
+
+        Returns:
+            dict with hits, misses, evictions, size and maxsize
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+    def _evict(self):
+        """Drop least recently used entries until within capacity (lock held)"""
+        while len(self._data) > max(self.maxsize, 0):
+            self._data.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,586 @@
+"""
+Calculator Engine for ORCA
+Calculator state and behaviour (input, evaluation, history) without any user interface
+"""
+
+import decimal
+import math
+import re
+import sqlite3
+from decimal import Decimal
+
+from .aggregates import ValueSummary
+from .buffer import ExpressionBuffer
+from .cache import LRUCache, normalize_expression
+from .compiler import CONSTANTS, compile_expression
+from .evaluation import (
+    ERROR_TEXT, OVERFLOW_TEXT, TIMEOUT_TEXT, evaluate_to_result, may_be_expensive
+)
+from .formatting import DEFAULT_FORMATTER
+from .history_store import HistoryStore
+from .parser import FUNCTION_NAMES, GEODESIC_FUNCTION_NAMES, ExpressionError
+from .precision import DEFAULT_DIGITS, FLOAT, get_precision
+from .variables import VariableGraph
+
+# Results that are shown but never added to the history. Error and Overflow
+# are cached like any result (the same inputs fail the same way, and an
+# expensive failure is not sent to a worker again); Timeout is not cached
+FAILURE_TEXTS = (ERROR_TEXT, OVERFLOW_TEXT, TIMEOUT_TEXT)
+
+# Buttons that open a parenthesis for their argument
+FUNCTION_BUTTONS = ("sin", "cos", "tan", "log", "ln", "√", *GEODESIC_FUNCTION_NAMES)
+
+# Buttons that apply to the 0 shown on an empty display
+POSTFIX_BUTTONS = ("x²", "x³", "x!", "^", "%", ".")
+
+# Memory register buttons: clear, recall, add and subtract the displayed value
+MEMORY_BUTTONS = ("MC", "MR", "M+", "M-")
+
+# Variables the calculator maintains itself
+ANSWER_VARIABLE = "ans"  # Last successful result
+MEMORY_VARIABLE = "M"  # Memory register
+CLIPBOARD_LIST = "clip"  # Numbers pasted as a value list
+HISTORY_LIST = "hist"  # Numeric results in the history, as a value list
+
+# Variable names as the tokenizer reads them
+VARIABLE_NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Assignments such as "area = 1234.5" or "rate = area * 0.3"
+ASSIGNMENT_RE = re.compile(r"\s*([A-Za-z_][A-Za-z0-9_]*)\s*=(.*)", re.DOTALL)
+
+
+def check_variable_name(name):
+    """
+    Check that a name can be used as a variable in expressions
+
+    Args:
+        name: Proposed variable name
+
+    Raises:
+        ValueError: If the name is not an identifier or is a function or constant
+    """
+    if not VARIABLE_NAME_RE.fullmatch(name):
+        raise ValueError(f"'{name}' is not a valid variable name")
+    if name in FUNCTION_NAMES or name in CONSTANTS:
+        raise ValueError(f"'{name}' is a reserved name")
+
+
+def open_history(path, capacity):
+    """
+    Open a persistent history store, falling back to memory-only history
+
+    Args:
+        path: Database file path (":memory:" for no persistence)
+        capacity: Maximum number of entries kept
+
+    Returns:
+        HistoryStore, kept in memory if the database file cannot be opened
+    """
+    try:
+        return HistoryStore(path, capacity=capacity)
+    except (sqlite3.Error, OSError):
+        return HistoryStore(":memory:", capacity=capacity)
+
+
+class CalculatorEngine:
+    """The calculator behind the dock widget, usable without Qt
+
+    Holds the expression being edited, evaluates it with the configured
+    number system and formatter, caches formatted results and records
+    successful calculations in the history. Button labels go to press(),
+    so a script drives it exactly like the panel does:
+
+        engine = CalculatorEngine()
+        for key in "12*3": engine.press(key)
+        engine.press("=")       # engine.display_text() == "36.0"
+
+    "name = expression" defines a variable by a formula; variables that
+    use it are recomputed when it changes, and so on downstream (see
+    VariableGraph). ans always holds the last result and M the memory
+    register, so "rate = ans * 0.3" follows every new calculation.
+
+    Views mirroring the history (such as a Qt item model) replace
+    history_writer to wrap the append in their own change notifications.
+    """
+
+    def __init__(self, history_path=":memory:", max_history=966):
+        """
+        Constructor
+
+        Args:
+            history_path: History database file, ":memory:" for none
+            max_history: Maximum history items to keep
+        """
+        self.buffer = ExpressionBuffer()  # Expression being edited, with cursor
+        self.precision_mode = FLOAT  # Number system used by "="
+        self.precision_digits = DEFAULT_DIGITS  # Significant digits for DECIMAL/FRACTION
+        self.formatter = DEFAULT_FORMATTER  # Layout of results (digits, grouping, notation)
+        self.formatted_result = ("", "")  # (buffer text, formatted text) of the shown result
+        self.formatted_value = None  # Unrounded value of the shown result, if known
+        self.max_history = max_history
+        self.history = open_history(history_path, max_history)
+        self.history_writer = self.append_history
+        self.result_cache = LRUCache(maxsize=1024)  # (text, value) results by expression and inputs
+        self.variable_graph = VariableGraph(self.evaluate_value)
+        self.variables = self.variable_graph.values  # Named values usable in expressions
+
+    # Expression editing
+
+    @property
+    def expression(self):
+        """The expression being edited (empty while the display shows 0)"""
+        return self.buffer.text()
+
+    @expression.setter
+    def expression(self, text):
+        self.buffer.set_text(text)
+
+    def display_text(self):
+        """Text for the display: the formatted result until edited, else the expression"""
+        text = self.buffer.text()
+        if text and text == self.formatted_result[0]:
+            return self.formatted_result[1]
+        return text or "0"
+
+    def press(self, text):
+        """
+        Apply a calculator button
+
+        Args:
+            text: Button label ("7", "+", "sin", "x²", "C", "DEL", "=", ...)
+        """
+        if text == "C":
+            # Clear
+            self.expression = ""
+        elif text == "DEL":
+            # Delete the character before the cursor
+            self.buffer.backspace()
+        elif text == "=":
+            # Calculate result
+            self.calculate(self.display_text())
+        elif text in MEMORY_BUTTONS:
+            self.press_memory(text)
+        elif text in FUNCTION_BUTTONS:
+            # Functions open a parenthesis for their argument
+            self.buffer.insert(text + "(")
+        elif text in POSTFIX_BUTTONS:
+            # Postfix operators, power and decimal point apply to the 0 on an empty display
+            symbol = "!" if text == "x!" else text
+            self.buffer.insert(symbol if len(self.buffer) else "0" + symbol)
+        else:
+            # Numbers, constants, operators and parentheses
+            self.buffer.insert(text)
+
+    def press_memory(self, text):
+        """
+        Apply a memory register button
+
+        Args:
+            text: "MC", "MR", "M+" or "M-"
+        """
+        graph = self.variable_graph
+        if text == "MC":
+            graph.remove(MEMORY_VARIABLE)
+        elif text == "MR":
+            if MEMORY_VARIABLE in self.variables:
+                self.buffer.insert(self.formatter.to_expression(
+                    self.format_value(self.variables[MEMORY_VARIABLE])))
+        else:
+            value = self.current_value()
+            if value is None:
+                return
+            memory = self.to_number(self.variables.get(MEMORY_VARIABLE, 0))
+            graph.set_value(MEMORY_VARIABLE, memory + value if text == "M+" else memory - value)
+
+    def starts_assignment(self):
+        """True if the expression is a bare variable name, so a typed "=" assigns to it"""
+        name = self.buffer.text().strip()
+        return bool(VARIABLE_NAME_RE.fullmatch(name)) and name not in FUNCTION_NAMES \
+            and name not in CONSTANTS
+
+    def paste(self, text):
+        """
+        Insert pasted text at the cursor in one bulk edit
+
+        Args:
+            text: Clipboard text; line breaks are dropped
+        """
+        # Line breaks from copied cells carry no meaning in an expression
+        text = "".join(text.split("\n")).replace("\r", "").strip()
+        if text:
+            self.buffer.insert(text)
+
+    def show_formatted(self, text, value=None):
+        """
+        Put a formatted result in the buffer
+
+        The buffer gets the parser form (no digit grouping) so editing can
+        continue from it; display_text() keeps the formatted form until edited.
+
+        Args:
+            text: Result text from the formatter
+            value: Unrounded value the text was formatted from, if known
+        """
+        self.expression = self.formatter.to_expression(text)
+        self.formatted_result = (self.buffer.text(), text)
+        self.formatted_value = value
+
+    # Evaluation
+
+    def evaluate(self, expression):
+        """
+        Evaluate an expression to display text, reusing cached results
+
+        Args:
+            expression: Expression string
+
+        Returns:
+            Formatted result or one of FAILURE_TEXTS
+        """
+        return self.evaluate_result(expression)[0]
+
+    def evaluate_result(self, expression):
+        """
+        Evaluate an expression to display text and unrounded value, reusing cached results
+
+        Args:
+            expression: Expression string
+
+        Returns:
+            (text, value): formatted result or one of FAILURE_TEXTS, and the
+            number it was formatted from (None for failures)
+        """
+        source, key = self.cache_key(expression)
+        result = self.result_cache.get(key)
+        if result is None:
+            result = evaluate_to_result(source, *self.evaluation_options())
+            self.result_cache.put(key, result)
+        return result
+
+    def cache_key(self, expression):
+        """
+        Key the result cache by expression and the values of the variables it uses
+
+        Variables change all the time (ans after every "="), so rather than
+        clearing the cache, results are keyed by the inputs they were
+        computed from.
+
+        Args:
+            expression: Expression string
+
+        Returns:
+            (normalized expression, result cache key)
+        """
+        source = normalize_expression(expression)
+        if not self.variables:
+            return source, source
+        try:
+            names = compile_expression(source).variables
+        except (ExpressionError, RecursionError, OverflowError):
+            return source, source
+        if not names:
+            return source, source
+        return source, (source, tuple((name, self.variables.get(name)) for name in sorted(names)))
+
+    def needs_background(self, expression):
+        """
+        Check whether "=" on this expression should run off the GUI thread
+
+        Args:
+            expression: Expression string
+
+        Returns:
+            True if the result is not cached and needs arbitrary-precision work
+        """
+        if ASSIGNMENT_RE.match(expression):
+            # Assignments are evaluated by the variable graph, on this thread
+            return False
+        source, key = self.cache_key(expression)
+        return key not in self.result_cache and may_be_expensive(source)
+
+    def evaluation_options(self):
+        """Extra evaluate_to_result arguments for the current settings (for workers)"""
+        return (self.precision_mode, self.precision_digits, self.formatter, self.variables)
+
+    def calculate(self, expression):
+        """
+        Evaluate an expression, show the result and record it in the history
+
+        Args:
+            expression: Expression string
+
+        Returns:
+            Formatted result or one of FAILURE_TEXTS
+        """
+        assignment = ASSIGNMENT_RE.fullmatch(expression)
+        if assignment:
+            name = assignment.group(1)
+            result = self.assign(name, assignment.group(2))
+            value = None if result in FAILURE_TEXTS else self.variables[name]
+        else:
+            result, value = self.evaluate_result(expression)
+        self.show_result(expression, result, value)
+        return result
+
+    def assign(self, name, formula):
+        """
+        Define a variable by a formula, recomputing the variables that use it
+
+        A formula over names that are not defined yet is kept and reports
+        an error until they are.
+
+        Args:
+            name: Variable name
+            formula: Expression over numbers and other variables
+
+        Returns:
+            The variable's formatted value or one of FAILURE_TEXTS
+        """
+        try:
+            check_variable_name(name)
+            self.variable_graph.define(name, formula)
+        except (ValueError, RecursionError):
+            # Invalid name or formula, or a circular definition
+            return ERROR_TEXT
+        error = self.variable_graph.errors.get(name)
+        if error is not None:
+            return OVERFLOW_TEXT if isinstance(error, (OverflowError, decimal.Overflow)) else ERROR_TEXT
+        return self.format_value(self.variables[name])
+
+    def finish(self, expression, result, value=None):
+        """
+        Show a result computed elsewhere (e.g. by a worker process)
+
+        Args:
+            expression: Expression string that was evaluated
+            result: Formatted result or one of FAILURE_TEXTS
+            value: Unrounded value of the result, None if not known
+        """
+        if result != TIMEOUT_TEXT and (value is not None or result in FAILURE_TEXTS):
+            self.result_cache.put(self.cache_key(expression)[1], (result, value))
+        self.show_result(expression, result, value)
+
+    def show_result(self, expression, result, value=None):
+        """
+        Display a calculation result and record it in the history
+
+        Args:
+            expression: Expression string that was evaluated
+            result: Formatted result or one of FAILURE_TEXTS
+            value: Unrounded value for ans; None reads it back from result
+        """
+        if result in FAILURE_TEXTS:
+            value = None
+        elif value is not None:
+            value = self.to_number(value)
+        self.show_formatted(result, value)
+        # Add to history if calculation was successful
+        if result not in FAILURE_TEXTS and expression != "":
+            self.add_to_history(expression, result)
+            # ans keeps every computed digit, not just the displayed ones
+            answer = self.parse_number(result) if value is None else value
+            if answer is not None:
+                self.variable_graph.set_value(ANSWER_VARIABLE, answer)
+
+    def set_precision(self, mode, digits=None):
+        """
+        Select the number system for evaluation
+
+        Args:
+            mode: precision.FLOAT, DECIMAL or FRACTION
+            digits: Significant digits for DECIMAL/FRACTION (None keeps the current value)
+
+        Returns:
+            True if the setting changed
+        """
+        if digits is None:
+            digits = self.precision_digits
+        if (mode, digits) == (self.precision_mode, self.precision_digits):
+            return False
+        self.precision_mode = mode
+        self.precision_digits = digits
+        # Cached results were formatted for the previous number system
+        self.result_cache.clear()
+        # Variables move to the new number system; formulas are re-evaluated in it
+        graph = self.variable_graph
+        graph.set_values({name: self.to_number(value) for name, value in self.variables.items()
+                          if name not in graph.formulas and not isinstance(value, ValueSummary)})
+        graph.recompute_all()
+        return True
+
+    def set_formatter(self, formatter):
+        """
+        Change how results are formatted
+
+        Args:
+            formatter: formatting.ResultFormatter
+
+        Returns:
+            True if the setting changed
+        """
+        if formatter == self.formatter:
+            return False
+        self.formatter = formatter
+        # Cached results were formatted with the previous formatter
+        self.result_cache.clear()
+        return True
+
+    def set_variables(self, values):
+        """
+        Define or update named values usable in expressions
+
+        Args:
+            values: Mapping of variable names to numbers
+
+        Raises:
+            ValueError: If a name cannot be used in an expression
+        """
+        for name in values:
+            check_variable_name(name)
+        self.variable_graph.set_values(values)
+
+    def set_list(self, name, values):
+        """
+        Define a value list for the aggregate functions, e.g. mean(clip)
+
+        The values are read in one streaming pass into a ValueSummary, so
+        the list itself is never held in memory.
+
+        Args:
+            name: Variable name
+            values: Iterable of numbers, or text to read numbers from
+
+        Returns:
+            The ValueSummary
+
+        Raises:
+            ValueError: If the name cannot be used in an expression
+        """
+        check_variable_name(name)
+        summary = ValueSummary(values)
+        self.variable_graph.set_value(name, summary)
+        return summary
+
+    def evaluate_column(self, text, expression=None):
+        """
+        Apply an expression to every row of pasted numbers, e.g. value*0.3048
+
+        value is the first column; with a header row the columns can also be
+        used by name. Rows are evaluated in vectorized NumPy chunks with
+        float arithmetic whatever the number system; plain (non-list)
+        variables can be used as constants.
+
+        Args:
+            text: Pasted rows (one number per line, or CSV/tab-separated)
+            expression: Expression to apply, defaults to the expression being edited
+
+        Returns:
+            engine.columns.ColumnResult with the result column as text
+
+        Raises:
+            ExpressionError: If the expression is invalid or uses an unknown name
+        """
+        from .columns import evaluate_column
+
+        if expression is None:
+            expression = self.expression
+        constants = {}
+        for name, value in self.variables.items():
+            if not isinstance(value, ValueSummary):
+                try:
+                    constants[name] = float(value)
+                except OverflowError:
+                    # Integers and fractions beyond the float range
+                    constants[name] = math.inf if value > 0 else -math.inf
+        return evaluate_column(normalize_expression(expression), text, self.formatter, constants)
+
+    def history_values(self):
+        """Numeric results in the history, oldest first (for set_list)"""
+        for _, result in self.history:
+            try:
+                yield float(self.formatter.to_expression(result))
+            except ValueError:
+                pass
+
+    def evaluate_value(self, formula, values):
+        """
+        Evaluate a variable formula to a number in the current number system
+
+        Args:
+            formula: Normalized expression
+            values: Mapping of variable names to numbers
+
+        Returns:
+            float, Decimal or Fraction
+        """
+        if self.precision_mode == FLOAT:
+            return float(compile_expression(formula)(values))
+        return get_precision(self.precision_mode, self.precision_digits).evaluate(formula, values)
+
+    def to_number(self, value):
+        """Convert a number of any type to the current number system"""
+        if self.precision_mode == FLOAT:
+            # Float arithmetic keeps integer results exact (e.g. 30!), so ints stay ints
+            return value if isinstance(value, int) else float(value)
+        return get_precision(self.precision_mode, self.precision_digits).convert(value)
+
+    def format_value(self, value):
+        """Format a variable's value like a result"""
+        if isinstance(value, ValueSummary):
+            return str(value)
+        if self.precision_mode == FLOAT:
+            return self.formatter.format(value)
+        precision = get_precision(self.precision_mode, self.precision_digits)
+        return precision.format(precision.convert(value), self.formatter)
+
+    def parse_number(self, text):
+        """
+        Read a formatted result back as a number
+
+        Args:
+            text: Text from the formatter
+
+        Returns:
+            Number in the current number system, or None if text is not a number
+        """
+        try:
+            return self.to_number(Decimal(self.formatter.to_expression(text)))
+        except (ArithmeticError, ValueError):
+            return None
+
+    def current_value(self):
+        """The unrounded value of the display expression, or None if it does not evaluate"""
+        text = self.display_text()
+        if self.formatted_value is not None and self.buffer.text() == self.formatted_result[0]:
+            # A result on the display stands for the value it was formatted from
+            return self.formatted_value
+        result, value = self.evaluate_result(text)
+        if result in FAILURE_TEXTS:
+            return None
+        return self.parse_number(result) if value is None else self.to_number(value)
+
+    # History
+
+    def add_to_history(self, expression, result):
+        """Add a calculation to the history through history_writer"""
+        # Keep only the last max_history items
+        if self.history.capacity != self.max_history:
+            self.history.resize(self.max_history)
+        self.history_writer(expression, result)
+
+    def append_history(self, expression, result):
+        """Default history_writer: add to the history store, counting repeats once"""
+        item = (expression, result)
+        index = self.history.find(item)
+        if index is None:
+            self.history.append(item)
+        else:
+            self.history.touch(index)
+
+    def search_history(self, query, limit=500):
+        """Return up to limit (expression, result) entries containing query"""
+        return self.history.search(query, limit)
+
+    def close(self):
+        """Close the history store"""
+        self.history.close()
@@ -0,0 +1,227 @@
+"""
+Column Evaluation for ORCA
+Applies an expression to every row of a pasted column or table of numbers
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from .batch import DEFAULT_CHUNK_SIZE, BatchExpression
+from .parser import ExpressionError
+
+# Variable bound to the first column of pasted rows ("x" would read "2x²"
+# as the square button applied to 2)
+ROW_VARIABLE = "value"
+
+ColumnResult = namedtuple("ColumnResult", "text rows errors")
+ColumnResult.__doc__ = """Result column as clipboard text, number of rows and number of failed rows"""
+
+# Delimiters tried on the first line, in order; None splits on whitespace
+_DELIMITERS = ("\t", ";", ",")
+
+# Delimiters that also occur inside numbers ("1 000", "1,5"): they only
+# separate columns if every line has the same number of cells
+_AMBIGUOUS_DELIMITERS = (",", None)
+
+# Cells that stand for a missing value rather than a column name
+_NULL_CELLS = frozenset(["", "null", "none", "nan", "n/a"])
+
+_NUMBER_RE = re.compile(r"\s*[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\s*")
+_LETTER_RE = re.compile(r"[^\W\d]")
+
+
+def _is_number(cell, decimal_comma):
+    """True if a cell is a plain number"""
+    return _NUMBER_RE.fullmatch(cell.replace(",", ".") if decimal_comma else cell) is not None
+
+
+def _same_width(lines, delimiter):
+    """True if a delimiter (None for whitespace) splits all non-blank lines into as many cells"""
+    if delimiter:
+        widths = {line.count(delimiter) for line in lines if line.strip()}
+    else:
+        widths = {len(line.split()) for line in lines if line.strip()}
+    return len(widths) <= 1
+
+
+def _is_header(cells, rest, split, decimal_comma):
+    """
+    Check whether the first line names the columns
+
+    It does if none of its cells is a number, one of them has a letter
+    and is not a NULL, and a number follows on a later line.
+    """
+    if any(_is_number(cell, decimal_comma) for cell in cells):
+        return False
+    if not any(_LETTER_RE.search(cell) and cell.strip().lower() not in _NULL_CELLS
+               for cell in cells):
+        return False
+    return any(_is_number(cell, decimal_comma) for line in rest for cell in split(line))
+
+
+def _header_name(text, position):
+    """Variable name for a header cell (c1, c2, ... where it has none)"""
+    name = re.sub(r"\W", "_", text.strip(), flags=re.ASCII)
+    if not name:
+        return f"c{position + 1}"
+    return name if not name[0].isdigit() else "_" + name
+
+
+def _to_floats(cells, decimal_comma):
+    """
+    Convert a column of cell strings to a float array in one pass
+
+    NumPy converts the whole list at C speed; only a column with empty or
+    non-numeric cells (NULLs) falls back to converting cell by cell, with
+    NaN for the cells that are not numbers.
+    """
+    if decimal_comma:
+        cells = [cell.replace(",", ".") for cell in cells]
+    try:
+        return np.array(cells, dtype=float)
+    except ValueError:
+        values = np.empty(len(cells), dtype=float)
+        for index, cell in enumerate(cells):
+            try:
+                values[index] = float(cell)
+            except ValueError:
+                values[index] = np.nan
+        return values
+
+
+def _to_grid(lines, delimiter, width, decimal_comma):
+    """
+    Convert well-formed rows to a (rows, width) float array in one call
+
+    Joining the rows and splitting on the delimiter gives every cell in one
+    flat list, so the table is converted without building a list per row.
+    Returns None if a row has a different number of cells or a cell is not
+    a number; the caller then converts column by column.
+    """
+    separators = width - 1
+    if not all(line.count(delimiter) == separators for line in lines):
+        return None
+    try:
+        joined = delimiter.join(lines)
+        if decimal_comma:
+            joined = joined.replace(",", ".")
+        cells = joined.split(delimiter)
+        return np.array(cells, dtype=float).reshape(len(lines), width)
+    except ValueError:
+        return None
+
+
+def parse_columns(text):
+    """
+    Read pasted rows into one float array per column
+
+    The delimiter (tab, semicolon, comma or whitespace) is taken from the
+    first line. Commas and spaces also occur inside numbers, so if they
+    split the lines into different numbers of cells each line is one cell
+    ("1 000" and "1,5" are then errors, not 1). A first line without
+    numbers, followed by numbers, is a header and names the columns;
+    otherwise the columns are c1, c2, ... Whatever the names, value is the
+    first column. With a tab or semicolon delimiter, decimal commas ("1,5")
+    are accepted.
+
+    Args:
+        text: Clipboard text, e.g. a column copied from an attribute table
+
+    Returns:
+        (header, columns): header is the list of header cells or None,
+        columns maps variable names to equal-length float arrays (NaN for
+        empty and non-numeric cells, and for every cell of a row with
+        missing or extra cells)
+    """
+    lines = text.splitlines()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if not lines:
+        return None, {}
+    first = lines[0]
+    delimiter = next((candidate for candidate in _DELIMITERS if candidate in first), None)
+    split = (lambda line: line.split(delimiter)) if delimiter else str.split
+    if delimiter in _AMBIGUOUS_DELIMITERS and not _same_width(lines, delimiter):
+        # The commas or spaces belong to the numbers: one cell per line
+        delimiter = None
+        split = lambda line: [line]  # noqa: E731
+
+    header = split(first)
+    decimal_comma = delimiter in ("\t", ";")
+    if _is_header(header, lines[1:], split, decimal_comma):
+        names = [_header_name(cell, position) for position, cell in enumerate(header)]
+        lines = lines[1:]
+    else:
+        header = None
+        names = [f"c{position + 1}" for position in range(len(split(first)))]
+
+    width = len(names)
+    if width == 1:
+        columns = {names[0]: _to_floats([line.strip() for line in lines], decimal_comma)}
+    else:
+        grid = _to_grid(lines, delimiter, width, decimal_comma) if delimiter else None
+        if grid is not None:
+            columns = dict(zip(names, grid.T))
+        else:
+            rows = [split(line) for line in lines]
+            # Rows with missing or extra cells are failed rows, not padded or cut
+            rows = [row if len(row) == width else [""] * width for row in rows]
+            cells = [list(column) for column in zip(*rows)] if rows else [[] for _ in names]
+            columns = {name: _to_floats(column, decimal_comma) for name, column in zip(names, cells)}
+    if names and ROW_VARIABLE not in columns:
+        columns[ROW_VARIABLE] = columns[names[0]]
+    return header, columns
+
+
+def evaluate_column(expression, text, formatter, variables=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Evaluate an expression for every pasted row
+
+    Rows are parsed in one pass and evaluated in vectorized chunks.
+
+    Args:
+        expression: Expression over value and/or the column names, e.g. "value*0.3048"
+        text: Pasted rows
+        formatter: formatting.ResultFormatter for the result cells
+        variables: Optional mapping of further (scalar) variable names to numbers
+        chunk_size: Rows per vectorized pass
+
+    Returns:
+        ColumnResult; failed rows (NULL inputs, domain errors) are empty
+        cells, and a header row gets the expression as its header
+
+    Raises:
+        ExpressionError: If the expression is invalid or uses an unknown name
+    """
+    batch = BatchExpression(expression)
+    header, columns = parse_columns(text)
+    if not columns:
+        raise ExpressionError("No rows to evaluate")
+    bound = dict(variables or {})
+    bound.update(columns)
+    missing = batch.variables.difference(bound)
+    if missing:
+        raise ExpressionError(f"Unknown name '{sorted(missing)[0]}'")
+    rows = len(columns[ROW_VARIABLE])
+    result = batch.evaluate({name: bound[name] for name in batch.variables}, chunk_size)
+    values, errors = result.values, result.errors
+    if values.ndim == 0 or len(values) != rows:
+        # Expression without columns: the same value on every row
+        values = np.full(rows, values)
+        errors = np.full(rows, errors)
+
+    # Cells keep the formatter's decimal point but not its digit grouping,
+    # which spreadsheets would read as text
+    format_value = formatter.format
+    group_separator = formatter.group_separator
+    cells = [
+        "" if failed else format_value(value)
+        for value, failed in zip(values.tolist(), errors.tolist())
+    ]
+    if group_separator:
+        cells = [cell.replace(group_separator, "") for cell in cells]
+    if header is not None:
+        cells.insert(0, expression)
+    return ColumnResult("\n".join(cells), rows, int(errors.sum()))
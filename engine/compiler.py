@@ -0,0 +1,291 @@
+"""
+Expression Compiler for ORCA
+Turns parsed expression trees into reusable Python closures
+"""
+
+import math
+import operator
+
+from .aggregates import AGGREGATE_FUNCTIONS
+from .cache import LRUCache, normalize_expression
+from .parser import (
+    GEODESIC_FUNCTION_NAMES, ExpressionError, Number, Name, UnaryOp, BinaryOp, Postfix, Call,
+    parse
+)
+
+
+# Integer results beyond this many bits are refused instead of computed (~315,000 digits)
+MAX_INT_BITS = 1 << 20
+_LN2 = math.log(2)
+
+
+def _power(base, exponent):
+    """Raise base to exponent, rejecting complex results such as (-8)^(1/3)"""
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        # Refuse before allocating the digits, e.g. 10^10^8
+        if math.log2(abs(base)) * exponent > MAX_INT_BITS:
+            raise OverflowError("Result too large")
+    result = base ** exponent
+    if isinstance(result, complex):
+        raise ValueError("Power has no real result")
+    return result
+
+
+def _factorial(value):
+    """Factorial that accepts integral floats such as 5.0"""
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError("Factorial is only defined for whole numbers")
+        value = int(value)
+    if value > 2 and math.lgamma(value + 1) / _LN2 > MAX_INT_BITS:
+        raise OverflowError("Result too large")
+    return math.factorial(value)
+
+
+def _percent(value):
+    """Percentage postfix: 50% is 0.5"""
+    return value / 100
+
+
+def _geodesic(name):
+    """Scalar entry for a geodesic function; NumPy is imported on first use"""
+    def evaluate(*args):
+        from .geodesy import GEODESIC_FUNCTIONS
+        return GEODESIC_FUNCTIONS[name](*args)
+    return evaluate
+
+
+# Scalar implementation of every operator and function in the grammar
+MATH_FUNCTIONS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "^": _power,
+    "neg": operator.neg,
+    "pos": operator.pos,
+    "!": _factorial,
+    "%": _percent,
+    "√": math.sqrt,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "log": math.log10,
+    "ln": math.log,
+    **{name: _geodesic(name) for name in GEODESIC_FUNCTION_NAMES},
+    **AGGREGATE_FUNCTIONS,
+}
+
+CONSTANTS = {
+    "π": math.pi,
+    "e": math.e,
+}
+
+
+def free_variables(node, constants=CONSTANTS):
+    """
+    Collect the names an expression tree needs from the caller
+
+    Args:
+        node: Root node of an expression tree
+        constants: Mapping of constant names to values
+
+    Returns:
+        frozenset of variable names (constants are not included)
+    """
+    names = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, Name):
+            if current.name not in constants:
+                names.add(current.name)
+        elif isinstance(current, (UnaryOp, Postfix)):
+            stack.append(current.operand)
+        elif isinstance(current, BinaryOp):
+            stack.append(current.left)
+            stack.append(current.right)
+        elif isinstance(current, Call):
+            stack.extend(current.args)
+    return frozenset(names)
+
+
+def _constant(value):
+    """Closure that ignores the environment and returns a fixed value"""
+    def evaluate(env):
+        return value
+    evaluate.constant = True
+    evaluate.value = value
+    return evaluate
+
+
+def _fold(evaluate):
+    """Pre-compute a closure whose operands are all constant"""
+    try:
+        return _constant(evaluate(None))
+    except Exception:
+        # Leave the error to surface when the expression is evaluated
+        return evaluate
+
+
+def compile_node(node, functions=MATH_FUNCTIONS, constants=CONSTANTS, memo=None):
+    """
+    Compile an expression tree into a closure taking a variable mapping
+
+    Subtrees that do not reference variables are evaluated once here,
+    so repeated evaluation only walks the variable-dependent part.
+
+    Args:
+        node: Root node of an expression tree
+        functions: Mapping of operator/function names to implementations
+        constants: Mapping of constant names to values
+        memo: Optional dict reused across calls; subtree objects compiled
+            before (e.g. reused by an incremental parse) are not recompiled
+
+    Returns:
+        Callable evaluate(env) returning the value of the expression
+    """
+    if memo is None:
+        return _compile_node(node, functions, constants, None)
+    cached = memo.get(id(node))
+    if cached is not None and cached[0] is node:
+        return cached[1]
+    evaluate = _compile_node(node, functions, constants, memo)
+    # Keep the node alive so its id cannot be reused by another object
+    memo[id(node)] = (node, evaluate)
+    return evaluate
+
+
+def _compile_node(node, functions, constants, memo):
+    """Compile one node, compiling its children through compile_node"""
+    if isinstance(node, Number):
+        # An optional "num" entry converts literals into another number type
+        convert = functions.get("num")
+        if convert is not None:
+            return _constant(convert(node.text if node.text is not None else repr(node.value)))
+        return _constant(node.value)
+
+    if isinstance(node, Name):
+        name = node.name
+        if name in constants:
+            return _constant(constants[name])
+
+        def evaluate(env):
+            return env[name]
+        return evaluate
+
+    if isinstance(node, BinaryOp):
+        func = functions[node.op]
+        left = compile_node(node.left, functions, constants, memo)
+        right = compile_node(node.right, functions, constants, memo)
+
+        def evaluate(env):
+            return func(left(env), right(env))
+        if getattr(left, "constant", False) and getattr(right, "constant", False):
+            return _fold(evaluate)
+        return evaluate
+
+    if isinstance(node, (UnaryOp, Postfix)):
+        if isinstance(node, UnaryOp):
+            func = functions["neg" if node.op == "-" else "pos"]
+        else:
+            func = functions[node.op]
+        operand = compile_node(node.operand, functions, constants, memo)
+
+        def evaluate(env):
+            return func(operand(env))
+        if getattr(operand, "constant", False):
+            return _fold(evaluate)
+        return evaluate
+
+    if isinstance(node, Call):
+        if node.func not in functions:
+            raise ExpressionError(f"Unknown function '{node.func}'")
+        func = functions[node.func]
+        args = [compile_node(arg, functions, constants, memo) for arg in node.args]
+        if len(args) == 1:
+            arg = args[0]
+
+            def evaluate(env):
+                return func(arg(env))
+        else:
+            def evaluate(env):
+                return func(*[a(env) for a in args])
+        if all(getattr(a, "constant", False) for a in args):
+            return _fold(evaluate)
+        return evaluate
+
+    raise ExpressionError(f"Cannot compile node {node!r}")
+
+
+class CompiledExpression:
+    """A parsed and compiled expression that can be evaluated many times"""
+
+    __slots__ = ("source", "tree", "variables", "_evaluate")
+
+    def __init__(self, source, tree, functions=MATH_FUNCTIONS, constants=CONSTANTS):
+        self.source = source
+        self.tree = tree
+        self.variables = free_variables(tree, constants)
+        self._evaluate = compile_node(tree, functions, constants)
+
+    @property
+    def is_constant(self):
+        """True when the expression does not depend on any variables"""
+        return not self.variables
+
+    def __call__(self, variables=None):
+        """
+        Evaluate the expression
+
+        Args:
+            variables: Optional mapping of variable names to values
+
+        Returns:
+            The numeric result
+        """
+        if self.variables:
+            if variables is None:
+                variables = {}
+            missing = self.variables.difference(variables)
+            if missing:
+                raise ExpressionError(f"Unknown name '{sorted(missing)[0]}'")
+        return self._evaluate(variables)
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+
+# Parsed and compiled forms, kept apart from any formatted-result cache
+compile_cache = LRUCache(maxsize=512)
+
+
+def compile_expression(expression):
+    """
+    Parse and compile a display expression
+
+    Compiled expressions are cached by normalized text, so re-evaluating
+    the same expression (history clicks, repeated "=" presses) skips
+    tokenizing and parsing. Use compile_cache.resize() to bound memory.
+
+    Args:
+        expression: Expression string as shown on the calculator display
+
+    Returns:
+        CompiledExpression ready to be called
+
+    Raises:
+        OverflowError: If the result is certain to be too large (cost.check_size)
+    """
+    key = normalize_expression(expression)
+    compiled = compile_cache.get(key)
+    if compiled is None:
+        # cost imports this module, so it is loaded on first use
+        from .cost import check_size
+        tree = parse(key)
+        # Constant subtrees are folded while compiling: refuse results
+        # too large to display before computing them
+        check_size(tree)
+        compiled = CompiledExpression(key, tree)
+        compile_cache.put(key, compiled)
+    return compiled
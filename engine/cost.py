@@ -0,0 +1,184 @@
+"""
+Cost Estimation for ORCA
+Static analysis of expression trees that predicts integer blow-up before evaluating
+"""
+
+import math
+from collections import namedtuple
+
+from .compiler import CONSTANTS, MAX_INT_BITS
+from .formatting import MAX_DISPLAY_BITS
+from .parser import Number, Name, UnaryOp, BinaryOp, Postfix, Call
+
+# Integers up to this size convert to float and are cheap to compute with
+FLOAT_BITS = 1024
+
+# Evaluation routes
+FAST = "fast"          # Ordinary float-sized arithmetic, safe on the GUI thread
+EXACT = "exact"        # Arbitrary-precision integers; run off the GUI thread
+OVERFLOW = "overflow"  # Certain to exceed MAX_INT_BITS or the display; refuse without evaluating
+
+CostEstimate = namedtuple("CostEstimate", "route bits")
+
+# Per-node bounds: whether Python evaluates it to an int, bounds on log2|value|,
+# and its sign (1, -1, or 0 when zero or unknown)
+_Bounds = namedtuple("_Bounds", "is_int low high sign")
+
+_INF = math.inf
+_UNKNOWN = _Bounds(False, -_INF, _INF, 0)
+_LN2 = math.log(2)
+
+
+def _log2(value):
+    """log2 of |value|, -inf for zero, exact for big integers"""
+    value = abs(value)
+    if value == 0:
+        return -_INF
+    if isinstance(value, int) and value.bit_length() > FLOAT_BITS:
+        return float(value.bit_length())
+    return math.log2(value)
+
+
+def _exp2(exponent):
+    """2**exponent as a float, saturating to inf instead of overflowing"""
+    if exponent > FLOAT_BITS:
+        return _INF
+    if exponent == -_INF:
+        return 0.0
+    return 2.0 ** exponent
+
+
+def _log2_factorial(log2_n):
+    """Bound on log2(n!) for |n| = 2**log2_n"""
+    n = _exp2(log2_n)
+    if n == _INF:
+        return _INF
+    return math.lgamma(n + 1) / _LN2
+
+
+def _bounds(node, constants, worst):
+    """
+    Compute _Bounds for a tree node, recursing into its children
+
+    Args:
+        node: Tree node
+        constants: Mapping of constant names to values
+        worst: Two-item list [low, high] raised to the largest integer bounds seen
+    """
+    bounds = _node_bounds(node, constants, worst)
+    if bounds.is_int:
+        worst[0] = max(worst[0], bounds.low)
+        worst[1] = max(worst[1], bounds.high)
+    return bounds
+
+
+def _node_bounds(node, constants, worst):
+    """Bounds of a single node given the bounds of its children"""
+    if isinstance(node, Number):
+        value = node.value
+        log = _log2(value)
+        return _Bounds(isinstance(value, int), log, log, 1 if value > 0 else 0)
+
+    if isinstance(node, Name):
+        if node.name in constants:
+            log = _log2(constants[node.name])
+            return _Bounds(False, log, log, 1)
+        # Variable values are not known statically
+        return _UNKNOWN
+
+    if isinstance(node, UnaryOp):
+        inner = _bounds(node.operand, constants, worst)
+        sign = -inner.sign if node.op == "-" else inner.sign
+        return inner._replace(sign=sign)
+
+    if isinstance(node, Postfix):
+        inner = _bounds(node.operand, constants, worst)
+        if node.op == "!":
+            return _Bounds(True, _log2_factorial(inner.low), _log2_factorial(inner.high), 1)
+        # Percent divides by 100 and always yields a float
+        return _Bounds(False, inner.low - math.log2(100), inner.high - math.log2(100), inner.sign)
+
+    if isinstance(node, BinaryOp):
+        left = _bounds(node.left, constants, worst)
+        right = _bounds(node.right, constants, worst)
+        is_int = left.is_int and right.is_int
+        if node.op in "+-":
+            right_sign = -right.sign if node.op == "-" else right.sign
+            if left.sign and left.sign == right_sign:
+                # Same signs never cancel
+                low = max(left.low, right.low)
+                sign = left.sign
+            else:
+                low = -_INF
+                sign = 0
+            return _Bounds(is_int, low, max(left.high, right.high) + 1, sign)
+        if node.op == "*":
+            return _Bounds(is_int, left.low + right.low if left.low > -_INF and right.low > -_INF
+                           else -_INF, left.high + right.high, left.sign * right.sign)
+        if node.op == "/":
+            return _Bounds(False, left.low - right.high, left.high - right.low,
+                           left.sign * right.sign)
+        if node.op == "^":
+            # A negative integer exponent makes Python return a float
+            is_int = is_int and right.sign != -1
+            high = left.high * _exp2(right.high) if left.high > 0 else 0.0
+            if left.low > 0 and right.sign > 0:
+                low = left.low * _exp2(right.low)
+            else:
+                low = -_INF
+            return _Bounds(is_int, low, high, 1 if left.sign > 0 else 0)
+        return _UNKNOWN
+
+    if isinstance(node, Call):
+        # Library functions return floats; their arguments are still analysed
+        for arg in node.args:
+            _bounds(arg, constants, worst)
+        return _Bounds(False, -_INF, _INF, 0)
+
+    return _UNKNOWN
+
+
+def estimate_cost(tree, constants=CONSTANTS):
+    """
+    Predict how expensive a tree is to evaluate
+
+    Bounds on the size of every integer-valued subexpression are derived
+    from literals alone: factorials, chained powers and huge literals.
+    Floats cannot blow up (they overflow with an error), so only integers
+    decide the route, except that a result certain to be longer than the
+    formatter displays (MAX_DISPLAY_BITS, e.g. "1000!") is refused too.
+
+    Args:
+        tree: Root node of an expression tree
+        constants: Mapping of constant names to values
+
+    Returns:
+        CostEstimate(route, bits) where bits is the upper bound on the
+        largest integer in bits
+    """
+    worst = [-_INF, 0.0]
+    result = _bounds(tree, constants, worst)
+    worst_low, worst_high = worst
+    # An infinite lower bound comes from dividing by zero, an error rather than an overflow
+    if worst_low > MAX_INT_BITS or MAX_DISPLAY_BITS < result.low < _INF:
+        route = OVERFLOW
+    elif worst_high > FLOAT_BITS:
+        route = EXACT
+    else:
+        route = FAST
+    return CostEstimate(route, worst_high)
+
+
+def check_size(tree, constants=CONSTANTS):
+    """
+    Refuse a tree before evaluating it if its result is certain to overflow
+
+    Args:
+        tree: Root node of an expression tree
+        constants: Mapping of constant names to values
+
+    Raises:
+        OverflowError: If estimate_cost() routes the tree to OVERFLOW
+    """
+    if estimate_cost(tree, constants).route == OVERFLOW:
+        raise OverflowError("Result too large")
@@ -0,0 +1,108 @@
+"""
+Expression Evaluation for ORCA
+Evaluates display expressions and formats results as display text
+"""
+
+import decimal
+
+from .cache import normalize_expression
+from .compiler import compile_expression
+from .cost import EXACT, estimate_cost
+from .formatting import DEFAULT_FORMATTER
+from .parser import ExpressionError, parse
+from .precision import DEFAULT_DIGITS, FLOAT, get_precision
+
+ERROR_TEXT = "Error"
+OVERFLOW_TEXT = "Overflow"
+TIMEOUT_TEXT = "Timeout"  # Reported by evaluators that give up on a time budget
+
+
+def format_result(result, formatter=DEFAULT_FORMATTER):
+    """
+    Format a numeric result for the calculator display
+
+    Args:
+        result: Numeric value
+        formatter: formatting.ResultFormatter (plain notation, and the
+            shortest digits that round-trip for floats by default)
+
+    Returns:
+        Display text, always with a decimal point and never with a lower-case
+        e that could be confused with Euler's number
+    """
+    return formatter.format(result)
+
+
+def evaluate_to_text(expression, mode=FLOAT, digits=DEFAULT_DIGITS, formatter=DEFAULT_FORMATTER,
+                     variables=None):
+    """
+    Evaluate an expression and format the result for display
+
+    Args:
+        expression: Expression string as shown on the calculator display
+        mode: Number system (precision.FLOAT, DECIMAL or FRACTION)
+        digits: Significant digits for the DECIMAL and FRACTION modes
+        formatter: formatting.ResultFormatter for the result
+        variables: Optional mapping of variable names to values
+
+    Returns:
+        Formatted result, OVERFLOW_TEXT if the result is too large to compute
+        or display, or ERROR_TEXT if the expression cannot be evaluated
+    """
+    return evaluate_to_result(expression, mode, digits, formatter, variables)[0]
+
+
+def evaluate_to_result(expression, mode=FLOAT, digits=DEFAULT_DIGITS, formatter=DEFAULT_FORMATTER,
+                       variables=None):
+    """
+    Evaluate an expression to its display text and its unrounded value
+
+    The value is what the display text was formatted from, so ans and the
+    memory register keep every digit the number system computed.
+
+    Args:
+        expression: Expression string as shown on the calculator display
+        mode: Number system (precision.FLOAT, DECIMAL or FRACTION)
+        digits: Significant digits for the DECIMAL and FRACTION modes
+        formatter: formatting.ResultFormatter for the result
+        variables: Optional mapping of variable names to values
+
+    Returns:
+        (text, value): text as for evaluate_to_text; value is the number
+        in the selected number system, or None if text is a failure text
+    """
+    try:
+        if mode == FLOAT:
+            # Tokenize, parse and compile the display grammar (cached per expression)
+            compiled = compile_expression(expression)
+            value = compiled(variables)
+            return formatter.format(value), value
+        precision = get_precision(mode, digits)
+        value = precision.evaluate(expression, variables)
+        return precision.format(value, formatter), value
+    except (OverflowError, decimal.Overflow):
+        return OVERFLOW_TEXT, None
+    except Exception:
+        return ERROR_TEXT, None
+
+
+def may_be_expensive(expression):
+    """
+    Check whether an expression needs arbitrary-precision integer work
+
+    Uses the static cost estimate: float-sized arithmetic is safe on the GUI
+    thread, and expressions certain to overflow are refused by the
+    evaluator before any digits are allocated, so only the EXACT route
+    (e.g. "1000!/998!") has to be moved elsewhere.
+
+    Args:
+        expression: Expression string as shown on the calculator display
+
+    Returns:
+        True if evaluation should be moved off the GUI thread
+    """
+    try:
+        return estimate_cost(parse(normalize_expression(expression))).route == EXACT
+    except (ExpressionError, RecursionError):
+        # Evaluation reports the error without needing a worker
+        return False
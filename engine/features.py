@@ -0,0 +1,205 @@
+"""
+Feature Evaluation for ORCA
+Streams features through an expression over their attributes, chunk by chunk
+"""
+
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .batch import DEFAULT_CHUNK_SIZE, BatchExpression
+from .parser import ExpressionError
+from .worker import spawn_context
+
+# Expression compiled once per pool process by _init_pool_worker
+_pool_expression = None
+
+
+def _init_pool_worker(expression):
+    """Process pool initializer: compile the expression once per worker"""
+    global _pool_expression
+    _pool_expression = BatchExpression(expression)
+
+
+def _evaluate_pool_chunk(columns):
+    """Process pool task: evaluate one chunk of attribute columns"""
+    result = _pool_expression.evaluate_chunk(columns)
+    return result.values, result.errors
+
+
+def attribute_to_float(value):
+    """
+    Convert an attribute value to float, NaN for NULL and non-numeric values
+
+    Args:
+        value: Attribute value (number, numeric string, None or a QGIS NULL)
+
+    Returns:
+        float
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class FeatureEvaluator:
+    """Evaluates one expression over the attributes of a stream of features
+
+    Features are read in chunks; each chunk's attributes become one NumPy
+    column per referenced field and are evaluated in a single vectorized
+    pass. With workers > 1 the chunks fan out over a process pool while
+    the next chunks are being read, with at most two chunks per worker in
+    flight, so memory stays bounded however many features there are.
+
+    Features only need to support feature[field_name], so plain dicts
+    stand in for QgsFeature objects outside QGIS.
+    """
+
+    def __init__(self, expression, chunk_size=DEFAULT_CHUNK_SIZE, workers=0):
+        """
+        Constructor
+
+        Args:
+            expression: Expression over field names, e.g. "√(width^2+height^2)"
+            chunk_size: Features per vectorized pass
+            workers: Worker processes; 0 or 1 evaluates in this process
+        """
+        self.expression = BatchExpression(expression)
+        self.fields = sorted(self.expression.variables)
+        self.chunk_size = max(1, int(chunk_size))
+        self.workers = max(0, int(workers))
+        self._pool = None
+
+    def check_fields(self, field_names):
+        """
+        Check that every name in the expression is an available field
+
+        Args:
+            field_names: Names of the fields of the source
+
+        Raises:
+            ExpressionError: Naming the first missing field
+        """
+        missing = set(self.fields).difference(field_names)
+        if missing:
+            raise ExpressionError(f"Unknown field '{sorted(missing)[0]}'")
+
+    def evaluate_chunk(self, features):
+        """
+        Evaluate one chunk in this process
+
+        Args:
+            features: Sequence of features
+
+        Returns:
+            List of float results, None where evaluation failed or a value was NULL
+        """
+        return self._to_results(*self._evaluate_columns(self._columns(features)), len(features))
+
+    def iter_results(self, features, cancelled=None):
+        """
+        Stream (feature, result) pairs in input order
+
+        Args:
+            features: Iterable of features
+            cancelled: Optional callable returning True to stop early
+
+        Yields:
+            (feature, float or None) for every feature read
+        """
+        pool = self._ensure_pool()
+        pending = deque()
+        limit = 2 * self.workers
+        for chunk in self._chunks(features):
+            if cancelled is not None and cancelled():
+                break
+            columns = self._columns(chunk)
+            if pool is None:
+                yield from zip(chunk, self._to_results(*self._evaluate_columns(columns), len(chunk)))
+                continue
+            pending.append((chunk, pool.submit(_evaluate_pool_chunk, columns)))
+            while len(pending) >= limit:
+                yield from self._collect(pending.popleft())
+        while pending:
+            if cancelled is not None and cancelled():
+                for _, future in pending:
+                    future.cancel()
+                break
+            yield from self._collect(pending.popleft())
+
+    def close(self):
+        """Shut down the process pool"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _ensure_pool(self):
+        """Start the process pool if workers were requested; None runs inline"""
+        if self.workers <= 1:
+            return None
+        if self._pool is None:
+            context = spawn_context()
+            if context is None:
+                # No interpreter for child processes: evaluate in this process
+                self.workers = 0
+                return None
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context,
+                initializer=_init_pool_worker, initargs=(self.expression.source,)
+            )
+        return self._pool
+
+    def _chunks(self, features):
+        """Group an iterable of features into lists of chunk_size"""
+        chunk = []
+        for feature in features:
+            chunk.append(feature)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _columns(self, features):
+        """One float array per referenced field"""
+        return {
+            name: np.fromiter((attribute_to_float(feature[name]) for feature in features),
+                              dtype=float, count=len(features))
+            for name in self.fields
+        }
+
+    def _evaluate_columns(self, columns):
+        result = self.expression.evaluate_chunk(columns)
+        return result.values, result.errors
+
+    def _collect(self, item):
+        """Wait for a pooled chunk and pair its results with its features"""
+        chunk, future = item
+        return zip(chunk, self._to_results(*future.result(), len(chunk)))
+
+    def _to_results(self, values, errors, count):
+        """Convert a chunk result to Python floats with None for failures"""
+        if values.ndim == 0:
+            # Expression without fields: the same value for every feature
+            values = np.full(count, values)
+            errors = np.full(count, errors)
+        results = values.tolist()
+        if errors.any():
+            for index in np.flatnonzero(errors).tolist():
+                results[index] = None
+        return results
+
+
+def default_workers():
+    """Worker processes to use by default: one per core, at most 8"""
+    return min(os.cpu_count() or 1, 8)
@@ -0,0 +1,265 @@
+"""
+Result Formatting for ORCA
+Turns numeric results into display text that the parser can read back
+"""
+
+import decimal
+import locale
+import math
+from decimal import Decimal
+from fractions import Fraction
+
+# Notations
+PLAIN = "plain"              # 1234567.5
+SCIENTIFIC = "scientific"    # 1.2345675E6
+ENGINEERING = "engineering"  # 1.2345675E6, exponent a multiple of three
+
+NOTATIONS = (PLAIN, SCIENTIFIC, ENGINEERING)
+
+# Results with more integer digits than this are refused like float overflows
+MAX_DISPLAY_DIGITS = 1000
+
+# Integers longer than this are refused (a little over MAX_DISPLAY_DIGITS digits)
+MAX_DISPLAY_BITS = MAX_DISPLAY_DIGITS * 3.33
+
+
+def _shortest_digits(value):
+    """
+    Significant digits of a non-zero finite float as repr() writes them
+
+    Returns:
+        (negative, digits, exponent) as taken by ResultFormatter._layout
+    """
+    text = repr(value)
+    negative = text[0] == "-"
+    mantissa, _, exponent = text.lstrip("-").partition("e")
+    whole, _, fraction = mantissa.partition(".")
+    if exponent:
+        # repr's exponent form has a single digit before the point
+        return negative, (whole + fraction).rstrip("0") or "0", int(exponent)
+    if whole != "0":
+        return negative, (whole + fraction).rstrip("0"), len(whole) - 1
+    stripped = fraction.lstrip("0")
+    return negative, stripped.rstrip("0"), len(stripped) - len(fraction) - 1
+
+
+class ResultFormatter:
+    """Formats float, int, Decimal and Fraction results for the display
+
+    The digits and decimal exponent are extracted once per value with a
+    format spec prepared in the constructor, then laid out in the chosen
+    notation. Plain notation never uses an exponent; the other notations
+    write it with an upper-case E, which the parser reads as part of the
+    number, so any formatted result can be typed or pasted back in.
+    to_expression() undoes digit grouping and a locale decimal point.
+    """
+
+    __slots__ = ("significant", "notation", "group_separator", "decimal_point",
+                 "_float_spec", "_general_spec", "_context")
+
+    def __init__(self, significant=None, notation=PLAIN, group_separator="",
+                 decimal_point="."):
+        """
+        Constructor
+
+        Args:
+            significant: Significant digits to show; None shows the shortest
+                digits that round-trip for floats, and every digit of ints,
+                Decimals and Fractions. A fixed count rounds floats, so their
+                text no longer reads back as exactly the same value
+            notation: PLAIN, SCIENTIFIC or ENGINEERING
+            group_separator: Thousands separator for the integer part ("" for none)
+            decimal_point: Decimal point character
+        """
+        if notation not in NOTATIONS:
+            raise ValueError(f"Unknown notation '{notation}'")
+        if group_separator and group_separator == decimal_point:
+            raise ValueError("Group separator and decimal point must differ")
+        self.significant = significant
+        self.notation = notation
+        self.group_separator = group_separator
+        self.decimal_point = decimal_point
+        # ".14e" yields exactly the digits to show and the decimal exponent
+        # (None: the shortest round-trip digits, taken from repr)
+        self._float_spec = f".{significant - 1}e" if significant else None
+        # ".15g" (or "", i.e. repr) already gives the final text for most
+        # floats in plain notation
+        plain = notation == PLAIN and not group_separator and decimal_point == "."
+        self._general_spec = (f".{significant}g" if significant else "") if plain else None
+        # Rounds Decimals to the requested number of significant digits
+        self._context = decimal.Context(prec=significant or 1, Emax=decimal.MAX_EMAX,
+                                        Emin=decimal.MIN_EMIN)
+
+    @classmethod
+    def for_locale(cls, significant=None, notation=PLAIN):
+        """
+        Create a formatter using the current locale's grouping and decimal point
+
+        Args:
+            significant: Significant digits (see constructor)
+            notation: PLAIN, SCIENTIFIC or ENGINEERING
+
+        Returns:
+            ResultFormatter
+        """
+        conventions = locale.localeconv()
+        decimal_point = conventions.get("decimal_point") or "."
+        separator = conventions.get("thousands_sep") or ""
+        if separator == decimal_point:
+            separator = ""
+        return cls(significant, notation, separator, decimal_point)
+
+    def format(self, value):
+        """
+        Format a numeric result
+
+        Args:
+            value: float, int, Decimal or Fraction
+
+        Returns:
+            Display text; whole numbers keep a ".0" in plain notation
+
+        Raises:
+            OverflowError: If the value is infinite or has too many digits
+            ValueError: If the value is not a number
+        """
+        if isinstance(value, float):
+            if self._general_spec is not None:
+                text = format(value, self._general_spec)
+                if "e" not in text and "n" not in text:
+                    # Not exponent, inf or nan
+                    if "." not in text:
+                        return "0.0" if text == "-0" else text + ".0"
+                    return "0.0" if text == "-0.0" else text
+            if value != value:
+                raise ValueError("Result is not a number")
+            if value in (math.inf, -math.inf):
+                raise OverflowError("Result too large")
+            if value == 0:
+                return self._layout(False, "0", 0)
+            if self._float_spec is None:
+                # Shortest digits that round-trip
+                return self._layout(*_shortest_digits(value))
+            mantissa, exponent = format(value, self._float_spec).split("e")
+            negative = mantissa[0] == "-"
+            digits = mantissa.lstrip("-").replace(".", "").rstrip("0")
+            return self._layout(negative, digits, int(exponent))
+
+        if isinstance(value, Fraction):
+            if value.denominator == 1:
+                value = value.numerator
+            else:
+                value = Decimal(value.numerator) / Decimal(value.denominator)
+
+        if isinstance(value, int):
+            if value.bit_length() > MAX_DISPLAY_BITS:
+                raise OverflowError("Result too large to display")
+            digits = str(abs(value))
+            exponent = len(digits) - 1
+            if self.significant is not None and len(digits) > self.significant:
+                value = Decimal(value)
+            else:
+                digits = digits.rstrip("0") or "0"
+                return self._layout(value < 0, digits, exponent if value else 0)
+
+        if isinstance(value, Decimal):
+            if value.is_nan():
+                raise ValueError("Result is not a number")
+            if value.is_infinite():
+                raise OverflowError("Result too large")
+            if value.is_zero():
+                return self._layout(False, "0", 0)
+            if self.significant is not None:
+                value = self._context.plus(value)
+            exponent = value.adjusted()
+            if exponent >= MAX_DISPLAY_DIGITS:
+                raise OverflowError("Result too large to display")
+            sign, digit_tuple, _ = value.as_tuple()
+            digits = "".join(map(str, digit_tuple)).rstrip("0") or "0"
+            if exponent < -MAX_DISPLAY_DIGITS and self.notation == PLAIN:
+                # Too many leading zeros to write out: show it in scientific notation
+                return self._layout(bool(sign), digits, exponent, SCIENTIFIC)
+            return self._layout(bool(sign), digits, exponent)
+
+        return self.format(float(value))
+
+    def _layout(self, negative, digits, exponent, notation=None):
+        """
+        Lay out significant digits in the configured notation
+
+        Args:
+            negative: True for a leading minus sign
+            digits: Significant digits without trailing zeros ("0" for zero)
+            exponent: Decimal exponent of the first digit (value = d.ddd x 10^exponent)
+            notation: Notation to use instead of the configured one
+        """
+        notation = notation or self.notation
+        if notation == PLAIN:
+            shift = exponent
+            exponent = 0
+        elif notation == SCIENTIFIC:
+            shift = 0
+        else:
+            shift = exponent % 3
+            exponent -= shift
+
+        if shift >= len(digits) - 1:
+            whole = digits + "0" * (shift - len(digits) + 1)
+            fraction = "0"
+        elif shift >= 0:
+            whole = digits[:shift + 1]
+            fraction = digits[shift + 1:]
+        else:
+            whole = "0"
+            fraction = "0" * (-shift - 1) + digits
+
+        if self.group_separator and len(whole) > 3:
+            head = len(whole) % 3 or 3
+            groups = [whole[:head]]
+            groups.extend(whole[i:i + 3] for i in range(head, len(whole), 3))
+            whole = self.group_separator.join(groups)
+
+        text = f"{'-' if negative else ''}{whole}{self.decimal_point}{fraction}"
+        if exponent:
+            text += f"E{exponent}"
+        return text
+
+    def to_expression(self, text):
+        """
+        Convert formatted text back into parser syntax
+
+        Args:
+            text: Text produced by format()
+
+        Returns:
+            Text the expression parser reads as the same number
+        """
+        if self.group_separator:
+            text = text.replace(self.group_separator, "")
+        if self.decimal_point != ".":
+            text = text.replace(self.decimal_point, ".")
+        return text
+
+    def __eq__(self, other):
+        if not isinstance(other, ResultFormatter):
+            return NotImplemented
+        return (self.significant, self.notation, self.group_separator, self.decimal_point) == \
+            (other.significant, other.notation, other.group_separator, other.decimal_point)
+
+    def __hash__(self):
+        return hash((self.significant, self.notation, self.group_separator, self.decimal_point))
+
+    def __getstate__(self):
+        # Slots only; needed to send formatters to the worker process
+        return (self.significant, self.notation, self.group_separator, self.decimal_point)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return (f"ResultFormatter({self.significant!r}, {self.notation!r}, "
+                f"{self.group_separator!r}, {self.decimal_point!r})")
+
+
+# Formatter used when none is given: plain notation, no grouping
+DEFAULT_FORMATTER = ResultFormatter()
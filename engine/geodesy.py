@@ -0,0 +1,307 @@
+"""
+Geodesy for ORCA
+Distances, bearings, angle conversions and polygon areas on the ellipsoid, vectorized with NumPy
+
+Every function takes scalars or NumPy arrays (broadcast against each
+other) and returns a float for scalar input, an array otherwise, so the
+same code serves the calculator display and the batch evaluator.
+Latitudes and longitudes are in decimal degrees, lengths in metres.
+"""
+
+import math
+
+import numpy as np
+
+# Vincenty iteration limits: ~0.006 mm convergence, and a cap for nearly antipodal points
+_VINCENTY_TOLERANCE = 1e-12
+_VINCENTY_ITERATIONS = 200
+
+
+class Ellipsoid:
+    """An ellipsoid of revolution with the constants the formulas need precomputed"""
+
+    def __init__(self, a, inverse_flattening):
+        """
+        Constructor
+
+        Args:
+            a: Semi-major axis in metres
+            inverse_flattening: 1/f
+        """
+        self.a = a
+        self.f = 1.0 / inverse_flattening
+        self.b = a * (1.0 - self.f)
+        self.e2 = self.f * (2.0 - self.f)  # First eccentricity squared
+        self.e = math.sqrt(self.e2)
+        self.ep2 = self.e2 / (1.0 - self.e2)  # Second eccentricity squared
+        # Mean radius (2a + b) / 3, the sphere used by haversine
+        self.mean_radius = (2.0 * a + self.b) / 3.0
+        # Authalic sphere: same surface area as the ellipsoid
+        self.qp = self._q(1.0)
+        self.authalic_radius = a * math.sqrt(self.qp / 2.0)
+
+    def _q(self, sin_lat):
+        """Authalic q(φ) from sin φ (scalar or array)"""
+        e = self.e
+        e_sin = e * sin_lat
+        return (1.0 - self.e2) * (sin_lat / (1.0 - e_sin * e_sin)
+                                  - np.log((1.0 - e_sin) / (1.0 + e_sin)) / (2.0 * e))
+
+    def authalic_latitude(self, lat):
+        """Authalic latitude in radians for a geodetic latitude in radians"""
+        return np.arcsin(np.clip(self._q(np.sin(lat)) / self.qp, -1.0, 1.0))
+
+    def __repr__(self):
+        return f"Ellipsoid(a={self.a!r}, 1/f={1.0 / self.f!r})"
+
+
+WGS84 = Ellipsoid(6378137.0, 298.257223563)
+
+
+def _inputs(*values):
+    """Convert arguments to float arrays"""
+    return [np.asarray(value, dtype=float) for value in values]
+
+
+def _radians(*values):
+    """Convert arguments in degrees to float arrays in radians"""
+    return [np.radians(np.asarray(value, dtype=float)) for value in values]
+
+
+def _output(value):
+    """Return a float for 0-d results (raising on NaN/inf like the math module), else the array"""
+    if np.ndim(value) == 0:
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError("math domain error")
+    return value
+
+
+def haversine_distance(lat1, lon1, lat2, lon2, ellipsoid=WGS84):
+    """
+    Great-circle distance on the ellipsoid's mean-radius sphere
+
+    Fast, within about 0.5% of the ellipsoidal distance.
+
+    Returns:
+        Distance in metres
+    """
+    lat1, lon1, lat2, lon2 = _radians(lat1, lon1, lat2, lon2)
+    with np.errstate(invalid="ignore"):
+        h = (np.sin((lat2 - lat1) / 2.0) ** 2
+             + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2)
+        distance = 2.0 * ellipsoid.mean_radius * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+    return _output(distance)
+
+
+def vincenty_distance(lat1, lon1, lat2, lon2, ellipsoid=WGS84):
+    """
+    Geodesic distance on the ellipsoid by Vincenty's inverse formula
+
+    All point pairs iterate together; each stops changing once it has
+    converged. Nearly antipodal pairs, where the iteration does not
+    converge, fall back to haversine_distance (within about 0.5%).
+
+    Returns:
+        Distance in metres
+    """
+    lat1, lon1, lat2, lon2 = _radians(lat1, lon1, lat2, lon2)
+    a, b, f = ellipsoid.a, ellipsoid.b, ellipsoid.f
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(lat1, lon1, lat2, lon2)
+
+    # Reduced latitudes
+    u1 = np.arctan((1.0 - f) * np.tan(lat1))
+    u2 = np.arctan((1.0 - f) * np.tan(lat2))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+    longitude = (lon2 - lon1 + np.pi) % (2.0 * np.pi) - np.pi
+
+    lam = longitude.copy()
+    active = np.ones(lam.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(_VINCENTY_ITERATIONS):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0.0, 0.0,
+                                 cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1.0 - sin_alpha * sin_alpha
+            # Equatorial lines have cos²α = 0 and no cos 2σm term
+            cos_2sigma_m = np.where(cos2_alpha == 0.0, 0.0,
+                                    cos_sigma - 2.0 * sin_u1 * sin_u2 / cos2_alpha)
+            c = f / 16.0 * cos2_alpha * (4.0 + f * (4.0 - 3.0 * cos2_alpha))
+            new_lam = longitude + (1.0 - c) * f * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma
+                                         * (-1.0 + 2.0 * cos_2sigma_m * cos_2sigma_m)))
+            change = np.abs(new_lam - lam)
+            lam = np.where(active, new_lam, lam)
+            active &= ~(change <= _VINCENTY_TOLERANCE)
+            if not active.any():
+                break
+
+        u_squared = cos2_alpha * (a * a - b * b) / (b * b)
+        big_a = 1.0 + u_squared / 16384.0 * (4096.0 + u_squared * (-768.0 + u_squared
+                                                                   * (320.0 - 175.0 * u_squared)))
+        big_b = u_squared / 1024.0 * (256.0 + u_squared * (-128.0 + u_squared
+                                                           * (74.0 - 47.0 * u_squared)))
+        delta_sigma = big_b * sin_sigma * (cos_2sigma_m + big_b / 4.0 * (
+            cos_sigma * (-1.0 + 2.0 * cos_2sigma_m * cos_2sigma_m)
+            - big_b / 6.0 * cos_2sigma_m * (-3.0 + 4.0 * sin_sigma * sin_sigma)
+            * (-3.0 + 4.0 * cos_2sigma_m * cos_2sigma_m)))
+        distance = b * big_a * (sigma - delta_sigma)
+    if active.any():
+        distance = np.where(active, haversine_distance(np.degrees(lat1), np.degrees(lon1),
+                                                        np.degrees(lat2), np.degrees(lon2),
+                                                        ellipsoid), distance)
+    # Coincident points
+    distance = np.where(sin_sigma == 0.0, 0.0, distance)
+    return _output(distance)
+
+
+def initial_bearing(lat1, lon1, lat2, lon2):
+    """
+    Initial great-circle bearing from the first point towards the second
+
+    Returns:
+        Degrees clockwise from north, in [0, 360)
+    """
+    lat1, lon1, lat2, lon2 = _radians(lat1, lon1, lat2, lon2)
+    delta = lon2 - lon1
+    y = np.sin(delta) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(delta)
+    return _output(np.degrees(np.arctan2(y, x)) % 360.0)
+
+
+def dms_to_degrees(degrees, minutes=0.0, seconds=0.0):
+    """
+    Degrees, minutes and seconds to decimal degrees
+
+    The sign is taken from the first non-zero part, so -12°30' is
+    dms_to_degrees(-12, 30) and -0°30' is dms_to_degrees(0, -30).
+
+    Returns:
+        Decimal degrees
+    """
+    degrees, minutes, seconds = _inputs(degrees, minutes, seconds)
+    sign = np.where(degrees != 0, np.sign(degrees),
+                    np.where(minutes != 0, np.sign(minutes), np.sign(seconds)))
+    sign = np.where(sign == 0, 1.0, sign)
+    value = np.abs(degrees) + np.abs(minutes) / 60.0 + np.abs(seconds) / 3600.0
+    return _output(sign * value)
+
+
+def degrees_to_dms(value, second_decimals=6):
+    """
+    Decimal degrees to degrees, minutes and seconds
+
+    Args:
+        value: Decimal degrees
+        second_decimals: Seconds are rounded to this many decimals, carrying
+            into minutes and degrees (so 59.9999999" does not survive as 60")
+
+    Returns:
+        (degrees, minutes, seconds); degrees carry the sign, or minutes or
+        seconds for values between -1 and 0
+    """
+    (value,) = _inputs(value)
+    sign = np.where(value < 0, -1.0, 1.0)
+    total = np.round(np.abs(value) * 3600.0, second_decimals)
+    degrees = np.floor(total / 3600.0)
+    minutes = np.floor((total - degrees * 3600.0) / 60.0)
+    seconds = np.round(total - degrees * 3600.0 - minutes * 60.0, second_decimals)
+    # Only the leading non-zero part carries the sign
+    degrees_signed = np.where(degrees == 0, 0.0, sign * degrees)
+    minutes_signed = np.where(degrees == 0, sign * minutes, minutes)
+    seconds_signed = np.where((degrees == 0) & (minutes == 0), sign * seconds, seconds)
+    return (_output(degrees_signed), _output(minutes_signed), _output(seconds_signed))
+
+
+def to_packed_dms(value):
+    """
+    Decimal degrees to the packed sexagesimal form D.MMSSss (12.5825 → 12.3457)
+
+    This is the calculator's dms() function; deg() with one argument undoes it.
+    """
+    degrees, minutes, seconds = (np.abs(part) for part in degrees_to_dms(value, 4))
+    (value,) = _inputs(value)
+    # Seconds have 4 decimals, so the packed value has at most 8
+    packed = np.round(degrees + minutes / 100.0 + seconds / 10000.0, 8)
+    return _output(np.where(value < 0, -packed, packed))
+
+
+def from_packed_dms(value):
+    """Packed sexagesimal D.MMSSss to decimal degrees (inverse of to_packed_dms)"""
+    (value,) = _inputs(value)
+    packed = np.round(np.abs(value), 8)
+    degrees = np.floor(packed)
+    # The fraction has at most 8 digits, MMSSssss: round away the binary
+    # representation error so 12.3 reads as 30' 0" rather than 29' 59.99..."
+    minutes = np.floor(np.round((packed - degrees) * 100.0, 6))
+    seconds = np.round((packed - degrees) * 10000.0 - minutes * 100.0, 4)
+    result = degrees + (minutes * 60.0 + seconds) / 3600.0
+    return _output(np.where(value < 0, -result, result))
+
+
+def polygon_area(lats, lons, ellipsoid=WGS84):
+    """
+    Area of a polygon on the ellipsoid
+
+    Vertices are mapped to authalic latitudes, which preserve area, and
+    the spherical excess of the polygon is summed edge by edge on the
+    authalic sphere. Edges are great circles of that sphere, which differ
+    from true geodesics by far less than the coordinates' usual precision.
+
+    Args:
+        lats: Vertex latitudes along the last axis; extra leading axes hold
+            separate polygons. The ring closes itself; repeating the first
+            vertex at the end is allowed
+        lons: Vertex longitudes, same shape
+
+    Returns:
+        Area in square metres (independent of vertex order)
+    """
+    lats, lons = _inputs(lats, lons)
+    beta = ellipsoid.authalic_latitude(np.radians(lats))
+    lam = np.radians(lons)
+    beta_next = np.roll(beta, -1, axis=-1)
+    lam_next = np.roll(lam, -1, axis=-1)
+    delta = (lam_next - lam + np.pi) % (2.0 * np.pi) - np.pi
+    tan1 = np.tan(beta / 2.0)
+    tan2 = np.tan(beta_next / 2.0)
+    # Signed excess of the trapezoid between each edge and the equator
+    excess = 2.0 * np.arctan2(np.tan(delta / 2.0) * (tan1 + tan2), 1.0 + tan1 * tan2)
+    total = np.abs(np.sum(excess, axis=-1))
+    # For a ring around a pole the sum is the area between the ring and
+    # the equator, so the polygon is the rest of that hemisphere
+    around_pole = np.abs(np.sum(delta, axis=-1)) > np.pi
+    total = np.where(around_pole, 2.0 * np.pi - total, total)
+    return _output(total * ellipsoid.authalic_radius ** 2)
+
+
+def _packed_or_dms(*args):
+    """deg(d, m, s) from parts, or deg(x) from the packed form dms() produces"""
+    if len(args) == 1:
+        return from_packed_dms(args[0])
+    return dms_to_degrees(*args)
+
+
+def _geoarea(*coordinates):
+    """geoarea(lat1, lon1, lat2, lon2, ...) over at least three vertices"""
+    if len(coordinates) < 6 or len(coordinates) % 2:
+        raise ValueError("geoarea needs latitude, longitude pairs of at least three vertices")
+    points = np.broadcast_arrays(*_inputs(*coordinates))
+    lats = np.stack(points[0::2], axis=-1)
+    lons = np.stack(points[1::2], axis=-1)
+    return polygon_area(lats, lons)
+
+
+# Implementations of the geodesic functions of the expression language
+GEODESIC_FUNCTIONS = {
+    "distance": vincenty_distance,
+    "haversine": haversine_distance,
+    "bearing": initial_bearing,
+    "geoarea": _geoarea,
+    "dms": to_packed_dms,
+    "deg": _packed_or_dms,
+}
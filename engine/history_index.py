@@ -0,0 +1,78 @@
+"""
+History Search Index for ORCA
+Incrementally maintained trigram index for substring search over history
+"""
+
+
+def trigrams(text):
+    """Return the set of lower-cased three-character substrings of text"""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Maps trigrams to the keys of the entries containing them
+
+    Keys are expected to grow over time (history row ids), so search
+    results come back newest first. Candidates from the posting lists are
+    verified against the stored text, because sharing every trigram does
+    not guarantee a substring match.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._texts = {}
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, key, text):
+        """Index text under key"""
+        text = text.lower()
+        self._texts[key] = text
+        for gram in trigrams(text):
+            self._postings.setdefault(gram, set()).add(key)
+
+    def discard(self, key):
+        """Remove key from the index if present"""
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def clear(self):
+        """Remove every entry"""
+        self._postings.clear()
+        self._texts.clear()
+
+    def search(self, query, limit=None):
+        """
+        Find keys whose text contains query (case-insensitive)
+
+        Args:
+            query: Substring to look for
+            limit: Maximum number of keys to return
+
+        Returns:
+            List of matching keys, highest (newest) first
+        """
+        query = query.lower()
+        grams = trigrams(query)
+        if grams:
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            # Queries shorter than a trigram have to check every entry
+            candidates = self._texts.keys()
+        matches = []
+        for key in sorted(candidates, reverse=True):
+            if query in self._texts[key]:
+                matches.append(key)
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
@@ -0,0 +1,457 @@
+"""
+Persistent History Store for ORCA
+Append-only SQLite archive of calculations with paged, cached reads
+"""
+
+import hashlib
+import sqlite3
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from .cache import LRUCache
+from .history_index import TrigramIndex
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    expression TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL,
+    count INTEGER NOT NULL DEFAULT 1,
+    digest INTEGER
+)
+"""
+
+# Columns added after the first release, added to older databases on open
+_ADDED_COLUMNS = (
+    ("last_used", "REAL"),
+    ("count", "INTEGER NOT NULL DEFAULT 1"),
+    ("digest", "INTEGER"),
+)
+
+# Finds an earlier entry for the same calculation in one index probe
+_DIGEST_INDEX = "CREATE INDEX IF NOT EXISTS history_digest ON history (digest)"
+
+# Full-text index over expressions and results (needs SQLite 3.34+ with FTS5)
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE history_fts USING fts5(expression, result, tokenize='trigram')
+"""
+
+
+def entry_digest(expression, result):
+    """
+    Stable 64-bit hash of a calculation, stored to look up repeats
+
+    Python's hash() of a string changes from one session to the next, so
+    it cannot be kept in the database.
+
+    Args:
+        expression: Expression text
+        result: Result text
+
+    Returns:
+        Signed 64-bit int (SQLite's INTEGER range)
+    """
+    data = f"{expression}\n{result}".encode("utf-8", "surrogatepass")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True)
+
+
+class HistoryEntry:
+    """One cached history row; the expression string is interned
+
+    Repeated expressions (the same formula with different variable values,
+    or ans-based chains) then share one string object across the page cache.
+    """
+
+    __slots__ = ("expression", "result", "count")
+
+    def __init__(self, expression, result, count=1):
+        self.expression = sys.intern(expression)
+        self.result = result
+        self.count = count
+
+
+class HistoryStore:
+    """On-disk calculation history: a fixed-capacity sequence of entries, oldest first
+
+    Index 0 is the oldest entry and -1 the most recent. SQLite assigns the
+    row ids, and the store keeps them in order in a compact array (8 bytes
+    per entry), so any index maps to an id in O(1) and reads are served
+    one page of ids at a time from a small LRU page cache. Several QGIS
+    instances can share one database: writes from another connection
+    are noticed through PRAGMA data_version and the ids read again, and
+    the oldest rows are evicted in id order whoever wrote them.
+
+    Each calculation is stored once: find() looks up an entry by a digest
+    of its expression and result through an SQLite index, and touch()
+    counts a repeat on the existing entry, moving it to the most recent
+    position, instead of appending it again.
+
+    Searches use an FTS5 trigram table kept in step with every append and
+    delete. Where SQLite lacks the trigram tokenizer, an in-memory
+    TrigramIndex is built on the first search and maintained from then on.
+    """
+
+    def __init__(self, path, capacity=966, page_size=64, cached_pages=32):
+        """
+        Constructor
+
+        Args:
+            path: Database file path (":memory:" for a throwaway store)
+            capacity: Maximum number of entries to keep
+            page_size: Number of rows fetched per read
+            cached_pages: Number of pages kept in memory
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self._capacity = capacity
+        self.page_size = page_size
+        self._pages = LRUCache(maxsize=cached_pages)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._migrate()
+        self._conn.execute(_DIGEST_INDEX)
+        self._fts = self._init_fts()
+        self._memory_index = None
+        self._conn.commit()
+        self._ids = array("q")  # Row ids, oldest first
+        self._data_version = None
+        self.reload()
+        if len(self) > capacity:
+            self.resize(capacity)
+
+    @property
+    def capacity(self):
+        """Maximum number of entries the store holds"""
+        return self._capacity
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("history index out of range")
+        entry = self.entry(index)
+        return (entry.expression, entry.result)
+
+    def __iter__(self):
+        self._reload_if_changed()
+        for index in range(len(self)):
+            yield self[index]
+
+    def __reversed__(self):
+        self._reload_if_changed()
+        for index in range(len(self) - 1, -1, -1):
+            yield self[index]
+
+    def entry(self, index):
+        """
+        The cached record of an entry, with its repeat count
+
+        Args:
+            index: Entry index (0 is the oldest, -1 the most recent)
+
+        Returns:
+            HistoryEntry
+        """
+        row_id = self._row_id(index)
+        page_number = row_id // self.page_size
+        page = self._pages.get(page_number)
+        if page is None or row_id not in page:
+            page = self._load_page(page_number)
+        entry = page.get(row_id)
+        if entry is None:
+            # Evicted by another instance since the ids were read; blank
+            # until the next reload
+            return HistoryEntry("", "", 0)
+        return entry
+
+    def changed_elsewhere(self):
+        """True if another connection has written to the database since the ids were read"""
+        return self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version
+
+    def reload(self):
+        """Read the row ids again, e.g. after changed_elsewhere()"""
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._ids = array("q", (row_id for row_id, in self._conn.execute(
+            "SELECT id FROM history ORDER BY id")))
+        self._pages.clear()
+        self._memory_index = None  # Rebuilt by the next search that needs it
+
+    def find(self, item):
+        """
+        Look up an earlier entry for the same calculation
+
+        Args:
+            item: (expression, result) tuple
+
+        Returns:
+            Index of the entry, or None if the calculation is not in the history
+        """
+        self._reload_if_changed()
+        expression, result = item
+        row = self._conn.execute(
+            "SELECT id FROM history WHERE digest = ? AND expression = ? AND result = ? LIMIT 1",
+            (entry_digest(expression, result), expression, result),
+        ).fetchone()
+        return None if row is None else self._index_of(row[0])
+
+    def touch(self, index):
+        """
+        Count a repeat of an entry and move it to the most recent position
+
+        The row is copied to a new, SQLite-assigned id and the old one is
+        deleted, so a calculation in frequent use is never the next one to
+        be evicted.
+
+        Args:
+            index: Entry index, e.g. from find()
+        """
+        entry = self.entry(index)
+        row_id = self._row_id(index)
+        now = time.time()
+        if row_id == self._ids[-1]:
+            # Already the most recent entry
+            self._conn.execute(
+                "UPDATE history SET count = count + 1, last_used = ? WHERE id = ?", (now, row_id))
+            self._conn.commit()
+            entry.count += 1
+            return
+        new_id = self._conn.execute(
+            "INSERT INTO history (expression, result, created, last_used, count, digest) "
+            "SELECT expression, result, created, ?, count + 1, digest FROM history WHERE id = ?",
+            (now, row_id),
+        ).lastrowid
+        self._conn.execute("DELETE FROM history WHERE id = ?", (row_id,))
+        if self._fts:
+            self._conn.execute("DELETE FROM history_fts WHERE rowid = ?", (row_id,))
+            self._conn.execute(
+                "INSERT INTO history_fts (rowid, expression, result) VALUES (?, ?, ?)",
+                (new_id, entry.expression, entry.result),
+            )
+        elif self._memory_index is not None:
+            self._memory_index.discard(row_id)
+            self._memory_index.add(new_id, _search_text(entry.expression, entry.result))
+        self._conn.commit()
+        del self._ids[self._index_of(row_id)]
+        self._ids.append(new_id)
+        page = self._pages.get(row_id // self.page_size)
+        if page is not None:
+            page.pop(row_id, None)
+        page = self._pages.get(new_id // self.page_size)
+        if page is not None:
+            page[new_id] = HistoryEntry(entry.expression, entry.result, entry.count + 1)
+
+    def is_full(self):
+        """True when the next append will evict the oldest entry"""
+        return len(self) >= self._capacity
+
+    def append(self, item):
+        """
+        Add an entry as the most recent
+
+        Args:
+            item: (expression, result) tuple
+
+        Returns:
+            The evicted oldest entry, or None if nothing was evicted
+        """
+        self._reload_if_changed()
+        evicted = self.popleft() if self.is_full() else None
+        expression, result = item
+        now = time.time()
+        row_id = self._conn.execute(
+            "INSERT INTO history (expression, result, created, last_used, digest) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (expression, result, now, now, entry_digest(expression, result)),
+        ).lastrowid
+        if self._fts:
+            self._conn.execute(
+                "INSERT INTO history_fts (rowid, expression, result) VALUES (?, ?, ?)",
+                (row_id, expression, result),
+            )
+        elif self._memory_index is not None:
+            self._memory_index.add(row_id, _search_text(expression, result))
+        self._conn.commit()
+        self._ids.append(row_id)
+        page = self._pages.get(row_id // self.page_size)
+        if page is not None:
+            page[row_id] = HistoryEntry(expression, result)
+        return evicted
+
+    def popleft(self):
+        """
+        Remove and return the oldest entry
+
+        Returns:
+            The oldest entry
+        """
+        self._reload_if_changed()
+        item = self[0]
+        self._delete_oldest(1)
+        return item
+
+    def clear(self):
+        """Remove all entries"""
+        self._conn.execute("DELETE FROM history")
+        if self._fts:
+            self._conn.execute("DELETE FROM history_fts")
+        elif self._memory_index is not None:
+            self._memory_index.clear()
+        self._conn.commit()
+        self._pages.clear()
+        self._ids = array("q")
+
+    def resize(self, capacity):
+        """
+        Change the capacity, deleting the oldest entries beyond it
+
+        Args:
+            capacity: New maximum number of entries
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._capacity = capacity
+        self._reload_if_changed()
+        if len(self) > capacity:
+            self._delete_oldest(len(self) - capacity)
+
+    def search(self, query, limit=500):
+        """
+        Find entries whose expression or result contains query
+
+        Args:
+            query: Case-insensitive substring to look for
+            limit: Maximum number of entries to return
+
+        Returns:
+            List of (expression, result) tuples, most recent first
+        """
+        query = query.strip()
+        if not query:
+            return []
+        if self._fts and len(query) >= 3:
+            phrase = '"' + query.replace('"', '""') + '"'
+            return self._conn.execute(
+                "SELECT expression, result FROM history_fts WHERE history_fts MATCH ? "
+                "ORDER BY rowid DESC LIMIT ?",
+                (phrase, limit),
+            ).fetchall()
+        elif self._fts:
+            # Too short for a trigram; scan backwards from the newest entry
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            return self._conn.execute(
+                "SELECT expression, result FROM history WHERE expression LIKE ? ESCAPE '\\' "
+                "OR result LIKE ? ESCAPE '\\' ORDER BY id DESC LIMIT ?",
+                (pattern, pattern, limit),
+            ).fetchall()
+        self._reload_if_changed()
+        row_ids = self._get_memory_index().search(query, limit)
+        return [self[self._index_of(row_id)] for row_id in row_ids]
+
+    def close(self):
+        """Close the database connection"""
+        self._conn.close()
+
+    def _row_id(self, index):
+        """Row id of the entry at index"""
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("history index out of range")
+        return self._ids[index]
+
+    def _index_of(self, row_id):
+        """Index of the entry with a row id, or None if it is not in the history"""
+        index = bisect_left(self._ids, row_id)
+        return index if index < len(self._ids) and self._ids[index] == row_id else None
+
+    def _reload_if_changed(self):
+        """Pick up rows written or deleted by another instance"""
+        if self.changed_elsewhere():
+            self.reload()
+
+    def _delete_oldest(self, count):
+        """Delete the count oldest rows, in id order"""
+        cutoff = self._ids[count - 1]
+        self._conn.execute("DELETE FROM history WHERE id IN "
+                           "(SELECT id FROM history ORDER BY id LIMIT ?)", (count,))
+        if self._fts:
+            self._conn.execute("DELETE FROM history_fts WHERE rowid <= ?", (cutoff,))
+        elif self._memory_index is not None:
+            for row_id in self._ids[:count]:
+                self._memory_index.discard(row_id)
+        self._conn.commit()
+        del self._ids[:count]
+
+    def _migrate(self):
+        """Add the columns a database from an older version lacks"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(history)")}
+        for name, declaration in _ADDED_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE history ADD COLUMN {name} {declaration}")
+        if "digest" not in columns:
+            self._conn.create_function("entry_digest", 2, entry_digest, deterministic=True)
+            self._conn.execute("UPDATE history SET digest = entry_digest(expression, result), "
+                               "last_used = created")
+
+    def _init_fts(self):
+        """Create the full-text table if needed; return False if unsupported"""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'history_fts'"
+        ).fetchone()
+        if exists:
+            return True
+        try:
+            self._conn.execute(_FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            return False
+        # Index entries written before the full-text table existed
+        self._conn.execute(
+            "INSERT INTO history_fts (rowid, expression, result) "
+            "SELECT id, expression, result FROM history"
+        )
+        return True
+
+    def _get_memory_index(self):
+        """Build the in-memory fallback index on first use"""
+        if self._memory_index is None:
+            index = TrigramIndex()
+            rows = self._conn.execute("SELECT id, expression, result FROM history")
+            for row_id, expression, result in rows:
+                index.add(row_id, _search_text(expression, result))
+            self._memory_index = index
+        return self._memory_index
+
+    def _load_page(self, page_number):
+        """Read one page of rows into the page cache"""
+        start = page_number * self.page_size
+        rows = self._conn.execute(
+            "SELECT id, expression, result, count FROM history WHERE id >= ? AND id < ?",
+            (start, start + self.page_size),
+        ).fetchall()
+        page = {row_id: HistoryEntry(expression, result, count)
+                for row_id, expression, result, count in rows}
+        self._pages.put(page_number, page)
+        return page
+
+
+def _search_text(expression, result):
+    """Text matched by the fallback index; a query never spans both fields"""
+    return f"{expression}\n{result}"
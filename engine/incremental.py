@@ -0,0 +1,134 @@
+"""
+Incremental Evaluation for ORCA
+Re-evaluates an expression as it is edited, reusing work from the unchanged prefix
+"""
+
+import decimal
+
+from .compiler import compile_node, free_variables
+from .cost import FAST, OVERFLOW, estimate_cost
+from .evaluation import ERROR_TEXT, OVERFLOW_TEXT
+from .formatting import DEFAULT_FORMATTER
+from .parser import END, ExpressionError, Number, Parser, tokenize
+
+# Preview text for results that need the arbitrary-precision worker
+PENDING_TEXT = "…"
+
+
+class IncrementalEvaluator:
+    """Evaluates successive versions of one expression as the user types
+
+    Tokens ending before the first changed character are reused as-is and
+    only the tail is re-tokenized. Parenthesized groups lying entirely in
+    the unchanged prefix keep their subtrees, and subtrees compiled for the
+    previous version (with their folded constant values) are not compiled
+    again, so typing at the end of a long formula re-does only the tail.
+    """
+
+    def __init__(self):
+        self.precision = None  # precision.Precision, or None for float
+        self.formatter = DEFAULT_FORMATTER  # formatting.ResultFormatter for previews
+        self.variables = {}  # Variable values available to previewed expressions
+        self._text = ""
+        self._tokens = []
+        self._groups = {}
+        self._compiled = {}
+
+    def parse(self, text):
+        """
+        Parse text, reusing tokens and groups from the previous call
+
+        Args:
+            text: Current expression text
+
+        Returns:
+            Root node of the expression tree
+        """
+        common = 0
+        limit = min(len(text), len(self._text))
+        while common < limit and text[common] == self._text[common]:
+            common += 1
+
+        # A token touching the first change could be extended by it ("12" -> "123")
+        keep = 0
+        for token in self._tokens:
+            if token.kind == END or token.pos + len(token.text) >= common:
+                break
+            keep += 1
+        # Two more tokens can merge into a number exponent ("1.5", "E", "-" -> "1.5E-6")
+        keep = max(0, keep - 2)
+        kept = self._tokens[:keep]
+        start = kept[-1].pos + len(kept[-1].text) if kept else 0
+
+        tokens = tokenize(text, start, kept)
+        self._text = text
+        self._tokens = tokens
+
+        parser = Parser(tokens, self._groups, keep)
+        try:
+            tree = parser.parse()
+        finally:
+            # Groups completed in this parse stay valid for the next one
+            self._groups = parser.groups
+        return tree
+
+    def preview(self, text):
+        """
+        Evaluate text for a live preview
+
+        Args:
+            text: Current expression text
+
+        Returns:
+            Formatted result, PENDING_TEXT if it needs the worker, OVERFLOW_TEXT,
+            or "" while the expression is incomplete or invalid
+        """
+        try:
+            tree = self.parse(text)
+            if isinstance(tree, Number):
+                # A plain number previews as itself; nothing to show
+                return ""
+            if not free_variables(tree).issubset(self.variables):
+                # Probably a name still being typed
+                return ""
+            route = estimate_cost(tree).route
+        except (ExpressionError, RecursionError):
+            # Incomplete, or nested too deeply to analyse (e.g. a huge paste)
+            return ""
+        if route == OVERFLOW:
+            return OVERFLOW_TEXT
+        if route != FAST:
+            return PENDING_TEXT
+        if len(self._compiled) > 8 * len(self._tokens) + 64:
+            # Drop closures of subtrees that are no longer part of the text
+            self._compiled = {}
+        try:
+            if self.precision is None:
+                evaluate = compile_node(tree, memo=self._compiled)
+                return self.formatter.format(evaluate(self.variables))
+            precision = self.precision
+            evaluate = precision.compile(tree, memo=self._compiled)
+            return precision.format(precision.evaluate_compiled(evaluate, self.variables),
+                                    self.formatter)
+        except (OverflowError, decimal.Overflow):
+            return OVERFLOW_TEXT
+        except Exception:
+            return ERROR_TEXT
+
+    def set_precision(self, precision):
+        """
+        Switch the number system used for previews
+
+        Args:
+            precision: precision.Precision, or None for float arithmetic
+        """
+        self.precision = precision
+        # Closures compiled for the previous number system cannot be reused
+        self._compiled = {}
+
+    def reset(self):
+        """Forget all state from previous versions"""
+        self._text = ""
+        self._tokens = []
+        self._groups = {}
+        self._compiled = {}
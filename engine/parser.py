@@ -0,0 +1,273 @@
+"""
+Expression Parser for ORCA
+Tokenizes the calculator display grammar and parses it into an expression tree
+"""
+
+import re
+from collections import namedtuple
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression cannot be tokenized, parsed or evaluated"""
+
+
+# Expression tree nodes
+# Number.text keeps the literal as typed, for number systems more precise than float
+Number = namedtuple("Number", "value text", defaults=(None,))
+Name = namedtuple("Name", "name")
+UnaryOp = namedtuple("UnaryOp", "op operand")
+BinaryOp = namedtuple("BinaryOp", "op left right")
+Postfix = namedtuple("Postfix", "op operand")
+Call = namedtuple("Call", "func args")
+
+# Token kinds
+NUM = "NUM"
+NAME = "NAME"
+OP = "OP"
+POSTFIX = "POSTFIX"
+LPAREN = "("
+RPAREN = ")"
+COMMA = ","
+END = "END"
+
+Token = namedtuple("Token", "kind text pos")
+
+# Order matters: "x²"/"x³" must be tried before plain names. Number exponents
+# use an upper-case E ("1.5E6") so they cannot be confused with Euler's e
+_TOKEN_RE = re.compile(
+    r"(?P<ws>\s+)"
+    r"|(?P<num>(?:\d+\.?\d*|\.\d+)(?:E[-+]?\d+)?)"
+    r"|(?P<power>x?[²³])"
+    r"|(?P<name>[A-Za-z_][A-Za-z0-9_]*|π|√)"
+    r"|(?P<op>[-+*/^])"
+    r"|(?P<postfix>[!%])"
+    r"|(?P<lparen>\()"
+    r"|(?P<rparen>\))"
+    r"|(?P<comma>,)"
+)
+
+# Binary operators: symbol -> (precedence, right associative)
+BINARY_OPERATORS = {
+    "+": (1, False),
+    "-": (1, False),
+    "*": (2, False),
+    "/": (2, False),
+    "^": (4, True),
+}
+UNARY_PRECEDENCE = 3
+IMPLICIT_MULTIPLY_PRECEDENCE = BINARY_OPERATORS["*"][0]
+
+# Geodesic functions over coordinates in decimal degrees (implemented in engine.geodesy)
+GEODESIC_FUNCTION_NAMES = ("distance", "haversine", "bearing", "geoarea", "dms", "deg")
+
+# Aggregates over numbers and value lists (implemented in engine.aggregates)
+AGGREGATE_FUNCTION_NAMES = ("sum", "mean", "std", "min", "max", "median", "percentile")
+
+# Names that are parsed as functions rather than variables
+FUNCTION_NAMES = frozenset(["sin", "cos", "tan", "log", "ln", "√",
+                            *GEODESIC_FUNCTION_NAMES, *AGGREGATE_FUNCTION_NAMES])
+
+# Tokens that start an implicit multiplication ("2π", "3(4+1)"); a number
+# only does so after ")", so typos such as "1..2" or "2 3" are errors
+_OPERAND_START = (NAME, LPAREN)
+# Tokens after which "x²" is the square postfix rather than a variable "x"
+_OPERAND_END = (NUM, NAME, RPAREN, POSTFIX)
+
+
+def tokenize(expression, start=0, tokens=None):
+    """
+    Split a display expression into tokens
+
+    "x²" and "x³" are the square/cube buttons when they follow an operand
+    ("5x²"), and a variable named x raised to a power otherwise ("x²+1").
+
+    Args:
+        expression: Expression string as shown on the calculator display
+        start: Position to resume tokenizing from
+        tokens: Already known tokens of expression[:start] (not modified)
+
+    Returns:
+        List of Token tuples terminated by an END token
+    """
+    tokens = list(tokens) if tokens else []
+    pos = start
+    length = len(expression)
+    while pos < length:
+        match = _TOKEN_RE.match(expression, pos)
+        if match is None:
+            raise ExpressionError(f"Unexpected character '{expression[pos]}' at position {pos}")
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "num":
+            tokens.append(Token(NUM, text, pos))
+        elif kind == "power":
+            if text[0] == "x" and not (tokens and tokens[-1].kind in _OPERAND_END):
+                tokens.append(Token(NAME, "x", pos))
+            # The postfix token covers only the "²"/"³" glyph, so resuming
+            # after it (incremental tokenizing) does not read the glyph again
+            tokens.append(Token(POSTFIX, text[-1], match.end() - 1))
+        elif kind == "name":
+            tokens.append(Token(NAME, text, pos))
+        elif kind == "op":
+            tokens.append(Token(OP, text, pos))
+        elif kind == "postfix":
+            tokens.append(Token(POSTFIX, text, pos))
+        elif kind == "lparen":
+            tokens.append(Token(LPAREN, text, pos))
+        elif kind == "rparen":
+            tokens.append(Token(RPAREN, text, pos))
+        elif kind == "comma":
+            tokens.append(Token(COMMA, text, pos))
+        pos = match.end()
+    tokens.append(Token(END, "", length))
+    return tokens
+
+
+class Parser:
+    """Precedence-climbing parser producing an expression tree from tokens"""
+
+    def __init__(self, tokens, groups=None, reusable=0):
+        """
+        Constructor
+
+        Args:
+            tokens: Token list from tokenize()
+            groups: Optional memo of parenthesized groups from an earlier parse,
+                mapping the "(" token index to (node, index after ")")
+            reusable: Number of leading tokens unchanged since that parse
+        """
+        self.tokens = tokens
+        self.index = 0
+        self._old_groups = groups or {}
+        self._reusable = reusable
+        self.groups = {}
+
+    def peek(self):
+        """Return the current token without consuming it"""
+        return self.tokens[self.index]
+
+    def advance(self):
+        """Consume and return the current token"""
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, kind):
+        """Consume a token of the given kind or raise ExpressionError"""
+        token = self.advance()
+        if token.kind != kind:
+            raise ExpressionError(f"Expected '{kind}' at position {token.pos}")
+        return token
+
+    def parse(self):
+        """Parse the whole token stream into a single expression tree"""
+        if self.peek().kind == END:
+            raise ExpressionError("Empty expression")
+        node = self.parse_expression(1)
+        token = self.peek()
+        if token.kind != END:
+            raise ExpressionError(f"Unexpected '{token.text}' at position {token.pos}")
+        return node
+
+    def parse_expression(self, min_precedence):
+        """Parse binary operators with precedence of at least min_precedence"""
+        left = self.parse_unary()
+        while True:
+            token = self.peek()
+            if token.kind == OP and token.text in BINARY_OPERATORS:
+                op = token.text
+                precedence, right_assoc = BINARY_OPERATORS[op]
+                explicit = True
+            elif token.kind in _OPERAND_START or (
+                    token.kind == NUM and self.tokens[self.index - 1].kind == RPAREN):
+                # Implicit multiplication: "2π", "3(4+1)", "2sin(x)", "(4+1)3"
+                op = "*"
+                precedence, right_assoc = IMPLICIT_MULTIPLY_PRECEDENCE, False
+                explicit = False
+            elif token.kind == NUM:
+                raise ExpressionError(f"Missing operator before '{token.text}' at position {token.pos}")
+            else:
+                break
+            if precedence < min_precedence:
+                break
+            if explicit:
+                self.advance()
+            next_min = precedence if right_assoc else precedence + 1
+            right = self.parse_expression(next_min)
+            left = BinaryOp(op, left, right)
+        return left
+
+    def parse_unary(self):
+        """Parse prefix + and - (binding looser than ^, so -2^2 is -4)"""
+        token = self.peek()
+        if token.kind == OP and token.text in "+-":
+            self.advance()
+            operand = self.parse_expression(UNARY_PRECEDENCE)
+            return UnaryOp(token.text, operand)
+        return self.parse_postfix()
+
+    def parse_postfix(self):
+        """Parse a primary followed by any number of ², ³, ! and % operators"""
+        node = self.parse_primary()
+        while self.peek().kind == POSTFIX:
+            op = self.advance().text
+            if op == "²":
+                node = BinaryOp("^", node, Number(2))
+            elif op == "³":
+                node = BinaryOp("^", node, Number(3))
+            else:
+                node = Postfix(op, node)
+        return node
+
+    def parse_primary(self):
+        """Parse a number, name, function call or parenthesized expression"""
+        token = self.advance()
+        if token.kind == NUM:
+            text = token.text
+            if "." in text or "E" in text:
+                return Number(float(text), text)
+            return Number(int(text), text)
+        if token.kind == NAME:
+            if token.text in FUNCTION_NAMES:
+                return self.parse_call(token.text)
+            return Name(token.text)
+        if token.kind == LPAREN:
+            start = self.index - 1
+            memo = self._old_groups.get(start)
+            if memo is not None and memo[1] <= self._reusable:
+                # Group lies entirely in the unchanged prefix: reuse its subtree
+                node, self.index = memo
+            else:
+                node = self.parse_expression(1)
+                self.expect(RPAREN)
+            self.groups[start] = (node, self.index)
+            return node
+        if token.kind == END:
+            raise ExpressionError("Unexpected end of expression")
+        raise ExpressionError(f"Unexpected '{token.text}' at position {token.pos}")
+
+    def parse_call(self, func):
+        """Parse the arguments of a function call such as sin(x) or √16"""
+        if self.peek().kind != LPAREN:
+            # Allow the parenthesis-free form for a single operand, e.g. "√16"
+            return Call(func, (self.parse_postfix(),))
+        self.advance()
+        args = [self.parse_expression(1)]
+        while self.peek().kind == COMMA:
+            self.advance()
+            args.append(self.parse_expression(1))
+        self.expect(RPAREN)
+        return Call(func, tuple(args))
+
+
+def parse(expression):
+    """
+    Parse a display expression into an expression tree
+
+    Args:
+        expression: Expression string as shown on the calculator display
+
+    Returns:
+        Root node of the expression tree
+    """
+    return Parser(tokenize(expression)).parse()
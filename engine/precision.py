@@ -0,0 +1,380 @@
+"""
+Precision Modes for ORCA
+Evaluates expressions with Decimal or Fraction arithmetic instead of float
+"""
+
+import decimal
+import math
+import operator
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+
+from .aggregates import ValueSummary
+from .cache import LRUCache, normalize_expression
+from .compiler import MATH_FUNCTIONS, MAX_INT_BITS, compile_node
+from .cost import check_size
+from .formatting import DEFAULT_FORMATTER
+from .parser import AGGREGATE_FUNCTION_NAMES, GEODESIC_FUNCTION_NAMES, parse
+
+# Number systems
+FLOAT = "float"        # Python floats: fastest, about 15-17 significant digits
+DECIMAL = "decimal"    # decimal.Decimal rounded to a configurable number of digits
+FRACTION = "fraction"  # Exact rationals; irrational functions are rounded like DECIMAL
+
+MODES = (FLOAT, DECIMAL, FRACTION)
+
+DEFAULT_DIGITS = 34
+MIN_DIGITS = 5
+MAX_DIGITS = 1000
+
+# Extra digits carried inside series and argument reduction
+_GUARD_DIGITS = 5
+
+
+@lru_cache(maxsize=8)
+def _pi(digits):
+    """pi to the given number of significant digits (recipe from the decimal docs)"""
+    with decimal.localcontext() as context:
+        context.prec = digits + _GUARD_DIGITS
+        three = Decimal(3)
+        lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+        while s != lasts:
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+        context.prec = digits
+        return +s
+
+
+def _reduce_angle(value):
+    """Reduce an angle into [-pi, pi] with enough digits of pi for large inputs"""
+    context = decimal.getcontext()
+    digits = context.prec + max(0, value.adjusted()) + _GUARD_DIGITS
+    with decimal.localcontext() as local:
+        local.prec = digits
+        reduced = value.remainder_near(2 * _pi(digits))
+    return reduced
+
+
+def _sin_cos(value, start):
+    """Taylor series for sin (start=1) or cos (start=0) at the current precision"""
+    with decimal.localcontext() as context:
+        context.prec += _GUARD_DIGITS
+        x = _reduce_angle(value)
+        square = x * x
+        term = x if start else Decimal(1)
+        total, last, i = term, None, start
+        while total != last:
+            last = total
+            term = -term * square / ((i + 1) * (i + 2))
+            total += term
+            i += 2
+    return +total
+
+
+def _decimal_sin(value):
+    return _sin_cos(value, 1)
+
+
+def _decimal_cos(value):
+    return _sin_cos(value, 0)
+
+
+def _decimal_tan(value):
+    with decimal.localcontext() as context:
+        context.prec += _GUARD_DIGITS
+        result = _sin_cos(value, 1) / _sin_cos(value, 0)
+    return +result
+
+
+def _decimal_power(base, exponent):
+    """Decimal power; complex results (negative base, fractional exponent) are errors"""
+    if base < 0 and exponent != exponent.to_integral_value():
+        raise ValueError("Power has no real result")
+    if not base and exponent < 0:
+        # Decimal returns Infinity, which would be shown as an overflow
+        raise ZeroDivisionError("Zero to a negative power")
+    if not base and not exponent:
+        # Decimal treats 0^0 as undefined; float and Fraction give 1
+        return Decimal(1)
+    return base ** exponent
+
+
+def _decimal_logarithm(func):
+    """Wrap Decimal.ln/log10 so non-positive arguments are errors, as with floats"""
+    def evaluate(value):
+        if value <= 0:
+            # Decimal gives -Infinity for 0 (shown as an overflow) and NaN below
+            raise ValueError("math domain error")
+        return func(value)
+    return evaluate
+
+
+def _decimal_factorial(value):
+    """Factorial of an integral Decimal, rounded to the current precision"""
+    if value != value.to_integral_value():
+        raise ValueError("Factorial is only defined for whole numbers")
+    n = int(value)
+    if n > 2 and math.lgamma(n + 1) / math.log(2) > MAX_INT_BITS:
+        raise OverflowError("Result too large")
+    return +Decimal(math.factorial(n))
+
+
+def _to_decimal(value):
+    """Fraction (or int) to Decimal at the current precision"""
+    if isinstance(value, Fraction):
+        return Decimal(value.numerator) / Decimal(value.denominator)
+    return +Decimal(value)
+
+
+def _fraction_power(base, exponent):
+    """Exact power for whole exponents; other exponents are rounded through Decimal"""
+    if exponent.denominator == 1:
+        power = exponent.numerator
+        size = max(abs(base.numerator), base.denominator)
+        if abs(power) > 1 and size > 1 and math.log2(size) * abs(power) > MAX_INT_BITS:
+            raise OverflowError("Result too large")
+        return base ** power
+    return Fraction(_decimal_power(_to_decimal(base), _to_decimal(exponent)))
+
+
+def _fraction_factorial(value):
+    """Exact factorial of a whole number"""
+    if value.denominator != 1:
+        raise ValueError("Factorial is only defined for whole numbers")
+    n = value.numerator
+    if n < 0:
+        raise ValueError("Factorial is only defined for whole numbers")
+    if n > 2 and math.lgamma(n + 1) / math.log(2) > MAX_INT_BITS:
+        raise OverflowError("Result too large")
+    return Fraction(math.factorial(n))
+
+
+def _fraction_number(text):
+    """
+    Exact value of a literal, refusing exponents too large to expand
+
+    Fraction("1E10000000") builds a ten-million-digit integer, which would
+    block the thread for seconds (and far longer for negative exponents).
+    """
+    value = Decimal(text)
+    if not value:
+        return Fraction(0)
+    # Digits of the numerator (positive exponent) or denominator (negative)
+    digits = max(abs(value.adjusted()), len(value.as_tuple().digits))
+    if digits * math.log2(10) > MAX_INT_BITS:
+        raise OverflowError("Number too large to represent exactly")
+    return Fraction(value)
+
+
+def _fraction_sqrt(value):
+    """Exact square root when numerator and denominator are perfect squares"""
+    if value >= 0:
+        numerator = math.isqrt(value.numerator)
+        denominator = math.isqrt(value.denominator)
+        if numerator * numerator == value.numerator and denominator * denominator == value.denominator:
+            return Fraction(numerator, denominator)
+    return Fraction(_to_decimal(value).sqrt())
+
+
+def _rounded(func):
+    """Wrap a Decimal function so it takes and returns Fractions"""
+    def evaluate(value):
+        return Fraction(func(_to_decimal(value)))
+    return evaluate
+
+
+def _via_float(func, convert):
+    """Wrap a float function (geodesic, aggregate) so it takes and returns another number type"""
+    def evaluate(*args):
+        args = [arg if isinstance(arg, ValueSummary) else float(arg) for arg in args]
+        # 15 significant digits: the float rounding noise in the last digits is dropped
+        return convert(format(func(*args), ".15g"))
+    return evaluate
+
+
+DECIMAL_FUNCTIONS = {
+    "num": Decimal,
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "^": _decimal_power,
+    "neg": operator.neg,
+    "pos": operator.pos,
+    "!": _decimal_factorial,
+    "%": lambda value: value / 100,
+    "√": Decimal.sqrt,
+    "sin": _decimal_sin,
+    "cos": _decimal_cos,
+    "tan": _decimal_tan,
+    "log": _decimal_logarithm(Decimal.log10),
+    "ln": _decimal_logarithm(Decimal.ln),
+    # Geodesic functions and aggregates work in double precision
+    **{name: _via_float(MATH_FUNCTIONS[name], Decimal)
+       for name in GEODESIC_FUNCTION_NAMES + AGGREGATE_FUNCTION_NAMES},
+}
+
+FRACTION_FUNCTIONS = {
+    "num": _fraction_number,
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "^": _fraction_power,
+    "neg": operator.neg,
+    "pos": operator.pos,
+    "!": _fraction_factorial,
+    "%": lambda value: value / 100,
+    "√": _fraction_sqrt,
+    "sin": _rounded(_decimal_sin),
+    "cos": _rounded(_decimal_cos),
+    "tan": _rounded(_decimal_tan),
+    "log": _rounded(_decimal_logarithm(Decimal.log10)),
+    "ln": _rounded(_decimal_logarithm(Decimal.ln)),
+    **{name: _via_float(MATH_FUNCTIONS[name], Fraction)
+       for name in GEODESIC_FUNCTION_NAMES + AGGREGATE_FUNCTION_NAMES},
+}
+
+
+class Precision:
+    """A number system and precision for evaluating display expressions
+
+    Compiled expressions are cached per Precision, so switching modes does
+    not evict the float fast path's cache. Each evaluation runs inside the
+    Precision's own decimal context, leaving the thread's context alone.
+    """
+
+    def __init__(self, mode=DECIMAL, digits=DEFAULT_DIGITS):
+        """
+        Constructor
+
+        Args:
+            mode: DECIMAL or FRACTION (FLOAT uses the engine's default path)
+            digits: Significant digits shown; Decimal arithmetic carries a few more
+        """
+        if mode not in (DECIMAL, FRACTION):
+            raise ValueError(f"Unknown precision mode '{mode}'")
+        self.mode = mode
+        self.digits = max(MIN_DIGITS, min(int(digits), MAX_DIGITS))
+        # Arithmetic carries guard digits; results are rounded to digits when
+        # formatted, so sin(π/6) shows 0.5 rather than 0.4999...9
+        self.context = decimal.Context(prec=self.digits + _GUARD_DIGITS,
+                                       Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+        self.display_context = self.context.copy()
+        self.display_context.prec = self.digits
+        with decimal.localcontext(self.context):
+            pi = +_pi(self.context.prec)
+            e = Decimal(1).exp()
+        if mode == DECIMAL:
+            self.functions = DECIMAL_FUNCTIONS
+            self.constants = {"π": pi, "e": e}
+        else:
+            self.functions = FRACTION_FUNCTIONS
+            self.constants = {"π": Fraction(pi), "e": Fraction(e)}
+        self._compiled = LRUCache(maxsize=256)
+
+    def compile(self, tree, memo=None):
+        """
+        Compile an expression tree for this number system
+
+        Args:
+            tree: Root node of an expression tree
+            memo: Optional dict passed through to compile_node
+
+        Returns:
+            Callable evaluate(env); call it through evaluate_compiled()
+        """
+        with decimal.localcontext(self.context):
+            # Constant folding happens here, so it needs the same context
+            return compile_node(tree, self.functions, self.constants, memo)
+
+    def convert(self, value):
+        """Convert a float, int, Decimal or Fraction to this number system"""
+        if isinstance(value, ValueSummary):
+            # Value lists are summarized in floats and only used by aggregates
+            return value
+        if self.mode == DECIMAL:
+            if isinstance(value, Fraction):
+                return _to_decimal(value)
+            return value if isinstance(value, Decimal) else Decimal(repr(value))
+        if isinstance(value, float):
+            # Via the shortest repr, so 0.1 becomes 1/10 rather than its binary value
+            return Fraction(repr(value))
+        return Fraction(value)
+
+    def evaluate_compiled(self, evaluate, variables=None):
+        """
+        Call a closure from compile() inside this Precision's decimal context
+
+        Args:
+            evaluate: Closure returned by compile()
+            variables: Optional mapping of variable names to numbers of any type
+        """
+        with decimal.localcontext(self.context):
+            env = {name: self.convert(value) for name, value in variables.items()} if variables else {}
+            return evaluate(env)
+
+    def evaluate(self, expression, variables=None):
+        """
+        Evaluate a display expression
+
+        Args:
+            expression: Expression string as shown on the calculator display
+            variables: Optional mapping of variable names to numbers
+
+        Returns:
+            Decimal or Fraction result
+        """
+        key = normalize_expression(expression)
+        evaluate = self._compiled.get(key)
+        if evaluate is None:
+            tree = parse(key)
+            check_size(tree)
+            evaluate = self.compile(tree)
+            self._compiled.put(key, evaluate)
+        return self.evaluate_compiled(evaluate, variables)
+
+    def format(self, value, formatter=DEFAULT_FORMATTER):
+        """
+        Format a result for the display
+
+        Whole-number Fractions are shown exactly; everything else is rounded
+        to this Precision's number of significant digits first.
+
+        Args:
+            value: Decimal, Fraction or int result
+            formatter: formatting.ResultFormatter to lay out the digits
+
+        Returns:
+            Display text
+        """
+        if isinstance(value, Fraction) and value.denominator == 1:
+            value = value.numerator
+        if not isinstance(value, int):
+            with decimal.localcontext(self.display_context):
+                value = _to_decimal(value)
+        return formatter.format(value)
+
+    def __repr__(self):
+        return f"Precision({self.mode!r}, {self.digits})"
+
+
+@lru_cache(maxsize=16)
+def get_precision(mode, digits=DEFAULT_DIGITS):
+    """
+    Return the shared Precision for a mode and digit count
+
+    Args:
+        mode: DECIMAL or FRACTION
+        digits: Significant digits
+
+    Returns:
+        Precision instance (None for FLOAT, which uses the default path)
+    """
+    if mode == FLOAT:
+        return None
+    return Precision(mode, digits)
@@ -0,0 +1,274 @@
+"""
+Variables for ORCA
+Named values and formulas between them, recomputed incrementally like a spreadsheet
+"""
+
+from collections import defaultdict
+
+from .cache import normalize_expression
+from .compiler import free_variables
+from .parser import parse
+
+
+class CycleError(ValueError):
+    """Raised when a formula would make a variable depend on itself"""
+
+
+class VariableGraph:
+    """Variables defined by plain values or by formulas over other variables
+
+    Each formula's free names are its dependencies. When a variable
+    changes, only the variables downstream of it are recomputed, in
+    dependency order, and a variable whose new value equals its old one
+    does not propagate further. Formulas may reference names that are not
+    defined yet; they report an error until those names get values.
+    """
+
+    def __init__(self, evaluate):
+        """
+        Constructor
+
+        Args:
+            evaluate: Callable evaluate(formula, values) returning a number,
+                raising on errors (see CalculatorEngine.evaluate_value)
+        """
+        self.evaluate = evaluate
+        self.values = {}  # Name -> current value; mutated in place, never rebound
+        self.formulas = {}  # Name -> normalized formula, for variables defined by one
+        self.errors = {}  # Name -> exception raised by its formula
+        self.last_recomputed = []  # Formulas evaluated by the latest change, in order
+        self._depends = {}  # Name -> frozenset of names its formula uses
+        self._dependents = defaultdict(set)  # Name -> names whose formulas use it
+
+    def __contains__(self, name):
+        return name in self.values or name in self.formulas
+
+    def set_value(self, name, value):
+        """
+        Give a variable a plain value, replacing any formula it had
+
+        Args:
+            name: Variable name
+            value: Number
+
+        Returns:
+            List of dependent variables that were recomputed
+        """
+        return self.set_values({name: value})
+
+    def set_values(self, values, propagate=True):
+        """
+        Give several variables plain values, propagating the changes once
+
+        Args:
+            values: Mapping of variable names to numbers
+            propagate: False to leave their dependents to propagation(changed=...)
+
+        Returns:
+            List of dependent variables that were recomputed
+        """
+        changed = set()
+        for name, value in values.items():
+            self._set_dependencies(name, frozenset())
+            self.formulas.pop(name, None)
+            self.errors.pop(name, None)
+            if self.values.get(name, _MISSING) != value or name not in self.values:
+                changed.add(name)
+            self.values[name] = value
+        if not propagate:
+            return []
+        return self._propagate(changed)
+
+    def define(self, name, formula, propagate=True):
+        """
+        Define a variable by a formula over other variables
+
+        Args:
+            name: Variable name
+            formula: Expression, e.g. "area * 0.3"
+            propagate: False to only record the formula; the caller then
+                evaluates it through propagation(recompute={name})
+
+        Returns:
+            List of variables that were recomputed, starting with name
+
+        Raises:
+            ExpressionError: If the formula cannot be parsed
+            CycleError: If the formula depends on name, directly or indirectly
+        """
+        source = normalize_expression(formula)
+        depends = free_variables(parse(source))
+        # Only a variable that others depend on can close a cycle
+        if name in depends or (self._dependents.get(name) and name in self._upstream(depends)):
+            raise CycleError(f"'{name}' would depend on itself")
+        self._set_dependencies(name, depends)
+        self.formulas[name] = source
+        if not propagate:
+            return []
+        return self._propagate({name}, recompute={name})
+
+    def remove(self, name, propagate=True):
+        """
+        Delete a variable; formulas using it report an error until it is defined again
+
+        Args:
+            name: Variable name
+            propagate: False to leave its dependents to propagation(changed={name})
+
+        Returns:
+            List of dependent variables that were recomputed
+        """
+        if name not in self:
+            return []
+        self._set_dependencies(name, frozenset())
+        self.formulas.pop(name, None)
+        self.errors.pop(name, None)
+        self.values.pop(name, None)
+        if not propagate:
+            return []
+        return self._propagate({name})
+
+    def recompute_all(self):
+        """Re-evaluate every formula (e.g. after switching number systems)"""
+        return self._propagate(set(self.formulas), recompute=set(self.formulas))
+
+    def dependents(self, name):
+        """Names whose formulas use name directly"""
+        return frozenset(self._dependents.get(name, ()))
+
+    def _set_dependencies(self, name, depends):
+        """Replace the dependency edges of name"""
+        for old in self._depends.get(name, ()):
+            self._dependents[old].discard(name)
+        if depends:
+            self._depends[name] = depends
+            for new in depends:
+                self._dependents[new].add(name)
+        else:
+            self._depends.pop(name, None)
+
+    def _upstream(self, names):
+        """Every name the given names depend on, directly or indirectly"""
+        seen = set()
+        stack = list(names)
+        while stack:
+            current = stack.pop()
+            for depend in self._depends.get(current, ()):
+                if depend not in seen:
+                    seen.add(depend)
+                    stack.append(depend)
+        return seen
+
+    def _downstream_order(self, roots):
+        """Roots and everything depending on them, each after its dependencies"""
+        order = []
+        visited = set()
+        for root in roots:
+            if root in visited:
+                continue
+            # Iterative depth-first search emitting names in post-order
+            visited.add(root)
+            stack = [(root, iter(self._dependents.get(root, ())))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child not in visited:
+                        visited.add(child)
+                        stack.append((child, iter(self._dependents.get(child, ()))))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node)
+        order.reverse()
+        return order
+
+    def propagation(self, changed=(), recompute=()):
+        """
+        Plan the recomputation downstream of some names, to run step by step
+
+        Args:
+            changed: Names whose values changed
+            recompute: Names to evaluate even if none of their inputs changed
+
+        Returns:
+            Propagation; the graph must not be edited while it is running
+        """
+        return Propagation(self, changed, recompute)
+
+    def _propagate(self, changed, recompute=()):
+        """Recompute formulas downstream of changed names right away"""
+        recomputed = self.propagation(changed, recompute).run()
+        self.last_recomputed = recomputed
+        return recomputed
+
+
+class Propagation:
+    """Recomputation of the formulas downstream of some changed variables
+
+    Formulas are evaluated in dependency order, one per step(), so a caller
+    can spread a long recomputation over several event-loop passes. If the
+    graph is edited before it finishes, start a new propagation that
+    recomputes remaining() as well.
+    """
+
+    def __init__(self, graph, changed, recompute):
+        """
+        Constructor
+
+        Args:
+            graph: VariableGraph
+            changed: Names whose values changed
+            recompute: Names to evaluate even if none of their inputs changed
+        """
+        self.graph = graph
+        self.changed = set(changed)
+        self.recompute = set(recompute)
+        self.order = graph._downstream_order(self.changed | self.recompute)
+        self.position = 0
+        self.recomputed = []
+
+    def done(self):
+        """True once every affected formula has been handled"""
+        return self.position >= len(self.order)
+
+    def remaining(self):
+        """Names not handled yet"""
+        return self.order[self.position:]
+
+    def step(self):
+        """
+        Handle the next name in dependency order
+
+        Returns:
+            The name if its formula was evaluated, else None
+        """
+        graph = self.graph
+        name = self.order[self.position]
+        self.position += 1
+        formula = graph.formulas.get(name)
+        if formula is None:
+            return None
+        if name not in self.recompute and self.changed.isdisjoint(graph._depends.get(name, ())):
+            # None of its inputs actually changed value
+            return None
+        self.recomputed.append(name)
+        old = graph.values.get(name, _MISSING)
+        try:
+            graph.values[name] = graph.evaluate(formula, graph.values)
+            graph.errors.pop(name, None)
+        except Exception as error:
+            graph.values.pop(name, None)
+            graph.errors[name] = error
+        if graph.values.get(name, _MISSING) != old or name in graph.errors:
+            self.changed.add(name)
+        return name
+
+    def run(self):
+        """Handle every remaining name; returns the names whose formulas were evaluated"""
+        while not self.done():
+            self.step()
+        return self.recomputed
+
+
+# Marker for "no value", distinct from any number
+_MISSING = object()
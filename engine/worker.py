@@ -0,0 +1,181 @@
+"""
+Evaluation Worker Process for ORCA
+Child processes that evaluate expressions off the GUI thread
+"""
+
+import os
+import shutil
+import sys
+import types
+from multiprocessing import spawn
+from multiprocessing.context import SpawnContext, SpawnProcess
+
+if sys.platform == "win32":
+    from multiprocessing.popen_spawn_win32 import Popen as _SpawnPopen
+else:
+    from multiprocessing.popen_spawn_posix import Popen as _SpawnPopen
+
+from .evaluation import evaluate_to_result
+
+
+def serve(conn):
+    """
+    Evaluate (job_id, expression, *options) requests from a pipe until told to stop
+
+    Each request is answered with (job_id, text, value), as returned by
+    evaluate_to_result.
+
+    Args:
+        conn: multiprocessing Connection; receiving None ends the loop
+    """
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        if request is None:
+            return
+        # Options are passed on to evaluate_to_result (precision mode and digits)
+        job_id, expression, *options = request
+        conn.send((job_id, *evaluate_to_result(expression, *options)))
+
+
+def find_python_executable():
+    """
+    Locate a Python interpreter for worker processes
+
+    Inside QGIS sys.executable is usually the QGIS binary itself, which
+    cannot act as a multiprocessing child, so look next to the running
+    Python installation instead.
+
+    Returns:
+        Path to a Python interpreter, or None if none was found
+    """
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    names = ["pythonw.exe", "python.exe", "python3.exe"] if os.name == "nt" else ["python3", "python"]
+    for directory in (sys.exec_prefix, os.path.join(sys.exec_prefix, "bin")):
+        for name in names:
+            candidate = os.path.join(directory, name)
+            if os.path.isfile(candidate):
+                return candidate
+    for name in names:
+        candidate = shutil.which(name)
+        if candidate:
+            return candidate
+    return None
+
+
+class _SpawnModule:
+    """The spawn module as one worker start sees it, with its own interpreter"""
+
+    def __init__(self, executable):
+        # In the form spawn.set_executable() stores it (bytes on POSIX since Python 3.11)
+        if isinstance(spawn.get_executable(), bytes):
+            self._executable = os.fsencode(executable)
+        else:
+            self._executable = os.fsdecode(executable)
+
+    def __getattr__(self, name):
+        return getattr(spawn, name)
+
+    def get_executable(self):
+        return self._executable
+
+    def get_command_line(self, **kwds):
+        command = spawn.get_command_line(**kwds)
+        if not getattr(sys, "frozen", False):
+            # The command starts with the module-wide interpreter
+            command[0] = self._executable
+        return command
+
+
+def _with_executable(function, executable):
+    """Copy of a multiprocessing function that reads the interpreter from _SpawnModule"""
+    namespace = dict(function.__globals__, spawn=_SpawnModule(executable))
+    return types.FunctionType(function.__code__, namespace, function.__name__,
+                              function.__defaults__, function.__closure__)
+
+
+def _start_resource_tracker(executable):
+    """
+    Start multiprocessing's resource tracker with the worker interpreter
+
+    On POSIX the tracker is one more helper process, started on first use
+    of a pipe, lock or process; started here it does not depend on the
+    module-wide interpreter either. A tracker that is already running is
+    left alone.
+    """
+    if sys.platform == "win32":
+        return
+    from multiprocessing import resource_tracker
+    tracker = resource_tracker._resource_tracker
+    _with_executable(type(tracker).ensure_running, executable)(tracker)
+
+
+class _WorkerPopen(_SpawnPopen):
+    """
+    The standard "spawn" Popen, launching the interpreter of its process
+
+    The standard code looks the interpreter up through the spawn module;
+    it runs here unchanged against a _SpawnModule instead, so the
+    module-wide setting (multiprocessing.set_executable) is never
+    written, not even for a moment.
+    """
+
+    if sys.platform == "win32":
+        def __init__(self, process_obj):
+            _with_executable(_SpawnPopen.__init__, process_obj.executable)(self, process_obj)
+    else:
+        def _launch(self, process_obj):
+            _with_executable(_SpawnPopen._launch, process_obj.executable)(self, process_obj)
+
+
+class WorkerProcess(SpawnProcess):
+    """Spawned process started with its own interpreter rather than the module-wide one"""
+
+    executable = None  # Interpreter path, set by WorkerContext.Process()
+
+    @staticmethod
+    def _Popen(process_obj):
+        return _WorkerPopen(process_obj)
+
+
+class WorkerContext(SpawnContext):
+    """
+    "spawn" multiprocessing context whose processes run a given interpreter
+
+    Unlike SpawnContext.set_executable(), this leaves the interpreter used
+    by other multiprocessing users in the same process (QGIS, other
+    plugins) unchanged.
+    """
+
+    def __init__(self, executable):
+        """
+        Constructor
+
+        Args:
+            executable: Path to the Python interpreter for child processes
+        """
+        super().__init__()
+        self.executable = executable
+
+    def Process(self, *args, **kwargs):  # noqa: N802 (multiprocessing API)
+        """Create a WorkerProcess, taking the same arguments as multiprocessing.Process"""
+        process = WorkerProcess(*args, **kwargs)
+        process.executable = self.executable
+        return process
+
+
+def spawn_context():
+    """
+    Return a "spawn" multiprocessing context that starts a real Python interpreter
+
+    Returns:
+        WorkerContext, or None if no interpreter was found
+    """
+    executable = find_python_executable()
+    if executable is None:
+        return None
+    _start_resource_tracker(executable)
+    return WorkerContext(executable)
@@ -0,0 +1,399 @@
+"""
+Worksheet for ORCA
+Multi-line calculations where lines refer to earlier lines, recomputed line by line
+"""
+
+import decimal
+import itertools
+import re
+import time
+
+from .cache import LRUCache
+from .calculator import ASSIGNMENT_RE, check_variable_name
+from .compiler import CONSTANTS, compile_expression
+from .evaluation import ERROR_TEXT, OVERFLOW_TEXT, TIMEOUT_TEXT, may_be_expensive
+from .incremental import PENDING_TEXT
+from .parser import FUNCTION_NAMES, NAME, tokenize
+from .variables import VariableGraph
+
+# Lines are referred to as line1, line2, ... (numbered from 1 like the editor)
+LINE_NAME_RE = re.compile(r"line[0-9]+")
+
+
+def line_variable(index):
+    """Variable holding the result of a line (index counts from 0)"""
+    return f"line{index + 1}"
+
+
+class Deferred(Exception):
+    """A line left to a worker process, or waiting for such a line"""
+
+    def __init__(self, formula=None, values=None):
+        """
+        Constructor
+
+        Args:
+            formula: Normalized formula to evaluate elsewhere (None while
+                waiting for another deferred line)
+            values: The variables the formula uses
+        """
+        super().__init__(formula)
+        self.formula = formula
+        self.values = values
+
+
+class Worksheet:
+    """A list of expression lines evaluated as one dependency graph
+
+    Every line is a formula, and line3 refers to the result of the third
+    line. "name = expression" also names the result of its line: a name
+    refers to the nearest line above that assigns it, so in "a = 1",
+    "a * 2", "a = 5" the second line is 2 whatever follows. Names are
+    rewritten to those line variables when a line is set, so the graph
+    holds one formula per line. Names no line above assigns are the
+    engine's variables (ans, M, clip, ...). Blank lines and lines starting
+    with "#" are notes without a result.
+
+    Editing marks lines dirty without evaluating anything; run() then
+    re-evaluates the dirty lines and the lines depending on them, in
+    dependency order, until a time budget is spent, so a view can call it
+    once per event-loop pass and render results as they arrive. With
+    background=True, lines that need arbitrary-precision work (the EXACT
+    route of the cost estimate, as for "=") are not evaluated in run():
+    next_job() hands them out for a worker process and finish() stores
+    their results.
+
+        sheet = Worksheet(engine)
+        sheet.set_text("area = 1234.5\\nrate = area * 0.5\\nline2 * 12")
+        sheet.run()             # sheet.results == ["1234.5", "617.25", "7407.0"]
+    """
+
+    def __init__(self, engine, background=False):
+        """
+        Constructor
+
+        Args:
+            engine: CalculatorEngine providing the number system, formatter and variables
+            background: True to leave expensive lines to next_job() instead of run()
+        """
+        self.engine = engine
+        self.background = background
+        self.graph = VariableGraph(self._evaluate)
+        self.lines = []  # Text of each line
+        self.results = []  # Result text of each line ("" for notes)
+        self._formulas = {}  # Line index -> formula as typed, without "name ="
+        self._assigned = {}  # Line index -> name assigned on that line
+        self._references = {}  # Line index -> names (other than lineN) its formula uses
+        self._changed = set()  # Names whose values changed since the last run
+        self._recompute = set()  # Formulas to evaluate in the next run
+        self._propagation = None  # Run in progress
+        self._engine_values = {}  # Engine variables copied into the graph
+        self._expensive = LRUCache(maxsize=1024)  # Formula -> may_be_expensive()
+        self._jobs = []  # (token, formula, values) of deferred lines, oldest first
+        self._waiting = {}  # Line variable -> token of the job it waits for
+        self._tokens = itertools.count(1)
+
+    def set_text(self, text):
+        """
+        Replace the worksheet text, marking only the lines that differ as dirty
+
+        Inserting or deleting a line renumbers the lines after it, which
+        makes them dirty too.
+
+        Args:
+            text: Worksheet text, one expression per line
+
+        Returns:
+            Indices of the lines that were changed (their results are now
+            PENDING_TEXT, ERROR_TEXT or "")
+        """
+        lines = text.split("\n")
+        old_count = len(self.lines)
+        for index in range(len(lines), old_count):
+            self._clear_line(index)
+        del self.lines[len(lines):]
+        del self.results[len(lines):]
+        changed = []
+        for index, line in enumerate(lines):
+            if index >= old_count:
+                self.lines.append(None)
+                self.results.append("")
+            if self.lines[index] != line:
+                self.set_line(index, line)
+                changed.append(index)
+        return changed
+
+    def set_line(self, index, text):
+        """
+        Change one line and mark it dirty
+
+        Lines below that use a name the line assigned before or assigns
+        now are re-resolved, as that name may refer to another line.
+
+        Args:
+            index: Line index, counting from 0
+            text: New text of the line
+        """
+        self.lines[index] = text
+        old_name = self._clear_line(index)
+        text = text.strip()
+        name = None
+        if not text or text.startswith("#"):
+            self.results[index] = ""
+        else:
+            assignment = ASSIGNMENT_RE.fullmatch(text)
+            if assignment:
+                name, text = assignment.groups()
+            try:
+                if name is not None:
+                    check_variable_name(name)
+                    if LINE_NAME_RE.fullmatch(name):
+                        raise ValueError(f"'{name}' is reserved for line results")
+            except ValueError:
+                self.results[index] = ERROR_TEXT
+                name = None
+            else:
+                if name is not None:
+                    self._assigned[index] = name
+                self._formulas[index] = text
+                self._define(index)
+        if name != old_name:
+            self._resolve_below(index, {old_name, name} - {None})
+
+    def recompute_all(self):
+        """Mark every line dirty (e.g. after the number system or formatter changed)"""
+        for name in self.graph.formulas:
+            self._dirty(recompute=name)
+
+    def pending(self):
+        """True while some lines still need evaluating"""
+        return bool(self._changed or self._recompute) or (
+            self._propagation is not None and not self._propagation.done())
+
+    def run(self, budget=None):
+        """
+        Evaluate dirty lines and the lines depending on them
+
+        Args:
+            budget: Seconds to spend before returning, None to finish
+
+        Returns:
+            Indices of lines whose results were updated, in evaluation order
+        """
+        self._copy_engine_values()
+        if self._propagation is None or self._propagation.done():
+            if not (self._changed or self._recompute):
+                return []
+            self._propagation = self.graph.propagation(self._changed, self._recompute)
+            self._changed = set()
+            self._recompute = set()
+        propagation = self._propagation
+        deadline = None if budget is None else time.perf_counter() + budget
+        updated = []
+        while not propagation.done():
+            name = propagation.step()
+            if name is not None and LINE_NAME_RE.fullmatch(name):
+                self._waiting.pop(name, None)
+                error = self.graph.errors.get(name)
+                if isinstance(error, Deferred) and error.formula is not None:
+                    token = next(self._tokens)
+                    self._waiting[name] = token
+                    self._jobs.append((token, error.formula, error.values))
+                index = int(name[4:]) - 1
+                self.results[index] = self._result_text(name)
+                updated.append(index)
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        return updated
+
+    def next_job(self):
+        """
+        Take the next line to evaluate in a worker process
+
+        Returns:
+            (token, formula, values), or None if no line is waiting; the
+            formula is evaluated with values in the engine's number system
+            and the result passed to finish(token, ...)
+        """
+        while self._jobs:
+            job = self._jobs.pop(0)
+            if self.is_waiting(job[0]):
+                return job
+        return None
+
+    def is_waiting(self, token):
+        """False once a job's line has been edited or re-evaluated, so its result is stale"""
+        return token in self._waiting.values()
+
+    def finish(self, token, result, value):
+        """
+        Store the result of a line evaluated by a worker process
+
+        Args:
+            token: Token from next_job()
+            result: Formatted result or one of the failure texts
+            value: Unrounded value, None for failures
+
+        Returns:
+            Index of the updated line, or None if the job was stale; lines
+            using it are evaluated by the next run()
+        """
+        name = next((name for name, waiting in self._waiting.items() if waiting == token), None)
+        if name is None:
+            return None
+        del self._waiting[name]
+        graph = self.graph
+        if value is None:
+            graph.values.pop(name, None)
+            failure = {OVERFLOW_TEXT: OverflowError, TIMEOUT_TEXT: TimeoutError}.get(result, ValueError)
+            graph.errors[name] = failure(result)
+        else:
+            graph.values[name] = self.engine.to_number(value)
+            graph.errors.pop(name, None)
+        self._dirty(changed=name)
+        index = int(name[4:]) - 1
+        self.results[index] = self._result_text(name)
+        return index
+
+    def text(self):
+        """The worksheet text"""
+        return "\n".join(self.lines)
+
+    def _evaluate(self, formula, values):
+        """Evaluate a formula for the graph, deferring expensive ones with background=True"""
+        if self.background:
+            names = compile_expression(formula).variables
+            if any(isinstance(self.graph.errors.get(name), Deferred) for name in names):
+                raise Deferred()
+            expensive = self._expensive.get(formula)
+            if expensive is None:
+                expensive = may_be_expensive(formula)
+                self._expensive.put(formula, expensive)
+            if expensive:
+                raise Deferred(formula, {name: values[name] for name in names if name in values})
+        return self.engine.evaluate_value(formula, values)
+
+    def _copy_engine_values(self):
+        """Copy new and changed engine variables into the graph, marking them changed"""
+        graph = self.graph
+        current = self.engine.variables
+        for name in [name for name in self._engine_values if name not in current]:
+            del self._engine_values[name]
+            graph.remove(name, propagate=False)
+            self._dirty(changed=name)
+        changed = {
+            name: value for name, value in current.items()
+            if self._engine_values.get(name) is not value and not LINE_NAME_RE.fullmatch(name)
+        }
+        if changed:
+            self._engine_values.update(changed)
+            graph.set_values(changed, propagate=False)
+            for name in changed:
+                self._dirty(changed=name)
+
+    def _result_text(self, name):
+        """Formatted value of a line variable, or a failure text"""
+        graph = self.graph
+        error = graph.errors.get(name)
+        if error is None and name in graph.values:
+            return self.engine.format_value(graph.values[name])
+        if isinstance(error, Deferred):
+            return PENDING_TEXT
+        if isinstance(error, TimeoutError):
+            return TIMEOUT_TEXT
+        if isinstance(error, (OverflowError, decimal.Overflow)):
+            return OVERFLOW_TEXT
+        return ERROR_TEXT
+
+    def _define(self, index):
+        """Define a line's variable by its formula, with names resolved to lines above"""
+        graph = self.graph
+        name = line_variable(index)
+        try:
+            formula, references = self._resolve(index, self._formulas[index])
+            self._references[index] = references
+            graph.define(name, formula, propagate=False)
+        except (ValueError, RecursionError):
+            # Invalid expression, or a circular reference
+            if name in graph:
+                graph.remove(name, propagate=False)
+                self._dirty(changed=name)
+                self._recompute.discard(name)
+            self.results[index] = ERROR_TEXT
+            return
+        self.results[index] = PENDING_TEXT
+        self._dirty(recompute=name)
+
+    def _resolve(self, index, formula):
+        """
+        Rewrite the assigned names in a formula to the lines assigning them
+
+        Args:
+            index: Index of the line the formula is on
+            formula: Formula as typed
+
+        Returns:
+            (formula, names): the formula with each name replaced by the
+            variable of the nearest line above assigning it (names no line
+            above assigns are kept), and the set of names it uses
+
+        Raises:
+            ExpressionError: If the formula cannot be tokenized
+        """
+        names = set()
+        parts = []
+        end = 0
+        for token in tokenize(formula):
+            text = token.text
+            if token.kind != NAME or text in FUNCTION_NAMES or text in CONSTANTS \
+                    or LINE_NAME_RE.fullmatch(text):
+                continue
+            names.add(text)
+            line = self._assignment_above(text, index)
+            if line is not None:
+                parts.append(formula[end:token.pos])
+                parts.append(line_variable(line))
+                end = token.pos + len(text)
+        parts.append(formula[end:])
+        return "".join(parts), frozenset(names)
+
+    def _resolve_below(self, index, names):
+        """Redefine the lines below index that use any of names"""
+        below = [line for line, references in self._references.items()
+                 if line > index and not references.isdisjoint(names)]
+        for line in sorted(below):
+            self._define(line)
+
+    def _assignment_above(self, name, index):
+        """Index of the nearest line above index assigning name, or None"""
+        return max((line for line, assigned in self._assigned.items()
+                    if assigned == name and line < index), default=None)
+
+    def _clear_line(self, index):
+        """
+        Remove the variable of a line; lines using it become dirty
+
+        Returns:
+            The name the line assigned, or None
+        """
+        graph = self.graph
+        self._formulas.pop(index, None)
+        self._references.pop(index, None)
+        name = line_variable(index)
+        self._waiting.pop(name, None)
+        if name in graph:
+            graph.remove(name, propagate=False)
+            self._dirty(changed=name)
+            self._recompute.discard(name)
+        return self._assigned.pop(index, None)
+
+    def _dirty(self, changed=None, recompute=None):
+        """Record roots for the next run, folding in any unfinished run"""
+        if self._propagation is not None:
+            # The graph changed under it: redo whatever it had not reached
+            self._recompute.update(self._propagation.remaining())
+            self._propagation = None
+        if changed is not None:
+            self._changed.add(changed)
+        if recompute is not None:
+            self._recompute.add(recompute)
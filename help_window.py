@@ -34,22 +34,22 @@ class HelpWindow(QDialog):
         title.setFont(title_font)
         layout.addWidget(title)
         
-        # Create tab widget for different sections
-        tabs = QTabWidget()
-        
-        # Simple Calculator Tab
-        tabs.addTab(self.create_simple_operations_widget(), "Simple Operations")
-        
-        # Advanced Calculator Tab
-        tabs.addTab(self.create_advanced_operations_widget(), "Advanced Operations")
-        
-        # Tips Tab
-        tabs.addTab(self.create_tips_widget(), "Tips & Tricks")
-        
-        # About Tab
-        tabs.addTab(self.create_about_widget(), "About")
+        # Create tab widget for different sections. Each tab starts as a
+        # placeholder and its content is built the first time it is shown.
+        self.tabs = QTabWidget()
+        self.tab_builders = [
+            ("Simple Operations", self.create_simple_operations_widget),
+            ("Advanced Operations", self.create_advanced_operations_widget),
+            ("Tips & Tricks", self.create_tips_widget),
+            ("About", self.create_about_widget),
+        ]
+        self.built_tabs = set()
+        for tab_title, builder in self.tab_builders:
+            self.tabs.addTab(self.create_placeholder_widget(), tab_title)
+        self.tabs.currentChanged.connect(self.ensure_tab_built)
+        self.ensure_tab_built(self.tabs.currentIndex())
         
-        layout.addWidget(tabs)
+        layout.addWidget(self.tabs)
         
         # Close button
         close_btn = QPushButton("Close")
@@ -59,6 +59,30 @@ class HelpWindow(QDialog):
         self.setLayout(layout)
         self.setMinimumSize(500, 400)  # Set minimum size to prevent too small windows
     
+    def create_placeholder_widget(self):
+        """Create an empty tab page that receives its content on first show"""
+        widget = QWidget()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        loading = QLabel("Loading...")
+        loading.setAlignment(Qt.AlignCenter)
+        layout.addWidget(loading)
+        widget.setLayout(layout)
+        return widget
+    
+    def ensure_tab_built(self, index):
+        """Build the content of a tab the first time it becomes current"""
+        if index < 0 or index in self.built_tabs:
+            return
+        self.built_tabs.add(index)
+        placeholder = self.tabs.widget(index)
+        layout = placeholder.layout()
+        # Replace the loading label with the real content
+        loading = layout.takeAt(0).widget()
+        loading.deleteLater()
+        tab_title, builder = self.tab_builders[index]
+        layout.addWidget(builder())
+    
     def create_about_widget(self):
         """Create about widget with plugin information"""
         widget = QWidget()
@@ -145,6 +169,12 @@ class HelpWindow(QDialog):
             ("Pi (π)", "Mathematical constant π ≈ 3.14159\nExample: 2 * π ≈ 6.28318"),
             ("Euler's Number (e)", "Mathematical constant e ≈ 2.71828\nExample: ln(e) = 1"),
             ("Parentheses ()", "Groups operations to control order of calculation.\nExample: (2 + 3) * 4 = 20 (not 14)"),
+            ("Distance (distance)", "Distance in metres between two points on the WGS84 ellipsoid (Vincenty). Coordinates in decimal degrees.\nExample: distance(52.52, 13.405, 48.8566, 2.3522) ≈ 879,700 (Berlin to Paris)\nUsage: distance(lat1, lon1, lat2, lon2); haversine(...) is the faster spherical estimate"),
+            ("Bearing (bearing)", "Initial direction from the first point to the second, in degrees clockwise from north.\nExample: bearing(0, 0, 1, 0) = 0\nUsage: bearing(lat1, lon1, lat2, lon2)"),
+            ("Polygon Area (geoarea)", "Area in square metres of the polygon through the given vertices on the WGS84 ellipsoid.\nExample: geoarea(0, 0, 0, 1, 1, 1, 1, 0) ≈ 12,308,776,257\nUsage: geoarea(lat1, lon1, lat2, lon2, lat3, lon3, ...)"),
+            ("Aggregates (sum, mean, std, min, max, median, percentile)", "Statistics over numbers and value lists. Paste List reads a column of numbers on the clipboard (the first column of a table, one value per cell; NULLs and other text are skipped) into the list 'clip', History as List makes 'hist' from the history results, and Send Selection to Calculator adds values_<field> for each numeric field.\nExample: mean(1, 2, 3) = 2, percentile(90, clip)\nUsage: mean(list_or_numbers, ...); std is the sample standard deviation; percentiles beyond 1024 values are estimated within 1%"),
+            ("Apply to Column", "Evaluates the expression once for every row on the clipboard and copies the results as a column, ready to paste back into a spreadsheet or attribute table. value is the first column; with a header row (e.g. width,height) the columns can be used by name.\nExample: copy a column of feet, type value * 0.3048, press Apply to Column\nUsage: rows of numbers, comma, semicolon or tab separated; empty or invalid rows give empty cells"),
+            ("Degrees/Minutes/Seconds (dms, deg)", "dms converts decimal degrees to the packed form D.MMSS; deg converts back, or from separate parts.\nExample: dms(12.5825) = 12.3457, deg(12.3457) = 12.5825, deg(12, 34, 57) = 12.5825\nUsage: dms(degrees), deg(D.MMSS) or deg(d, m, s)"),
         ]
         
         for op_name, op_desc in operations:
@@ -0,0 +1,130 @@
+"""
+History Model for QGIS Calculator Plugin
+Exposes the calculation history store to Qt item views
+"""
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+
+
+class HistoryModel(QAbstractListModel):
+    """List model over a HistoryStore of (expression, result) entries
+
+    Row 0 is the most recent calculation. Appending emits only a row insert
+    (plus a row removal when the oldest entry is evicted), so views update
+    in O(1) instead of rebuilding every item. A repeated calculation moves
+    its existing row to the top (a row move) and updates its count. Views
+    only request the rows they display, so a HistoryStore is read one page
+    at a time. Filtering uses the history's search() method.
+    """
+
+    def __init__(self, history, parent=None):
+        """
+        Constructor
+
+        Args:
+            history: HistoryStore of (expression, result) tuples
+            parent: Parent QObject
+        """
+        super().__init__(parent)
+        self.history = history
+        self.search_limit = 500
+        self._query = ""
+        self._matches = None  # Search results while a filter is active
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self._matches is not None:
+            return len(self._matches)
+        return len(self.history)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        expr, result = self.entry(index.row())
+        count = self.count(index.row())
+        if role == Qt.DisplayRole:
+            return f"{expr}\n= {result}" + (f"   ×{count}" if count > 1 else "")
+        return f"{expr} = {result}" + (f" (calculated {count} times)" if count > 1 else "")
+
+    def entry(self, row):
+        """Return the (expression, result) tuple shown at the given row"""
+        if self._matches is not None:
+            return self._matches[row]
+        return self.history[len(self.history) - 1 - row]
+
+    def count(self, row):
+        """How many times the calculation at the given row was made (1 in filtered views)"""
+        if self._matches is not None:
+            return 1
+        return self.history.entry(len(self.history) - 1 - row).count
+
+    def set_filter(self, query):
+        """
+        Show only entries containing query (an empty query shows everything)
+
+        Args:
+            query: Case-insensitive substring to search for
+        """
+        self.beginResetModel()
+        self._query = query.strip()
+        self._matches = self.history.search(self._query, self.search_limit) if self._query else None
+        self.endResetModel()
+
+    def append(self, expression, result):
+        """Add a calculation as the first row, evicting the oldest if full"""
+        if self.history.changed_elsewhere():
+            # Another QGIS instance wrote to the same database
+            self.beginResetModel()
+            self.history.reload()
+            self.endResetModel()
+        index = self.history.find((expression, result))
+        if index is not None:
+            # Already in the history: count the repeat and move its row to the top
+            row = len(self.history) - 1 - index
+            if self._matches is not None:
+                self.history.touch(index)
+                self.set_filter(self._query)
+            elif row == 0:
+                self.history.touch(index)
+                changed = self.index(0)
+                self.dataChanged.emit(changed, changed)
+            else:
+                self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), 0)
+                self.history.touch(index)
+                self.endMoveRows()
+                changed = self.index(0)
+                self.dataChanged.emit(changed, changed)
+            return
+        if self._matches is not None:
+            # Keep the filtered view in sync with the index
+            self.history.append((expression, result))
+            self.set_filter(self._query)
+            return
+        if self.history.is_full():
+            # The oldest entry is shown in the last row
+            last = len(self.history) - 1
+            self.beginRemoveRows(QModelIndex(), last, last)
+            self.history.popleft()
+            self.endRemoveRows()
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self.history.append((expression, result))
+        self.endInsertRows()
+
+    def clear(self):
+        """Remove all entries"""
+        self.beginResetModel()
+        self.history.clear()
+        if self._matches is not None:
+            self._matches = []
+        self.endResetModel()
+
+    def refresh(self):
+        """Tell attached views to re-read every row"""
+        if self._query:
+            self.set_filter(self._query)
+            return
+        self.beginResetModel()
+        self.endResetModel()
@@ -0,0 +1,140 @@
+"""
+Processing Provider for QGIS Calculator Plugin
+Registers the ORCA algorithm that computes a field from an expression over layer features
+"""
+
+from pathlib import Path
+
+from PyQt5.QtCore import QVariant
+from PyQt5.QtGui import QIcon
+from qgis.core import (
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterString,
+    QgsProcessingProvider,
+)
+
+from .resources import get_icon_path
+
+
+def _icon():
+    """Plugin icon, or an empty icon if the file is missing"""
+    icon_path = get_icon_path()
+    return QIcon(icon_path) if Path(icon_path).exists() else QIcon()
+
+
+class OrcaExpressionAlgorithm(QgsProcessingAlgorithm):
+    """Adds a field holding an ORCA expression evaluated over each feature's attributes"""
+
+    INPUT = "INPUT"
+    EXPRESSION = "EXPRESSION"
+    FIELD_NAME = "FIELD_NAME"
+    CHUNK_SIZE = "CHUNK_SIZE"
+    WORKERS = "WORKERS"
+    OUTPUT = "OUTPUT"
+
+    def name(self):
+        return "evaluateexpression"
+
+    def displayName(self):
+        return "Evaluate ORCA expression"
+
+    def shortHelpString(self):
+        return (
+            "Evaluates a calculator expression for every feature and stores the "
+            "result in a new numeric field. Field names are used as variables, "
+            "e.g. √(width^2+height^2) or area/1000000. Features are evaluated in "
+            "chunks of vectorized arithmetic, spread over worker processes for "
+            "large layers. Features with NULL inputs or invalid results (such as "
+            "division by zero) get NULL."
+        )
+
+    def icon(self):
+        return _icon()
+
+    def createInstance(self):
+        return OrcaExpressionAlgorithm()
+
+    def initAlgorithm(self, config=None):
+        # Imported lazily by processAlgorithm; only the default is needed here
+        from .engine.features import default_workers
+
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.INPUT, "Input layer", [QgsProcessing.TypeVector]))
+        self.addParameter(QgsProcessingParameterString(
+            self.EXPRESSION, "Expression (field names as variables)"))
+        self.addParameter(QgsProcessingParameterString(
+            self.FIELD_NAME, "Result field name", defaultValue="orca_result"))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.CHUNK_SIZE, "Features per chunk", QgsProcessingParameterNumber.Integer,
+            defaultValue=65536, minValue=1))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.WORKERS, "Worker processes (0 evaluates in QGIS)",
+            QgsProcessingParameterNumber.Integer, defaultValue=default_workers(), minValue=0))
+        self.addParameter(QgsProcessingParameterFeatureSink(self.OUTPUT, "Output layer"))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        # NumPy and the batch engine load only when the algorithm runs
+        from .engine.features import FeatureEvaluator
+        from .engine.parser import ExpressionError
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+        expression = self.parameterAsString(parameters, self.EXPRESSION, context)
+        field_name = self.parameterAsString(parameters, self.FIELD_NAME, context)
+        chunk_size = self.parameterAsInt(parameters, self.CHUNK_SIZE, context)
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+
+        total = source.featureCount()
+        if 0 <= total < 2 * chunk_size:
+            # Starting worker processes costs more than a chunk or two of arithmetic
+            workers = 0
+
+        try:
+            evaluator = FeatureEvaluator(expression, chunk_size, workers)
+            evaluator.check_fields(source.fields().names())
+        except ExpressionError as error:
+            raise QgsProcessingException(f"Invalid expression: {error}")
+
+        fields = QgsFields(source.fields())
+        fields.append(QgsField(field_name, QVariant.Double))
+        sink, dest_id = self.parameterAsSink(parameters, self.OUTPUT, context, fields,
+                                             source.wkbType(), source.sourceCrs())
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        step = 100.0 / total if total > 0 else 0
+        with evaluator:
+            results = evaluator.iter_results(source.getFeatures(), feedback.isCanceled)
+            for count, (feature, value) in enumerate(results, 1):
+                attributes = feature.attributes()
+                attributes.append(value)
+                feature.setAttributes(attributes)
+                sink.addFeature(feature, QgsFeatureSink.FastInsert)
+                if count % chunk_size == 0:
+                    feedback.setProgress(count * step)
+        return {self.OUTPUT: dest_id}
+
+
+class OrcaProcessingProvider(QgsProcessingProvider):
+    """Processing provider holding the ORCA algorithms"""
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(OrcaExpressionAlgorithm())
+
+    def id(self):
+        return "orca"
+
+    def name(self):
+        return "ORCA"
+
+    def icon(self):
+        return _icon()
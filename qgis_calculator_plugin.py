@@ -7,7 +7,6 @@ from PyQt5.QtWidgets import QAction, QDockWidget
 from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import Qt
 from pathlib import Path
-from .calculator_widget import CalculatorWidget
 from .resources import get_icon_path
 
 
@@ -24,11 +23,15 @@ class QgisCalculatorPlugin:
         self.iface = iface
         self.calculator_dock = None
         self.action = None
+        self.selection_action = None
+        self.selection_metrics = None  # Created on first use (needs QGIS)
+        self.provider = None
     
     def initGui(self):
         """
         Initialize the GUI
-        Called when the plugin is loaded
+        Called when the plugin is loaded; only registers the action and icon.
+        The calculator widget is imported and built on first toggle_calculator.
         """
         # Create the action
         icon_path = get_icon_path()
@@ -46,6 +49,29 @@ class QgisCalculatorPlugin:
         # Add action to Plugins menu
         self.iface.addPluginToMenu("&ORCA", self.action)
         self.iface.addToolBarIcon(self.action)
+        
+        # Action that loads the active layer's selection into calculator variables
+        self.selection_action = QAction("Send Selection to Calculator", self.iface.mainWindow())
+        self.selection_action.triggered.connect(self.send_selection_to_calculator)
+        self.iface.addPluginToMenu("&ORCA", self.selection_action)
+        
+        self.initProcessing()
+    
+    def initProcessing(self):
+        """
+        Register the ORCA Processing provider
+        Called by QGIS (also when running headless) and from initGui
+        """
+        if self.provider is not None:
+            return
+        try:
+            from qgis.core import QgsApplication
+            from .processing_provider import OrcaProcessingProvider
+        except ImportError:
+            # Not running inside QGIS: there is no Processing framework
+            return
+        self.provider = OrcaProcessingProvider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
     
     def unload(self):
         """
@@ -53,10 +79,21 @@ class QgisCalculatorPlugin:
         Called when the plugin is unloaded
         """
         if self.calculator_dock:
+            self.calculator_dock.widget().shutdown()
             self.iface.removeDockWidget(self.calculator_dock)
         
         self.iface.removePluginMenu("&ORCA", self.action)
+        self.iface.removePluginMenu("&ORCA", self.selection_action)
         self.iface.removeToolBarIcon(self.action)
+        
+        if self.provider is not None:
+            from qgis.core import QgsApplication
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
+        
+        if self.selection_metrics is not None:
+            self.selection_metrics.close()
+            self.selection_metrics = None
     
     def toggle_calculator(self):
         """
@@ -70,10 +107,37 @@ class QgisCalculatorPlugin:
             else:
                 self.calculator_dock.show()
     
+    def send_selection_to_calculator(self):
+        """
+        Measure the active layer's selected features into calculator variables
+        
+        Sets count, area, length and sum_<field> for each numeric field, and
+        opens the calculator if needed.
+        """
+        from qgis.core import Qgis, QgsVectorLayer
+        
+        layer = self.iface.activeLayer()
+        if not isinstance(layer, QgsVectorLayer):
+            self.iface.messageBar().pushMessage(
+                "ORCA", "Select features in a vector layer first", level=Qgis.Warning, duration=3)
+            return
+        if self.selection_metrics is None:
+            from .selection_metrics import SelectionMetrics
+            self.selection_metrics = SelectionMetrics()
+        variables = self.selection_metrics.measure(layer)
+        
+        if self.calculator_dock is None:
+            self.create_calculator_dock()
+        self.calculator_dock.show()
+        self.calculator_dock.widget().set_variables(variables)
+    
     def create_calculator_dock(self):
         """
         Create and add the calculator dock widget
         """
+        # Imported on first use so QGIS startup does not load the widget modules
+        from .calculator_widget import CalculatorWidget
+        
         # Create the dock widget
         self.calculator_dock = QDockWidget("On-the-flyReadyCalculatorAdd-on", self.iface.mainWindow())
         
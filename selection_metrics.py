@@ -0,0 +1,189 @@
+"""
+Selection Metrics for QGIS Calculator Plugin
+Measures the selected features of a vector layer for use as calculator variables
+"""
+
+import re
+
+from qgis.core import QgsDistanceArea, QgsFeatureRequest, QgsProject, QgsWkbTypes
+
+from .engine.aggregates import CHUNK_SIZE, ValueSummary
+from .engine.cache import LRUCache
+
+
+def variable_name(text):
+    """
+    Turn a field name into a calculator variable name
+
+    Args:
+        text: Field name, e.g. "Pop 2020"
+
+    Returns:
+        Identifier the expression parser accepts, e.g. "Pop_2020"
+    """
+    name = re.sub(r"\W", "_", text, flags=re.ASCII)
+    return name if name and not name[0].isdigit() else "_" + name
+
+
+class SelectionMetrics:
+    """Computes count, area, length and field sums of a layer's selection
+
+    Areas and lengths are measured with the project's ellipsoid, which is
+    the expensive part, so each feature's (area, length) is cached under
+    (layer id, feature id, edit revision). A layer's revision moves on when
+    its geometries are edited, committed or rolled back, or when its CRS or
+    the project ellipsoid changes, which retires every cached entry of the
+    layer without touching other layers. close() disconnects the layer
+    signals this watching needs.
+    """
+
+    def __init__(self, maxsize=200000):
+        """
+        Constructor
+
+        Args:
+            maxsize: Maximum number of cached feature measurements
+        """
+        self.cache = LRUCache(maxsize=maxsize)
+        self._revisions = {}  # Layer id -> edit revision
+        self._connections = {}  # Layer id -> [(signal, connection)] watching the layer
+        self._settings = {}  # Layer id -> (CRS, ellipsoid) the revision was measured with
+
+    def measure(self, layer):
+        """
+        Measure the selected features of a vector layer
+
+        Args:
+            layer: QgsVectorLayer
+
+        Returns:
+            dict of variables: count, area (square metres on the ellipsoid),
+            length (metres; perimeter for polygons), and sum_<field> and the
+            value list values_<field> (for mean(), percentile(), ...) of each
+            numeric field
+        """
+        distance_area = self._distance_area(layer)
+        revision = self.revision(layer)
+        layer_id = layer.id()
+        fids = layer.selectedFeatureIds()
+
+        measured = {}
+        missing = [fid for fid in fids if (layer_id, fid, revision) not in self.cache]
+        if missing:
+            geometry_type = layer.geometryType()
+            request = QgsFeatureRequest().setFilterFids(missing).setNoAttributes()
+            for feature in layer.getFeatures(request):
+                metrics = self._measure_geometry(distance_area, feature.geometry(), geometry_type)
+                measured[feature.id()] = metrics
+                self.cache.put((layer_id, feature.id(), revision), metrics)
+
+        total_area = total_length = 0.0
+        for fid in fids:
+            metrics = measured.get(fid) or self.cache.get((layer_id, fid, revision))
+            if metrics is not None:
+                total_area += metrics[0]
+                total_length += metrics[1]
+
+        variables = {"count": len(fids), "area": total_area, "length": total_length}
+        variables.update(self._field_statistics(layer, fids))
+        return variables
+
+    def revision(self, layer):
+        """Return the edit revision of a layer, watching it for edits on first use"""
+        layer_id = layer.id()
+        if layer_id not in self._revisions:
+            self._revisions[layer_id] = 0
+            slots = (
+                (layer.geometryChanged, lambda *args: self._bump(layer_id)),
+                (layer.committedGeometriesChanges, lambda *args: self._bump(layer_id)),
+                (layer.afterRollBack, lambda: self._bump(layer_id)),
+                (layer.willBeDeleted, lambda: self._forget(layer_id)),
+            )
+            self._connections[layer_id] = [(signal, signal.connect(slot)) for signal, slot in slots]
+        return self._revisions[layer_id]
+
+    def close(self):
+        """Stop watching layers and drop every cached measurement (on plugin unload)"""
+        for layer_id in list(self._connections):
+            self._disconnect(layer_id)
+        self._revisions.clear()
+        self._settings.clear()
+        self.cache.clear()
+
+    def _bump(self, layer_id):
+        """Move a layer to a new revision; its old cache entries are never hit again"""
+        if layer_id in self._revisions:
+            self._revisions[layer_id] += 1
+
+    def _forget(self, layer_id):
+        self._disconnect(layer_id)
+        self._revisions.pop(layer_id, None)
+        self._settings.pop(layer_id, None)
+
+    def _disconnect(self, layer_id):
+        """Disconnect the revision tracking of a layer"""
+        for signal, connection in self._connections.pop(layer_id, ()):
+            try:
+                signal.disconnect(connection)
+            except (RuntimeError, TypeError):
+                # The layer is already gone, and its connections with it
+                pass
+
+    def _distance_area(self, layer):
+        """QgsDistanceArea for the layer's CRS and the project ellipsoid"""
+        project = QgsProject.instance()
+        distance_area = QgsDistanceArea()
+        distance_area.setSourceCrs(layer.crs(), project.transformContext())
+        distance_area.setEllipsoid(project.ellipsoid())
+        settings = (layer.crs().authid(), project.ellipsoid())
+        if self._settings.get(layer.id()) != settings:
+            # Measurements made with another CRS or ellipsoid no longer apply
+            self.revision(layer)
+            self._bump(layer.id())
+            self._settings[layer.id()] = settings
+        return distance_area
+
+    def _measure_geometry(self, distance_area, geometry, geometry_type):
+        """Return (area, length) of one geometry; points and empty geometries measure 0"""
+        if geometry is None or geometry.isNull():
+            return (0.0, 0.0)
+        if geometry_type == QgsWkbTypes.PolygonGeometry:
+            return (distance_area.measureArea(geometry), distance_area.measurePerimeter(geometry))
+        if geometry_type == QgsWkbTypes.LineGeometry:
+            return (0.0, distance_area.measureLength(geometry))
+        return (0.0, 0.0)
+
+    def _field_statistics(self, layer, fids):
+        """Summarize each numeric field over the selected features (NULLs are skipped)"""
+        fields = layer.fields()
+        numeric = [(index, variable_name(field.name()))
+                   for index, field in enumerate(fields) if field.isNumeric()]
+        summaries = [ValueSummary() for _ in numeric]
+        if numeric and fids:
+            # Values go to the summaries a chunk at a time, so memory stays bounded
+            buffers = [[] for _ in numeric]
+            pending = 0
+            request = (QgsFeatureRequest().setFilterFids(fids)
+                       .setFlags(QgsFeatureRequest.NoGeometry)
+                       .setSubsetOfAttributes([index for index, _ in numeric]))
+            for feature in layer.getFeatures(request):
+                attributes = feature.attributes()
+                for buffer, (index, _) in zip(buffers, numeric):
+                    try:
+                        buffer.append(float(attributes[index]))
+                    except (TypeError, ValueError):
+                        # NULL or non-numeric value
+                        pass
+                pending += 1
+                if pending == CHUNK_SIZE:
+                    pending = 0
+                    for summary, buffer in zip(summaries, buffers):
+                        summary.update(buffer)
+                        buffer.clear()
+            for summary, buffer in zip(summaries, buffers):
+                summary.update(buffer)
+        variables = {}
+        for (_, name), summary in zip(numeric, summaries):
+            variables[f"sum_{name}"] = summary.sum
+            variables[f"values_{name}"] = summary
+        return variables
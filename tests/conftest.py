@@ -0,0 +1,57 @@
+"""
+Test configuration
+Makes the Qt-free engine package importable as "engine", as the benchmarks do,
+and provides stand-ins for QGIS feature sources
+
+Run from the plugin directory (no QGIS required):
+    python -m pytest tests
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Widget tests need no display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PLUGIN_DIR))
+
+
+class StandInFeature:
+    """Minimal QgsFeature stand-in: attribute access by field name"""
+
+    __slots__ = ("_attributes",)
+
+    def __init__(self, attributes):
+        self._attributes = attributes
+
+    def __getitem__(self, name):
+        return self._attributes[name]
+
+
+class StandInFeatureSource:
+    """Minimal QgsFeatureSource stand-in generating features on the fly"""
+
+    def __init__(self, fields, attributes, count):
+        """
+        Constructor
+
+        Args:
+            fields: Field names of the source
+            attributes: Callable returning the attribute dict of a feature id
+            count: Number of features
+        """
+        self._fields = list(fields)
+        self._attributes = attributes
+        self.count = count
+
+    def fields(self):
+        return self._fields
+
+    def featureCount(self):
+        return self.count
+
+    def getFeatures(self):
+        for fid in range(self.count):
+            yield StandInFeature(self._attributes(fid))
@@ -0,0 +1,26 @@
+"""
+Tests: aggregates
+Value lists read from pasted text
+"""
+
+import pytest
+
+from engine.aggregates import ValueSummary
+
+
+@pytest.mark.parametrize("text, count, total, skipped", [
+    ("1.5\n2\n3", 3, 6.5, 0),
+    ("1,234.5\n2,000\n3", 1, 3.0, 2),
+    ("area\n10\nNULL\n20", 2, 30.0, 1),
+    ("area\tfid\twkt\n10\t7\tPOINT(1 2)\n20\t8\tPOINT(3 4)", 2, 30.0, 0),
+    ("1;5\n2;6", 2, 3.0, 0),
+])
+def test_pasted_text_gives_one_value_per_cell(text, count, total, skipped):
+    summary = ValueSummary(text)
+    assert (summary.count, summary.sum, summary.skipped) == (count, total, skipped)
+
+
+def test_merge_counts_skipped_values():
+    summary = ValueSummary("1\nNULL")
+    summary.merge(ValueSummary("x\n2\n\n3"))
+    assert (summary.count, summary.skipped) == (3, 2)
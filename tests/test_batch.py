@@ -0,0 +1,76 @@
+"""
+Tests: batch evaluation
+Per-element error masks, chunked evaluation and agreement with the scalar engine
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from engine.batch import BatchExpression, evaluate_batch
+from engine.compiler import compile_expression
+from engine.parser import ExpressionError
+
+X = np.array([-2.5, -1.0, 0.0, 0.5, 1.0, 2.0, 3.0, 10.0, 171.0, 1e300])
+
+EXPRESSIONS = ["x^2+3x-1", "1/x", "√x", "ln(x)", "log(x)*2", "x!", "sin(x)^2+cos(x)^2",
+               "tan(x)/(x-1)", "50%*x", "(x+1)^0.5", "x^x"]
+
+
+def scalar(expression, x):
+    """The scalar engine's value for one row, NaN where it fails"""
+    try:
+        value = float(compile_expression(expression)({"x": x}))
+    except (ArithmeticError, ValueError):
+        return math.nan
+    return value if math.isfinite(value) else math.nan
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+@pytest.mark.parametrize("chunk_size", [3, 1000])
+def test_matches_the_scalar_engine(expression, chunk_size):
+    result = evaluate_batch(expression, {"x": X}, chunk_size)
+    expected = np.array([scalar(expression, x) for x in X.tolist()])
+    assert result.errors.tolist() == np.isnan(expected).tolist()
+    np.testing.assert_allclose(result.values, expected, rtol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize("expression, failed", [
+    ("1/x", [False, True, False]),
+    ("ln(x)", [True, True, False]),
+    ("√x", [True, False, False]),
+    ("x!", [True, False, False]),
+    ("(x/2)!", [True, False, True]),
+    ("(x*200)!", [True, False, True]),
+])
+def test_errors_are_masked_per_element(expression, failed):
+    result = evaluate_batch(expression, {"x": np.array([-1.0, 0.0, 1.0])})
+    assert result.errors.tolist() == failed
+    assert np.isnan(result.values[result.errors]).all()
+    assert np.isfinite(result.values[~result.errors]).all()
+
+
+def test_chunks_cover_every_row_with_scalars_broadcast():
+    x = np.arange(10.0)
+    result = evaluate_batch("x*k+1", {"x": x, "k": 2.0}, chunk_size=4)
+    assert result.values.tolist() == (x * 2 + 1).tolist()
+    assert not result.errors.any()
+    assert evaluate_batch("2+2", {}, chunk_size=4).values == 4.0
+
+
+def test_streamed_chunks_match_one_pass():
+    batch = BatchExpression("1/(x-3)")
+    x = np.arange(8.0)
+    chunks = [{"x": x[start:start + 3]} for start in range(0, 8, 3)]
+    streamed = list(batch.iter_chunks(chunks))
+    whole = batch.evaluate({"x": x})
+    assert np.concatenate([chunk.errors for chunk in streamed]).tolist() == whole.errors.tolist()
+    assert whole.errors.tolist() == [value == 3 for value in range(8)]
+
+
+def test_unknown_names_and_unequal_lengths_are_rejected():
+    with pytest.raises(ExpressionError):
+        evaluate_batch("x*y", {"x": np.ones(3)})
+    with pytest.raises(ValueError):
+        evaluate_batch("x*y", {"x": np.ones(3), "y": np.ones(4)})
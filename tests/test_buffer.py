@@ -0,0 +1,82 @@
+"""
+Tests: expression buffer
+Gap-buffer edits at the cursor, cursor moves and bulk paste
+"""
+
+from engine.buffer import ExpressionBuffer
+from engine.calculator import CalculatorEngine
+
+
+def test_insert_at_the_cursor():
+    buffer = ExpressionBuffer("2+3")
+    assert buffer.cursor == 3
+    buffer.insert("*4")
+    assert buffer.text() == "2+3*4"
+    buffer.move(-4)
+    buffer.insert("(")
+    assert (buffer.text(), buffer.cursor) == ("2(+3*4", 2)
+    buffer.insert("")
+    assert (buffer.text(), len(buffer)) == ("2(+3*4", 6)
+
+
+def test_backspace_and_delete_either_side_of_the_cursor():
+    buffer = ExpressionBuffer("sin(30)+1")
+    buffer.move_to(4)
+    buffer.delete(2)
+    assert (buffer.text(), buffer.cursor) == ("sin()+1", 4)
+    buffer.backspace()
+    assert (buffer.text(), buffer.cursor) == ("sin)+1", 3)
+    buffer.backspace(10)
+    assert (buffer.text(), buffer.cursor) == (")+1", 0)
+    buffer.backspace()
+    buffer.move_to(3)
+    buffer.delete()
+    assert buffer.text() == ")+1"
+
+
+def test_cursor_moves_are_clamped():
+    buffer = ExpressionBuffer("12345")
+    buffer.move(-2)
+    assert (buffer.cursor, buffer.char_before_cursor()) == (3, "3")
+    buffer.move(-10)
+    assert (buffer.cursor, buffer.char_before_cursor()) == (0, "")
+    buffer.move(10)
+    assert buffer.cursor == 5
+    buffer.move_to(-1)
+    assert buffer.cursor == 0
+    buffer.move_to(99)
+    assert buffer.cursor == 5
+    assert buffer.text() == "12345"
+
+
+def test_set_text_puts_the_cursor_at_the_end():
+    buffer = ExpressionBuffer("1+1")
+    buffer.move_to(1)
+    buffer.set_text("ln(2)")
+    assert (buffer.text(), buffer.cursor) == ("ln(2)", 5)
+
+
+def test_text_follows_every_edit():
+    buffer = ExpressionBuffer()
+    expected = ""
+    for index in range(50):
+        buffer.move_to(index // 2)
+        buffer.insert(str(index % 10))
+        expected = expected[:index // 2] + str(index % 10) + expected[index // 2:]
+        assert buffer.text() == expected
+    buffer.move_to(10)
+    buffer.delete(5)
+    buffer.backspace(5)
+    assert buffer.text() == expected[:5] + expected[15:]
+
+
+def test_bulk_paste_inserts_at_the_cursor():
+    engine = CalculatorEngine()
+    engine.paste("1+2")
+    engine.buffer.move_to(0)
+    column = "\r\n".join(["3"] * 10000)
+    engine.paste(column + "\r\n")
+    assert engine.buffer.text() == "3" * 10000 + "1+2"
+    assert engine.buffer.cursor == 10000
+    engine.paste(" \n ")
+    assert len(engine.buffer) == 10003
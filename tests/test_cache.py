@@ -0,0 +1,99 @@
+"""
+Tests: expression caches
+LRU eviction and counters, and compiled forms kept apart from formatted results
+"""
+
+from engine.cache import LRUCache, normalize_expression
+from engine.calculator import CalculatorEngine
+from engine.compiler import compile_cache, compile_expression
+from engine.precision import DECIMAL
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=3)
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"  # a is now the most recently used
+    cache.put("d", "D")
+    assert "b" not in cache
+    cache.put("c", "C2")  # Overwriting also marks as recently used
+    cache.put("e", "E")
+    assert [key for key in "abcde" if key in cache] == ["c", "d", "e"]
+    assert cache.get("c") == "C2"
+
+
+def test_size_stays_within_maxsize():
+    cache = LRUCache(maxsize=10)
+    for key in range(100):
+        cache.put(key, key)
+        assert len(cache) <= 10
+    assert [key for key in range(100) if key in cache] == list(range(90, 100))
+    cache.resize(4)
+    assert [key for key in range(100) if key in cache] == list(range(96, 100))
+    assert cache.stats()["evictions"] == 96
+
+
+def test_zero_maxsize_disables_caching():
+    cache = LRUCache(maxsize=0)
+    cache.put("a", 1)
+    assert len(cache) == 0
+    assert cache.get("a") is None
+
+
+def test_hit_and_miss_counters():
+    cache = LRUCache(maxsize=2)
+    assert cache.get("a", "default") == "default"
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    assert "a" in cache  # Membership tests are not lookups
+    assert cache.stats() == {"hits": 2, "misses": 2, "evictions": 0, "size": 1, "maxsize": 2}
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 2}
+
+
+def test_equivalent_spellings_share_a_key():
+    assert normalize_expression(" 2 + 3 ") == normalize_expression("2+3") == "2+3"
+    assert normalize_expression("sin  x") == "sin x"
+    assert normalize_expression("2 3") != normalize_expression("23")
+
+
+def test_compiled_forms_and_results_are_cached_apart():
+    compile_cache.clear()
+    engine = CalculatorEngine()
+    assert engine.calculate("7 * 6") == "42.0"
+    assert compile_cache.stats()["size"] == 1
+    compiled = compile_cache.get("7*6")
+    assert compiled is compile_expression("7*6")
+    # The result cache holds display text and value, never the compiled form
+    assert engine.result_cache.get("7*6") == ("42.0", 42)
+    # A second engine shares compiled forms but not formatted results
+    other = CalculatorEngine()
+    assert "7*6" not in other.result_cache
+    hits = compile_cache.stats()["hits"]
+    assert other.calculate("7*6") == "42.0"
+    assert compile_cache.stats()["hits"] > hits
+
+
+def test_result_cache_is_keyed_by_variable_values():
+    engine = CalculatorEngine()
+    engine.set_variables({"r": 2})
+    assert engine.calculate("r*10") == "20.0"
+    size = len(engine.result_cache)
+    engine.set_variables({"r": 3})
+    assert engine.calculate("r*10") == "30.0"
+    assert len(engine.result_cache) == size + 1
+    engine.set_variables({"r": 2})
+    hits = engine.result_cache.hits
+    assert engine.evaluate("r*10") == "20.0"
+    assert engine.result_cache.hits == hits + 1
+
+
+def test_precision_changes_clear_results_but_not_compiled_forms():
+    engine = CalculatorEngine()
+    engine.calculate("1/8")
+    compiled = compile_expression("1/8")
+    engine.set_precision(DECIMAL)
+    assert len(engine.result_cache) == 0
+    assert compile_cache.get("1/8") is compiled
@@ -0,0 +1,86 @@
+"""
+Tests: calculator engine
+ans and the memory register keep the value a result was formatted from
+"""
+
+from fractions import Fraction
+
+from engine.calculator import ANSWER_VARIABLE, MEMORY_VARIABLE, CalculatorEngine
+from engine.formatting import ResultFormatter
+from engine.precision import FRACTION
+
+
+def press_all(engine, *keys):
+    for key in keys:
+        engine.press(key)
+
+
+def test_ans_keeps_digits_the_display_rounds():
+    engine = CalculatorEngine()
+    engine.set_formatter(ResultFormatter(significant=4))
+    assert engine.calculate("2/3") == "0.6667"
+    assert engine.variables[ANSWER_VARIABLE] == 2 / 3
+    assert engine.calculate("ans*3") == "2.0"
+
+
+def test_fraction_ans_stays_exact():
+    engine = CalculatorEngine()
+    engine.set_precision(FRACTION)
+    engine.calculate("1/3")
+    assert engine.variables[ANSWER_VARIABLE] == Fraction(1, 3)
+    assert engine.calculate("ans*3") == "1.0"
+
+
+def test_assignment_sets_exact_ans():
+    engine = CalculatorEngine()
+    engine.set_formatter(ResultFormatter(significant=3))
+    engine.calculate("r = 1/7")
+    assert engine.variables[ANSWER_VARIABLE] == 1 / 7
+
+
+def test_memory_adds_the_unrounded_result():
+    engine = CalculatorEngine()
+    engine.set_formatter(ResultFormatter(significant=3))
+    engine.calculate("1/3")
+    press_all(engine, "M+", "M+", "M+")
+    assert engine.variables[MEMORY_VARIABLE] == 1 / 3 + 1 / 3 + 1 / 3
+
+
+def test_memory_evaluates_an_edited_expression():
+    engine = CalculatorEngine()
+    press_all(engine, "2", "*", "4", "M+")
+    assert engine.variables[MEMORY_VARIABLE] == 8
+
+
+def test_worker_results_carry_their_value():
+    engine = CalculatorEngine()
+    engine.finish("30!", "265252859812191058636308480000000.0", 265252859812191058636308480000000)
+    assert engine.calculate("ans/29!") == "30.0"
+
+
+def test_history_click_result_reads_the_text():
+    engine = CalculatorEngine()
+    engine.calculate("1/3")
+    engine.show_formatted("0.5")
+    engine.press("M+")
+    assert engine.variables[MEMORY_VARIABLE] == 0.5
+
+
+def test_failures_are_cached_but_timeouts_are_not():
+    engine = CalculatorEngine()
+    assert engine.calculate("1/0") == "Error"
+    assert not engine.needs_background("1/0")
+    assert "1/0" in engine.result_cache
+    engine.finish("10000000!", "Timeout")
+    assert "10000000!" not in engine.result_cache
+    engine.finish("10000000!", "Overflow")
+    assert "10000000!" in engine.result_cache
+
+
+def test_column_with_an_integer_ans_beyond_float_range():
+    engine = CalculatorEngine()
+    engine.calculate("2^2000")
+    assert isinstance(engine.variables[ANSWER_VARIABLE], int)
+    assert engine.evaluate_column("1\n2\n3", "value*2").text == "2.0\n4.0\n6.0"
+    engine.calculate("-(2^2000)")
+    assert engine.evaluate_column("1\n2", "value+ans").rows == 2
@@ -0,0 +1,73 @@
+"""
+Tests: column evaluation
+Pasted rows, header detection, the row variable and the result column
+"""
+
+import pytest
+
+from engine.columns import ROW_VARIABLE, ColumnResult, evaluate_column, parse_columns
+from engine.formatting import DEFAULT_FORMATTER, ResultFormatter
+from engine.parser import ExpressionError
+
+
+def column(expression, text):
+    return evaluate_column(expression, text, DEFAULT_FORMATTER)
+
+
+def test_row_variable_is_not_the_square_button():
+    assert ROW_VARIABLE == "value"
+    assert column("2value²", "3\n4").text == "18.0\n32.0"
+    # "x²" keeps its calculator meaning: the square of the number before it
+    assert column("value+2x²", "3\n4").text == "7.0\n8.0"
+
+
+def test_leading_null_is_a_failed_row_not_a_header():
+    header, columns = parse_columns("NULL\n1\n2")
+    assert header is None
+    assert column("value*2", "NULL\n1\n2") == ColumnResult("\n2.0\n4.0", 3, 1)
+
+
+def test_header_names_columns():
+    header, columns = parse_columns("width;height\n1,5;2\n3;4")
+    assert header == ["width", "height"]
+    assert columns["width"].tolist() == [1.5, 3.0]
+    assert column("width*height", "width;height\n1,5;2\n3;4").text == "width*height\n3.0\n12.0"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1 000\n2", ColumnResult("\n2.0", 2, 1)),
+    ("1,5\n2", ColumnResult("\n2.0", 2, 1)),
+    ("5\n1 000\n1,5", ColumnResult("5.0\n\n", 3, 2)),
+])
+def test_grouped_and_decimal_comma_numbers_are_errors(text, expected):
+    assert column("value", text) == expected
+
+
+def test_rows_with_missing_or_extra_cells_fail():
+    result = column("a+b", "a\tb\n1\t2\n3\t4\t5\n6\n7\t8")
+    assert result == ColumnResult("a+b\n3.0\n\n\n15.0", 4, 2)
+
+
+def test_consistent_whitespace_columns():
+    assert column("c1*c2", "1 2\n3 4").text == "2.0\n12.0"
+
+
+def test_domain_errors_and_blank_cells_are_failed_rows():
+    assert column("ln(value)", "1\n0\n-1") == ColumnResult("0.0\n\n", 3, 2)
+    assert column("value*2", "len\n1\n\n3\nNULL\n") == ColumnResult("value*2\n2.0\n\n6.0\n", 4, 2)
+
+
+def test_scalar_variables_and_constant_expressions():
+    assert evaluate_column("value*k", "1\n2", DEFAULT_FORMATTER, {"k": 3}).text == "3.0\n6.0"
+    assert column("2+2", "1\n2\n3").text == "4.0\n4.0\n4.0"
+
+
+def test_result_cells_are_not_grouped():
+    formatter = ResultFormatter(group_separator=",", decimal_point=".")
+    assert evaluate_column("value*1000", "1.5\n2", formatter).text == "1500.0\n2000.0"
+
+
+@pytest.mark.parametrize("expression, text", [("y*2", "1\n2"), ("value*", "1"), ("value", "")])
+def test_invalid_expressions_and_empty_pastes_raise(expression, text):
+    with pytest.raises(ExpressionError):
+        column(expression, text)
@@ -0,0 +1,102 @@
+"""
+Tests: feature evaluation
+FeatureEvaluator over a stand-in feature source, in chunks, with NULLs and failures, inline and pooled
+"""
+
+import math
+
+import pytest
+
+from conftest import StandInFeature, StandInFeatureSource
+from engine.compiler import compile_expression
+from engine.features import FeatureEvaluator
+from engine.parser import ExpressionError
+from engine.worker import spawn_context
+
+EXPRESSION = "√(width^2+height^2)*scale+ln(area)"
+
+FIELDS = ["fid", "width", "height", "scale", "area"]
+
+
+def attributes(fid):
+    return {
+        "fid": fid,
+        "width": fid % 10 * 0.5,
+        "height": fid % 7 * 0.25,
+        "scale": None if fid % 11 == 0 else 1.5,  # NULL
+        "area": float(fid % 13 - 3),  # ln of zero or less fails
+    }
+
+
+def expected(feature):
+    if feature["scale"] is None or feature["area"] <= 0:
+        return None
+    compiled = compile_expression(EXPRESSION)
+    return compiled({name: feature[name] for name in ("width", "height", "scale", "area")})
+
+
+def check(pairs, count):
+    assert [feature["fid"] for feature, _ in pairs] == list(range(count))
+    for feature, value in pairs:
+        reference = expected(feature)
+        if reference is None:
+            assert value is None, feature["fid"]
+        else:
+            assert math.isclose(value, reference), feature["fid"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1000])
+def test_chunks_keep_input_order(chunk_size):
+    source = StandInFeatureSource(FIELDS, attributes, 250)
+    with FeatureEvaluator(EXPRESSION, chunk_size) as evaluator:
+        check(list(evaluator.iter_results(source.getFeatures())), 250)
+
+
+def test_null_and_non_numeric_attributes_give_none():
+    features = [StandInFeature({"a": value}) for value in (2.0, None, "x", "3", math.nan)]
+    assert FeatureEvaluator("a*2").evaluate_chunk(features) == [4.0, None, None, 6.0, None]
+
+
+def test_per_feature_errors_give_none():
+    features = [StandInFeature({"a": value}) for value in (-1.0, 0.0, 0.5, 200.0)]
+    assert FeatureEvaluator("1/a").evaluate_chunk(features) == [-1.0, None, 2.0, 0.005]
+    assert FeatureEvaluator("√a").evaluate_chunk(features)[:2] == [None, 0.0]
+    assert FeatureEvaluator("a!").evaluate_chunk(features)[0::3] == [None, None]
+
+
+def test_expression_without_fields():
+    features = [StandInFeature({}) for _ in range(3)]
+    assert FeatureEvaluator("2^10").evaluate_chunk(features) == [1024.0] * 3
+    assert FeatureEvaluator("1/0").evaluate_chunk(features) == [None] * 3
+
+
+def test_unknown_fields():
+    evaluator = FeatureEvaluator(EXPRESSION)
+    evaluator.check_fields(FIELDS)
+    with pytest.raises(ExpressionError, match="Unknown field 'scale'"):
+        evaluator.check_fields(["width", "height", "area"])
+
+
+def test_cancelled_stops_reading():
+    source = StandInFeatureSource(FIELDS, attributes, 100)
+    calls = []
+
+    def cancelled():
+        calls.append(None)
+        return len(calls) > 3
+
+    with FeatureEvaluator(EXPRESSION, 10) as evaluator:
+        assert len(list(evaluator.iter_results(source.getFeatures(), cancelled))) == 30
+
+
+def test_pooled_results_match_in_process():
+    if spawn_context() is None:
+        pytest.skip("No Python interpreter for child processes")
+    source = StandInFeatureSource(FIELDS, attributes, 500)
+    with FeatureEvaluator(EXPRESSION, 32) as evaluator:
+        inline = list(evaluator.iter_results(source.getFeatures()))
+    with FeatureEvaluator(EXPRESSION, 32, workers=2) as evaluator:
+        pooled = list(evaluator.iter_results(source.getFeatures()))
+        assert evaluator.workers == 2
+    check(pooled, 500)
+    assert [value for _, value in pooled] == [value for _, value in inline]
@@ -0,0 +1,101 @@
+"""
+Tests: result formatting
+Output reads back as the same number or display text; notations and grouping
+"""
+
+import math
+import random
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from engine.compiler import compile_expression
+from engine.evaluation import evaluate_to_result, evaluate_to_text
+from engine.formatting import ENGINEERING, SCIENTIFIC, ResultFormatter
+from engine.precision import DECIMAL, FRACTION
+
+FORMATTERS = [
+    ResultFormatter(),
+    ResultFormatter(notation=SCIENTIFIC),
+    ResultFormatter(notation=ENGINEERING),
+    ResultFormatter(group_separator=",", decimal_point="."),
+    ResultFormatter(group_separator=".", decimal_point=","),
+]
+
+FLOATS = [1 / 3, 2 ** 0.5, 0.1 + 0.2, math.pi, 1e16, 1.5e-7, 5.0, -2.5e-300, 1e300,
+          123456789012345678.0, 5e-324, 1.7976931348623157e308]
+
+
+def parse_back(formatter, text):
+    return float(compile_expression(formatter.to_expression(text))())
+
+
+@pytest.mark.parametrize("formatter", FORMATTERS, ids=lambda f: f"{f.notation}{f.group_separator}")
+def test_floats_round_trip(formatter):
+    generator = random.Random(1)
+    values = FLOATS + [generator.uniform(-1, 1) * 10 ** generator.randint(-30, 30) for _ in range(500)]
+    for value in values:
+        text = formatter.format(value)
+        assert parse_back(formatter, text) == value, text
+
+
+def test_chained_results_do_not_drift():
+    assert evaluate_to_text(evaluate_to_text("1/3") + "*3") == "1.0"
+    assert evaluate_to_text(evaluate_to_text("2^0.5") + "^2") == evaluate_to_text("(2^0.5)^2")
+
+
+def test_whole_numbers_keep_a_decimal_point():
+    formatter = ResultFormatter()
+    assert formatter.format(5.0) == "5.0"
+    assert formatter.format(-0.0) == "0.0"
+    assert formatter.format(12) == "12.0"
+
+
+def test_fixed_significant_digits_round():
+    assert ResultFormatter(significant=5).format(1 / 3) == "0.33333"
+    assert ResultFormatter(significant=3, notation=SCIENTIFIC).format(123456.0) == "1.23E5"
+
+
+def test_grouping_and_decimal_point():
+    formatter = ResultFormatter(group_separator=".", decimal_point=",")
+    assert formatter.format(1234567.5) == "1.234.567,5"
+    assert formatter.to_expression("1.234.567,5") == "1234567.5"
+
+
+def test_exact_types():
+    formatter = ResultFormatter()
+    assert formatter.format(Decimal("0.1")) == "0.1"
+    assert formatter.format(Fraction(1, 4)) == "0.25"
+    assert formatter.format(10 ** 30) == "1" + "0" * 30 + ".0"
+
+
+def test_refuses_results_beyond_display_limit():
+    with pytest.raises(OverflowError):
+        ResultFormatter().format(10 ** 1200)
+    with pytest.raises(OverflowError):
+        ResultFormatter().format(math.inf)
+
+
+def test_tiny_decimals_switch_to_scientific_notation():
+    formatter = ResultFormatter()
+    assert formatter.format(Decimal("1E-1500")) == "1.0E-1500"
+    assert formatter.format(Decimal("-2.5E-1001")) == "-2.5E-1001"
+    assert formatter.format(Decimal("2.5E-999")).startswith("0.000")
+    text, value = evaluate_to_result("1E-1500", DECIMAL, 30, formatter)
+    assert (text, value) == ("1.0E-1500", Decimal("1E-1500"))
+    assert evaluate_to_result(text, DECIMAL, 30, formatter)[0] == text
+
+
+@pytest.mark.parametrize("mode", [DECIMAL, FRACTION])
+@pytest.mark.parametrize("digits", [10, 30, 50])
+@pytest.mark.parametrize("formatter", FORMATTERS, ids=lambda f: f"{f.notation}{f.group_separator}")
+def test_precision_results_read_back_as_the_same_text(mode, digits, formatter):
+    generator = random.Random(digits)
+    expressions = ["1/3", "2^0.5", "π", "-2/3", "1/7*1E-20", "123456789.123456789*1E15"]
+    expressions += [f"{generator.randint(1, 10 ** 6)}/{generator.randint(1, 10 ** 6)}"
+                    f"*1E{generator.randint(-30, 30)}" for _ in range(20)]
+    for expression in expressions:
+        text, _ = evaluate_to_result(expression, mode, digits, formatter)
+        again, _ = evaluate_to_result(formatter.to_expression(text), mode, digits, formatter)
+        assert again == text, expression
@@ -0,0 +1,46 @@
+"""
+Tests: geodesy
+Vincenty distances, including nearly antipodal points where the iteration fails, and packed DMS
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from engine.geodesy import from_packed_dms, haversine_distance, to_packed_dms, vincenty_distance
+
+
+def test_vincenty_matches_a_known_distance():
+    # Karney's example that converges just before the antipodal region
+    assert vincenty_distance(0.0, 0.0, 0.5, 179.5) == pytest.approx(19936288.579, abs=0.01)
+
+
+def test_coincident_points_are_zero():
+    assert vincenty_distance(45.0, 7.0, 45.0, 7.0) == 0.0
+
+
+def test_nearly_antipodal_points_fall_back_to_haversine():
+    distance = vincenty_distance(0.0, 0.0, 0.5, 179.7)
+    assert math.isfinite(distance)
+    assert distance == pytest.approx(haversine_distance(0.0, 0.0, 0.5, 179.7))
+    # Still within the ellipsoid's half meridian and 0.5% of the true geodesic
+    assert 19.9e6 < distance < 20.01e6
+
+
+def test_only_failing_pairs_fall_back():
+    lat1, lon1 = np.array([0.0, 52.2]), np.array([0.0, 0.1])
+    lat2, lon2 = np.array([0.5, 48.8]), np.array([179.7, 2.3])
+    distances = vincenty_distance(lat1, lon1, lat2, lon2)
+    assert np.all(np.isfinite(distances))
+    assert distances[1] == pytest.approx(vincenty_distance(52.2, 0.1, 48.8, 2.3), abs=1e-3)
+    assert distances[1] != pytest.approx(haversine_distance(52.2, 0.1, 48.8, 2.3), rel=1e-4)
+
+
+def test_packed_dms_reads_back_exactly():
+    assert from_packed_dms(12.3) == 12.5
+    assert from_packed_dms(-12.3) == -12.5
+    assert from_packed_dms(0.0030) == 30 / 3600
+    assert from_packed_dms(12.3457) == pytest.approx(12.5825, abs=1e-12)
+    for degrees in [12.5825, 0.5, 45.0, 179.999, -33.8688]:
+        assert from_packed_dms(to_packed_dms(degrees)) == pytest.approx(degrees, abs=1e-8)
@@ -0,0 +1,80 @@
+"""
+Tests: history search index
+Trigram lookups agree with a plain substring scan, newest first
+"""
+
+import random
+
+from engine.history_index import TrigramIndex, trigrams
+
+ENTRIES = ["2+3", "sin(30)", "SIN(45)*2", "√2", "ln(2)+1", "12345", "r = 1/7", "ans*3", "(2+3)!", "2"]
+
+
+def build(entries=ENTRIES):
+    index = TrigramIndex()
+    for key, text in enumerate(entries):
+        index.add(key, text)
+    return index
+
+
+def scan(entries, query):
+    return [key for key in reversed(range(len(entries))) if query.lower() in entries[key].lower()]
+
+
+def test_trigrams():
+    assert trigrams("Sin(") == {"sin", "in("}
+    assert trigrams("ab") == set()
+
+
+def test_search_matches_a_substring_scan():
+    index = build()
+    for query in ["2+3", "sin", "Sin(", "(2", "234", "2", "", "ln(2)+1", "xyz", "n(4"]:
+        assert index.search(query) == scan(ENTRIES, query), query
+
+
+def test_shared_trigrams_are_not_a_match():
+    index = TrigramIndex()
+    index.add(1, "abcd bcde")
+    assert index.search("abcde") == []
+    assert index.search("bcde") == [1]
+
+
+def test_limit_keeps_the_newest():
+    index = build()
+    assert index.search("2", limit=3) == scan(ENTRIES, "2")[:3]
+    assert index.search("sin", limit=1) == [2]
+
+
+def test_discard_and_clear():
+    index = build()
+    index.discard(2)
+    index.discard(99)
+    assert index.search("sin") == [1]
+    assert len(index) == len(ENTRIES) - 1
+    index.clear()
+    assert (len(index), index.search("2"), index.search("")) == (0, [], [])
+
+
+def test_re_adding_a_key_replaces_its_text():
+    index = TrigramIndex()
+    index.add(1, "sin(30)")
+    index.add(1, "cos(30)")
+    assert index.search("sin") == []
+    assert index.search("cos") == [1]
+
+
+def test_random_edits_agree_with_a_scan():
+    generator = random.Random(7)
+    entries = {}
+    index = TrigramIndex()
+    for key in range(2000):
+        text = "".join(generator.choice("12+*()sinx") for _ in range(generator.randint(1, 12)))
+        entries[key] = text
+        index.add(key, text)
+        if generator.random() < 0.2:
+            removed = generator.choice(list(entries))
+            del entries[removed]
+            index.discard(removed)
+    for query in ["sin", "(1", "2+", "x*x", "s", "1)*", "*(s"]:
+        expected = sorted((key for key, text in entries.items() if query in text), reverse=True)
+        assert index.search(query) == expected, query
@@ -0,0 +1,30 @@
+"""
+Tests: history model
+Rows follow the history store: new calculations on top, repeats moved there
+"""
+
+import pytest
+
+QtCore = pytest.importorskip("PyQt5.QtCore")
+
+from engine.history_store import HistoryStore  # noqa: E402
+from history_model import HistoryModel  # noqa: E402
+
+
+def rows(model):
+    return [model.entry(row) for row in range(model.rowCount())]
+
+
+def test_repeat_moves_its_row_to_the_top():
+    model = HistoryModel(HistoryStore(":memory:", capacity=3))
+    for number in range(3):
+        model.append(f"{number}+1", f"{number + 1}.0")
+    moves = []
+    model.rowsMoved.connect(lambda parent, start, end, destination, row: moves.append((start, row)))
+    model.append("0+1", "1.0")
+    assert moves == [(2, 0)]
+    assert rows(model) == [("0+1", "1.0"), ("2+1", "3.0"), ("1+1", "2.0")]
+    assert model.count(0) == 2
+    # Evicts the least recently used calculation, not the repeated one
+    model.append("5+1", "6.0")
+    assert rows(model) == [("5+1", "6.0"), ("0+1", "1.0"), ("2+1", "3.0")]
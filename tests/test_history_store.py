@@ -0,0 +1,117 @@
+"""
+Tests: history store
+Appending, eviction, repeats, search and databases shared by several instances
+"""
+
+import pytest
+
+from engine.history_store import HistoryStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "history.sqlite")
+
+
+def entries(count, prefix="e"):
+    return [(f"{prefix}{number}", str(number)) for number in range(count)]
+
+
+def test_append_and_index():
+    store = HistoryStore(":memory:", capacity=10)
+    for item in entries(3):
+        store.append(item)
+    assert list(store) == entries(3)
+    assert store[-1] == ("e2", "2")
+    assert list(reversed(store)) == entries(3)[::-1]
+    with pytest.raises(IndexError):
+        store[3]
+
+
+def test_oldest_entries_are_evicted():
+    store = HistoryStore(":memory:", capacity=3)
+    evicted = [store.append(item) for item in entries(5)]
+    assert evicted == [None, None, None, ("e0", "0"), ("e1", "1")]
+    assert list(store) == entries(5)[2:]
+    store.resize(2)
+    assert list(store) == entries(5)[3:]
+
+
+def test_reopened_store_keeps_entries(path):
+    store = HistoryStore(path, capacity=10)
+    for item in entries(4):
+        store.append(item)
+    store.close()
+    assert list(HistoryStore(path, capacity=3)) == entries(4)[1:]
+
+
+def test_pages_are_read_on_demand(path):
+    store = HistoryStore(path, capacity=1000, page_size=8, cached_pages=2)
+    for item in entries(100):
+        store.append(item)
+    store.close()
+    store = HistoryStore(path, capacity=1000, page_size=8, cached_pages=2)
+    assert [store[index] for index in (0, 50, 99, 7, 8)] == [entries(100)[i] for i in (0, 50, 99, 7, 8)]
+
+
+def test_search_and_clear():
+    store = HistoryStore(":memory:", capacity=10)
+    for item in [("12*3", "36.0"), ("sin(0)", "0.0"), ("1+2", "3.0")]:
+        store.append(item)
+    assert store.search("sin") == [("sin(0)", "0.0")]
+    assert store.search("3") == [("1+2", "3.0"), ("12*3", "36.0")]
+    store.clear()
+    assert len(store) == 0 and store.search("sin") == []
+
+
+def test_two_instances_share_one_database(path):
+    first = HistoryStore(path, capacity=5)
+    second = HistoryStore(path, capacity=5)
+    for item in entries(3, "a"):
+        first.append(item)
+    for item in entries(3, "b"):
+        second.append(item)
+    assert second.find(("a2", "2")) is not None
+    assert list(second) == entries(3, "a")[1:] + entries(3, "b")
+    assert first.changed_elsewhere()
+    first.reload()
+    assert list(first) == list(second)
+    first.append(("a9", "9"))
+    assert list(second) == entries(3, "a")[2:] + entries(3, "b") + [("a9", "9")]
+
+
+def test_repeats_move_to_the_newest_position():
+    store = HistoryStore(":memory:", capacity=3)
+    for item in entries(3):
+        store.append(item)
+    store.touch(store.find(("e0", "0")))
+    assert list(store) == [("e1", "1"), ("e2", "2"), ("e0", "0")]
+    assert store.entry(-1).count == 2
+    store.touch(store.find(("e0", "0")))
+    assert store.entry(-1).count == 3 and len(store) == 3
+    # The repeated entry is no longer the first to go
+    store.append(("e3", "3"))
+    assert list(store) == [("e2", "2"), ("e0", "0"), ("e3", "3")]
+    assert store.search("e0") == [("e0", "0")]
+
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_search_follows_moved_entries(fts):
+    store = HistoryStore(":memory:", capacity=10)
+    store._fts = store._fts and fts
+    for item in [("12*3", "36.0"), ("12*4", "48.0"), ("sin(0)", "0.0")]:
+        store.append(item)
+    store.search("12*")
+    store.touch(store.find(("12*3", "36.0")))
+    assert store.search("12*") == [("12*3", "36.0"), ("12*4", "48.0")]
+
+
+def test_moved_entries_keep_their_count_after_reopening(path):
+    store = HistoryStore(path, capacity=10, page_size=2)
+    for item in entries(5):
+        store.append(item)
+    store.touch(store.find(("e1", "1")))
+    store.close()
+    store = HistoryStore(path, capacity=10, page_size=2)
+    assert store[-1] == ("e1", "1") and store.entry(-1).count == 2
+    assert [store.entry(index).count for index in range(4)] == [1, 1, 1, 1]
@@ -0,0 +1,89 @@
+"""
+Tests: incremental evaluation
+The live preview must agree with evaluating the whole expression afresh
+"""
+
+import pytest
+
+from engine.evaluation import ERROR_TEXT, OVERFLOW_TEXT, evaluate_to_text
+from engine.incremental import PENDING_TEXT, IncrementalEvaluator
+from engine.precision import DECIMAL, FRACTION, get_precision
+
+EXPRESSIONS = [
+    "5x²+1+2",
+    "5x³-2x²+7",
+    "2x²x³+1",
+    "(1+2)x²*3",
+    "12!/10!+50%",
+    "1.5E-3*2+1",
+    "sin(0.5)^2+cos(0.5)^2",
+    "((1.5+2.25)*(3.75-0.5))/(4^2-1)",
+    "2π+√(16)x²",
+]
+
+
+def full(text):
+    """Preview of text by an evaluator with no history"""
+    return IncrementalEvaluator().preview(text)
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_typing_matches_full_evaluation(expression):
+    evaluator = IncrementalEvaluator()
+    for end in range(1, len(expression) + 1):
+        prefix = expression[:end]
+        assert evaluator.preview(prefix) == full(prefix), prefix
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_deleting_matches_full_evaluation(expression):
+    evaluator = IncrementalEvaluator()
+    evaluator.preview(expression)
+    for end in range(len(expression) - 1, 0, -1):
+        prefix = expression[:end]
+        assert evaluator.preview(prefix) == full(prefix), prefix
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_preview_matches_equals(expression):
+    preview = IncrementalEvaluator().preview(expression)
+    assert preview not in ("", PENDING_TEXT, ERROR_TEXT)
+    assert preview == evaluate_to_text(expression)
+
+
+def test_square_after_typed_operand():
+    evaluator = IncrementalEvaluator()
+    for text in ["5", "5x²", "5x²+", "5x²+1", "5x²+1+", "5x²+1+2"]:
+        preview = evaluator.preview(text)
+    assert preview == "28.0"
+
+
+def test_edit_in_the_middle():
+    evaluator = IncrementalEvaluator()
+    evaluator.preview("3x²+10")
+    assert evaluator.preview("4x²+10") == full("4x²+10") == "26.0"
+
+
+@pytest.mark.parametrize("mode", [DECIMAL, FRACTION])
+@pytest.mark.parametrize("expression", EXPRESSIONS[4:])
+def test_precision_previews_match_equals(mode, expression):
+    evaluator = IncrementalEvaluator()
+    evaluator.preview("1+1")
+    evaluator.set_precision(get_precision(mode, 30))
+    for end in range(1, len(expression)):
+        evaluator.preview(expression[:end])
+    assert evaluator.preview(expression) == evaluate_to_text(expression, mode, 30)
+
+
+def test_variables_and_unfinished_names():
+    evaluator = IncrementalEvaluator()
+    evaluator.variables = {"rate": 0.25}
+    assert evaluator.preview("ra") == ""
+    assert evaluator.preview("rate*4") == "1.0"
+    assert evaluator.preview("5") == ""
+
+
+def test_expensive_and_overflowing_previews_are_not_computed():
+    evaluator = IncrementalEvaluator()
+    assert evaluator.preview("1000!/998!") == PENDING_TEXT
+    assert evaluator.preview("1000!") == OVERFLOW_TEXT
@@ -0,0 +1,56 @@
+"""
+Tests: tokenizer and parser
+Precedence, implicit multiplication and the errors typos must produce
+"""
+
+import pytest
+
+from engine.evaluation import ERROR_TEXT, evaluate_to_text
+from engine.parser import ExpressionError, parse
+
+
+@pytest.mark.parametrize("expression, result", [
+    ("2π", evaluate_to_text("2*π")),
+    ("3(4+1)", "15.0"),
+    ("(4+1)3", "15.0"),
+    ("(1+1)(2+1)", "6.0"),
+    ("2sin(0)", "0.0"),
+    ("2√16", "8.0"),
+])
+def test_implicit_multiplication(expression, result):
+    assert evaluate_to_text(expression) == result
+
+
+@pytest.mark.parametrize("expression", ["1..2", "2 3", "1.5.5", "5!3", "2²3"])
+def test_number_after_number_is_an_error(expression):
+    with pytest.raises(ExpressionError):
+        parse(expression)
+    assert evaluate_to_text(expression) == ERROR_TEXT
+
+
+@pytest.mark.parametrize("expression, result", [
+    ("2+3*4", "14.0"),
+    ("(2+3)*4", "20.0"),
+    ("2-3-4", "-5.0"),
+    ("8/4/2", "1.0"),
+    ("2^3^2", "512.0"),
+    ("-2^2", "-4.0"),
+    ("2^-1", "0.5"),
+    ("-3!", "-6.0"),
+    ("10+50%", "10.5"),
+    ("5²+2³", "33.0"),
+    ("√9+1", "4.0"),
+    ("1.5E-3*2", "0.003"),
+])
+def test_precedence_and_associativity(expression, result):
+    assert evaluate_to_text(expression) == result
+
+
+@pytest.mark.parametrize("expression", ["", "((1)", "(1))", "sin(", "2*", "*2", "2^^3", "1,5"])
+def test_malformed_expressions_raise_expression_error(expression):
+    with pytest.raises(ExpressionError):
+        parse(expression)
+
+
+def test_unknown_function_is_an_evaluation_error():
+    assert evaluate_to_text("foo(2)") == ERROR_TEXT
@@ -0,0 +1,83 @@
+"""
+Tests: precision modes
+Decimal and Fraction results, and failures reported like the float path
+"""
+
+import time
+
+import pytest
+
+from engine.cost import EXACT, OVERFLOW, estimate_cost
+from engine.evaluation import ERROR_TEXT, OVERFLOW_TEXT, evaluate_to_text
+from engine.parser import parse
+from engine.precision import DECIMAL, FLOAT, FRACTION
+
+MODES = (FLOAT, DECIMAL, FRACTION)
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("expression", ["ln(0)", "log(0)", "ln(-1)", "0^-1", "1/0", "√(-1)", "2^^3"])
+def test_failures_agree_across_modes(mode, expression):
+    assert evaluate_to_text(expression, mode) == ERROR_TEXT
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_zero_to_the_zero(mode):
+    assert evaluate_to_text("0^0", mode) == "1.0"
+
+
+def test_fraction_factorial_is_exact():
+    import math
+
+    assert evaluate_to_text("170!", FRACTION) == f"{math.factorial(170)}.0"
+
+
+def test_decimal_factorial_is_rounded():
+    assert evaluate_to_text("170!", DECIMAL).startswith("725741561530799896739672821112926")
+    assert evaluate_to_text("170!", DECIMAL).endswith("000000.0")
+
+
+def test_decimal_is_exact_for_decimal_fractions():
+    assert evaluate_to_text("0.1+0.2", DECIMAL) == "0.3"
+    assert evaluate_to_text("1/3*3", FRACTION) == "1.0"
+
+
+@pytest.mark.parametrize("literal", ["1E10000000", "1E-10000000"])
+def test_fraction_refuses_huge_literal_exponents_quickly(literal):
+    start = time.perf_counter()
+    assert evaluate_to_text(literal, FRACTION) == OVERFLOW_TEXT
+    assert time.perf_counter() - start < 1.0
+
+
+def test_fraction_accepts_ordinary_exponents():
+    assert evaluate_to_text("1.5E3+2.5E-3", FRACTION) == "1500.0025"
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_results_too_long_to_display_are_refused_before_computing(mode):
+    assert estimate_cost(parse("60000!")).route == OVERFLOW
+    start = time.perf_counter()
+    assert evaluate_to_text("60000!", mode) == OVERFLOW_TEXT
+    assert time.perf_counter() - start < 0.05
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_large_intermediate_results_still_evaluate(mode):
+    assert estimate_cost(parse("1000!/999!")).route == EXACT
+    assert evaluate_to_text("1000!/999!", mode) == "1000.0"
+    assert evaluate_to_text("1/0", mode) == ERROR_TEXT
+
+
+def test_decimal_digits_set_the_displayed_precision():
+    assert evaluate_to_text("1/3", DECIMAL, 10) == "0.3333333333"
+    assert evaluate_to_text("1/3", DECIMAL, 40) == "0." + "3" * 40
+    assert evaluate_to_text("10^20+1", DECIMAL, 30) == "100000000000000000001.0"
+    assert evaluate_to_text("10^20+1", DECIMAL, 10) == "100000000000000000000.0"
+
+
+def test_exact_modes_avoid_binary_rounding():
+    assert evaluate_to_text("0.1*3-0.3") != "0.0"
+    assert evaluate_to_text("0.1*3-0.3", DECIMAL) == "0.0"
+    assert evaluate_to_text("0.1*3-0.3", FRACTION) == "0.0"
+    assert evaluate_to_text("1/3+1/6", FRACTION) == "0.5"
+    assert evaluate_to_text("sin(π/6)", DECIMAL, 20) == "0.5"
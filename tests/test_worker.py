@@ -0,0 +1,51 @@
+"""
+Tests: worker processes
+Workers run their own interpreter; the module-wide multiprocessing setting is never written
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import spawn
+
+import pytest
+
+from engine.worker import serve, spawn_context
+
+
+@pytest.fixture
+def context(monkeypatch):
+    context = spawn_context()
+    if context is None:
+        pytest.skip("No Python interpreter for child processes")
+
+    def refuse(executable):
+        raise AssertionError("the module-wide executable was changed")
+
+    # As inside QGIS, the module-wide interpreter cannot run a worker
+    qgis = "/nonexistent/qgis"
+    monkeypatch.setattr(spawn, "_python_exe",
+                        qgis.encode() if isinstance(spawn.get_executable(), bytes) else qgis)
+    monkeypatch.setattr(spawn, "set_executable", refuse)
+    return context
+
+
+def test_worker_starts_without_setting_the_module_wide_executable(context):
+    before = spawn.get_executable()
+    conn, child_conn = context.Pipe()
+    process = context.Process(target=serve, args=(child_conn,), daemon=True)
+    process.start()
+    child_conn.close()
+    try:
+        conn.send((7, "2^10"))
+        assert conn.recv() == (7, "1024.0", 1024)
+    finally:
+        conn.send(None)
+        process.join(5)
+        conn.close()
+    assert spawn.get_executable() == before
+
+
+def test_process_pool_starts_without_setting_the_module_wide_executable(context):
+    before = spawn.get_executable()
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+        assert list(pool.map(abs, [-1, -2, -3])) == [1, 2, 3]
+    assert spawn.get_executable() == before
@@ -0,0 +1,120 @@
+"""
+Tests: worksheet
+Line results, names resolved to the nearest assignment above, and re-evaluation after edits
+"""
+
+import pytest
+
+from engine.calculator import CalculatorEngine
+from engine.evaluation import ERROR_TEXT, TIMEOUT_TEXT, evaluate_to_result
+from engine.incremental import PENDING_TEXT
+from engine.worksheet import Worksheet
+
+
+@pytest.fixture
+def sheet():
+    return Worksheet(CalculatorEngine())
+
+
+def results(sheet, text):
+    sheet.set_text(text)
+    sheet.run()
+    return sheet.results
+
+
+def test_docstring_example(sheet):
+    assert results(sheet, "area = 1234.5\nrate = area * 0.5\nline2 * 12") == ["1234.5", "617.25", "7407.0"]
+
+
+def test_name_refers_to_the_nearest_assignment_above(sheet):
+    assert results(sheet, "a = 1\na*2\na = 5\na*2") == ["1.0", "2.0", "5.0", "10.0"]
+
+
+def test_reassignment_can_use_the_previous_value(sheet):
+    assert results(sheet, "a = 1\na = a + 1\na*10") == ["1.0", "2.0", "20.0"]
+
+
+def test_editing_an_assignment_updates_the_lines_below(sheet):
+    results(sheet, "a = 1\nb = a\na = 7\nb + a")
+    sheet.set_line(0, "a = 2")
+    sheet.run()
+    assert sheet.results == ["2.0", "2.0", "7.0", "9.0"]
+    sheet.set_line(0, "c = 2")
+    sheet.run()
+    assert sheet.results == ["2.0", ERROR_TEXT, "7.0", ERROR_TEXT]
+    sheet.set_line(0, "a = 3")
+    sheet.run()
+    assert sheet.results == ["3.0", "3.0", "7.0", "10.0"]
+
+
+def test_inserting_a_line_renumbers_references(sheet):
+    results(sheet, "a = 2\na*3")
+    assert results(sheet, "a = 2\na = 4\na*3") == ["2.0", "4.0", "12.0"]
+    assert results(sheet, "a = 2\na*3") == ["2.0", "6.0"]
+
+
+def test_notes_and_errors(sheet):
+    assert results(sheet, "# note\n\nline9\nsin = 3\nline1 = 2") == ["", "", ERROR_TEXT, ERROR_TEXT, ERROR_TEXT]
+
+
+def test_circular_line_references_are_errors(sheet):
+    assert results(sheet, "line2\nline1") == [ERROR_TEXT, ERROR_TEXT]
+
+
+def test_run_spreads_work_over_slices(sheet):
+    sheet.set_text("\n".join(["1"] + [f"line{i} + 1" for i in range(1, 500)]))
+    passes = 0
+    while sheet.pending():
+        sheet.run(0.0)
+        passes += 1
+    assert passes > 1
+    assert sheet.results[-1] == "500.0"
+
+
+def test_lines_use_engine_variables():
+    engine = CalculatorEngine()
+    engine.calculate("6*7")
+    sheet = Worksheet(engine)
+    assert results(sheet, "ans+1\nM") == ["43.0", ERROR_TEXT]
+    engine.calculate("1+1")
+    engine.press("M+")
+    sheet.run()
+    assert sheet.results == ["3.0", "2.0"]
+
+
+def test_sheet_assignment_shadows_engine_variable_below_it():
+    engine = CalculatorEngine()
+    engine.calculate("6*7")
+    sheet = Worksheet(engine)
+    assert results(sheet, "ans\nans = 1\nans") == ["42.0", "1.0", "1.0"]
+
+
+def test_expensive_lines_are_left_to_a_worker():
+    engine = CalculatorEngine()
+    sheet = Worksheet(engine, background=True)
+    assert results(sheet, "2\nb = 1000!/998!\nb+line1") == ["2.0", PENDING_TEXT, PENDING_TEXT]
+    token, formula, values = sheet.next_job()
+    assert sheet.next_job() is None
+    assert sheet.finish(token, *evaluate_to_result(formula, variables=values)) == 1
+    sheet.run()
+    assert sheet.results == ["2.0", "999000.0", "999002.0"]
+
+
+def test_stale_worker_results_are_ignored():
+    sheet = Worksheet(CalculatorEngine(), background=True)
+    results(sheet, "1000!/998!")
+    token, _, _ = sheet.next_job()
+    sheet.set_line(0, "3")
+    assert not sheet.is_waiting(token)
+    assert sheet.finish(token, "999000.0", 999000) is None
+    sheet.run()
+    assert sheet.results == ["3.0"]
+
+
+def test_worker_failures_are_shown():
+    sheet = Worksheet(CalculatorEngine(), background=True)
+    results(sheet, "1000!/998!\nline1+1")
+    token, _, _ = sheet.next_job()
+    sheet.finish(token, TIMEOUT_TEXT, None)
+    sheet.run()
+    assert sheet.results == [TIMEOUT_TEXT, ERROR_TEXT]